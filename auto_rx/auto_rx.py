@@ -19,12 +19,17 @@ import sys
 import time
 import traceback
 from pathlib import Path
+from threading import Lock
 
 # Specific import
 import autorx
 from autorx.scan import SondeScanner
 from autorx.decode import SondeDecoder, VALID_SONDE_TYPES, DRIFTY_SONDE_TYPES
 from autorx.logger import TelemetryLogger
+from autorx.frequency_stats import FrequencyStatistics
+from autorx.spectrum_baseline import SpectrumBaseline
+from autorx.wideband import WidebandCapture, capture_centre_freq
+from autorx.telemetry_bus import telemetry_bus
 from autorx.email_notification import EmailNotification
 from autorx.habitat import HabitatUploader
 from autorx.aprs import APRSUploader
@@ -78,7 +83,7 @@ exporter_objects = (
 )  # This list will hold references to each exporter instance that is created.
 exporter_functions = (
     []
-)  # This list will hold references to the exporter add functions, which will be passed onto the decoders.
+)  # This list will hold references to the exporter add functions, which are subscribed to the telemetry bus.
 
 # Separate reference to the e-mail exporter, as we may want to use this for error notifications.
 email_exporter = None
@@ -90,6 +95,21 @@ gpsd_adaptor = None
 # This contains frequncies that should be blocked for a short amount of time.
 temporary_block_list = {}
 
+# Historical frequency statistics, used to prioritise scanner peaks.
+frequency_stats = None
+
+# Rolling baseline spectrum, used to prioritise newly appeared scanner peaks.
+spectrum_baseline = None
+
+# Shared wideband capture, used by the scanner and decoders when shared_sdr is enabled.
+wideband_capture = None
+
+# Wideband captures used only by decoders (when virtual_sdr_decoding is enabled), keyed by device index.
+decoder_captures = {}
+
+# Lock on SDR allocation, as SDRs may be borrowed from the scanner thread for detection.
+sdr_allocation_lock = Lock()
+
 
 def allocate_sdr(check_only: bool = False,
                  task_description: str = "") -> str or None:
@@ -103,26 +123,170 @@ def allocate_sdr(check_only: bool = False,
         (str): The device index/serial number of the free/allocated SDR, if one is free, else None.
     """
 
-    for _idx in sorted(autorx.sdr_list.keys()):
-        if not autorx.sdr_list[_idx]["in_use"]:
-            # Found a free SDR!
-            if check_only:
-                # If we are just checking to see if there are any SDRs free, we don't allocate it.
-                pass
-            else:
-                # Otherwise, set the SDR as in-use.
-                autorx.sdr_list[_idx]["in_use"] = True
-                logging.info("Task Manager - SDR #{} has been allocated to {}.".format(_idx, task_description))
+    with sdr_allocation_lock:
+        for _idx in sorted(autorx.sdr_list.keys()):
+            if not autorx.sdr_list[_idx]["in_use"]:
+                # Found a free SDR!
+                if check_only:
+                    # If we are just checking to see if there are any SDRs free, we don't allocate it.
+                    pass
+                else:
+                    # Otherwise, set the SDR as in-use.
+                    autorx.sdr_list[_idx]["in_use"] = True
+                    logging.info("Task Manager - SDR #{} has been allocated to {}.".format(_idx, task_description))
 
-            return _idx
+                return _idx
 
     # Otherwise, no SDRs are free.
     return None
 
 
+def allocate_detection_sdr() -> dict or None:
+    """ Allocate an un-used SDR to the scanner, for use in a single detection attempt.
+
+    Returns:
+        (dict): The device index and settings of the allocated SDR, or None if no SDRs are free.
+    """
+    _device_idx = allocate_sdr(task_description="Scanner (Detection)")
+    if _device_idx is None:
+        return None
+
+    return {
+        "device_idx": _device_idx,
+        "ppm": autorx.sdr_list[_device_idx]["ppm"],
+        "gain": autorx.sdr_list[_device_idx]["gain"],
+        "bias": autorx.sdr_list[_device_idx]["bias"],
+    }
+
+
+def release_detection_sdr(device_idx: str) -> None:
+    """ Release a SDR borrowed by the scanner for detection.
+
+    Args:
+        device_idx (str): The device index/serial number of the SDR to release.
+    """
+    with sdr_allocation_lock:
+        if device_idx in autorx.sdr_list:
+            autorx.sdr_list[device_idx]["in_use"] = False
+            logging.debug("Task Manager - SDR #{} released by Scanner.".format(device_idx))
+
+
+def start_wideband_capture(device_idx: str) -> None:
+    """ Start the shared wideband capture on a SDR, centred on the scan range.
+
+    Args:
+        device_idx (str): The device index/serial number of the (allocated) SDR to use.
+    """
+    global config, wideband_capture
+
+    if not rtlsdr_test(device_idx):
+        # Handle this the same way as a scanner that has failed its SDR test.
+        autorx.sdr_list.pop(device_idx)
+        _error_msg = "Task Manager - Removed SDR {} from SDR list due to repeated failures.".format(device_idx)
+        logging.error(_error_msg)
+        email_error(_error_msg)
+        return
+
+    wideband_capture = WidebandCapture(
+        device_idx=device_idx,
+        centre_freq=int((config["min_freq"] + config["max_freq"]) / 2.0 * 1e6),
+        sample_rate=config["wideband_sample_rate"],
+        ppm=autorx.sdr_list[device_idx]["ppm"],
+        gain=autorx.sdr_list[device_idx]["gain"],
+        bias=autorx.sdr_list[device_idx]["bias"],
+    )
+    autorx.sdr_list[device_idx]["task"] = wideband_capture
+
+
+def stop_wideband_capture() -> None:
+    """ Stop the shared wideband capture, and release its SDR. """
+    global wideband_capture
+
+    if wideband_capture is None:
+        return
+
+    wideband_capture.close()
+    autorx.sdr_list[wideband_capture.device_idx]["in_use"] = False
+    autorx.sdr_list[wideband_capture.device_idx]["task"] = None
+    wideband_capture = None
+
+
+def shared_capture_users(capture: WidebandCapture = None) -> list:
+    """ Get the tasks which are using a wideband capture.
+
+    Args:
+        capture (WidebandCapture): The capture to check. Defaults to the shared wideband capture.
+
+    Returns:
+        (list): The task list keys of all tasks using the capture.
+    """
+    if capture is None:
+        capture = wideband_capture
+
+    return [
+        _key
+        for _key in autorx.task_list.keys()
+        if autorx.task_list[_key].get("shared", False)
+        and (autorx.task_list[_key].get("capture", wideband_capture) is capture)
+    ]
+
+
+def start_decoder_capture(device_idx: str,
+                          freq: float) -> WidebandCapture or None:
+    """ Start a wideband capture for decoders on a SDR, containing a given sonde frequency.
+
+    Args:
+        device_idx (str): The device index/serial number of the (allocated) SDR to use.
+        freq (float): Radiosonde frequency in Hz.
+
+    Returns:
+        (WidebandCapture): The new capture, or None if the SDR failed its test.
+    """
+    if not rtlsdr_test(device_idx):
+        autorx.sdr_list.pop(device_idx)
+        _error_msg = "Task Manager - Removed SDR {} from SDR list due to repeated failures.".format(device_idx)
+        logging.error(_error_msg)
+        email_error(_error_msg)
+        return None
+
+    # Cover as much of the scan range as possible, so later sondes can use the same capture.
+    _capture = WidebandCapture(
+        device_idx=device_idx,
+        centre_freq=capture_centre_freq(
+            freq,
+            config["wideband_sample_rate"],
+            config["min_freq"] * 1e6,
+            config["max_freq"] * 1e6,
+        ),
+        sample_rate=config["wideband_sample_rate"],
+        ppm=autorx.sdr_list[device_idx]["ppm"],
+        gain=autorx.sdr_list[device_idx]["gain"],
+        bias=autorx.sdr_list[device_idx]["bias"],
+    )
+    decoder_captures[device_idx] = _capture
+    autorx.sdr_list[device_idx]["task"] = _capture
+
+    return _capture
+
+
+def stop_decoder_capture(device_idx: str) -> None:
+    """ Stop a decoder wideband capture, and release its SDR.
+
+    Args:
+        device_idx (str): The device index/serial number of the SDR running the capture.
+    """
+    if device_idx not in decoder_captures:
+        return
+
+    decoder_captures.pop(device_idx).close()
+    if device_idx in autorx.sdr_list:
+        autorx.sdr_list[device_idx]["in_use"] = False
+        autorx.sdr_list[device_idx]["task"] = None
+
+
 def start_scanner():
     """ Start a scanner thread on the first available SDR """
-    global config, RS_PATH, temporary_block_list
+    global config, RS_PATH, temporary_block_list, frequency_stats, spectrum_baseline, wideband_capture
 
     if "SCAN" in autorx.task_list:
         # Already a scanner running! Return.
@@ -131,14 +295,28 @@ def start_scanner():
         )
         return
 
-    # Attempt to allocate a SDR.
-    _device_idx = allocate_sdr(task_description="Scanner")
+    if config["shared_sdr"] and (wideband_capture is not None):
+        # Scan using the already running shared wideband capture.
+        _device_idx = wideband_capture.device_idx
+    else:
+        # Attempt to allocate a SDR.
+        _device_idx = allocate_sdr(task_description="Scanner")
+
     if _device_idx is None:
         logging.debug("Task Manager - No SDRs free to run Scanner.")
         return
     else:
+        if config["shared_sdr"] and (wideband_capture is None):
+            start_wideband_capture(_device_idx)
+            if wideband_capture is None:
+                return
+
         # Create entry in task list.
-        autorx.task_list["SCAN"] = {"device_idx": _device_idx, "task": None}
+        autorx.task_list["SCAN"] = {
+            "device_idx": _device_idx,
+            "task": None,
+            "shared": config["shared_sdr"],
+        }
 
         # Init Scanner using settings from the global config.
         # TODO: Nicer way of passing in the huge list of args.
@@ -167,10 +345,36 @@ def start_scanner():
             save_detection_audio=config["save_detection_audio"],
             temporary_block_list=temporary_block_list,
             temporary_block_time=config["temporary_block_time"],
+            rtl_power_streaming=config["rtl_power_streaming"],
+            spectrum_backend="fft" if config["shared_sdr"] else config["spectrum_backend"],
+            spectrum_iq_source=config["spectrum_iq_source"],
+            fft_sample_rate=config["wideband_sample_rate"] if config["shared_sdr"] else config["fft_sample_rate"],
+            max_detection_sdrs=config["max_detection_sdrs"],
+            sdr_allocator=allocate_detection_sdr,
+            sdr_release=release_detection_sdr,
+            wideband_detection=config["wideband_detection"],
+            wideband_sample_rate=config["wideband_sample_rate"],
+            whitelist_wideband_detection=config["whitelist_wideband_detection"],
+            detection_cache_time=config["detection_cache_time"],
+            detection_cache_power_delta=config["detection_cache_power_delta"],
+            noise_floor_window=config["noise_floor_window"],
+            noise_floor_percentile=config["noise_floor_percentile"],
+            peak_clustering=config["peak_clustering"],
+            peak_cluster_threshold=config["peak_cluster_threshold"],
+            peak_cluster_max_width=config["peak_cluster_max_width"],
+            frequency_stats=frequency_stats,
+            spectrum_baseline=spectrum_baseline,
+            spectrum_monitor=config["spectrum_monitor"],
+            detect_early_exit=config["detect_early_exit"],
+            detect_giveup_time=config["detect_giveup_time"],
+            detect_giveup_score=config["detect_giveup_score"],
+            detect_backend=config["detect_backend"],
+            iq_source=wideband_capture,
         )
 
-        # Add a reference into the sdr_list entry
-        autorx.sdr_list[_device_idx]["task"] = autorx.task_list["SCAN"]["task"]
+        # Add a reference into the sdr_list entry, unless the SDR is running the shared capture.
+        if not config["shared_sdr"]:
+            autorx.sdr_list[_device_idx]["task"] = autorx.task_list["SCAN"]["task"]
 
     # Indicate to the web client that the task list has been updated.
     flask_emit_event("task_event")
@@ -186,14 +390,21 @@ def stop_scanner():
     else:
         logging.info("Halting Scanner to decode detected radiosonde.")
         _scan_sdr = autorx.task_list["SCAN"]["device_idx"]
+        _shared = autorx.task_list["SCAN"].get("shared", False)
         # Stop the scanner.
         autorx.task_list["SCAN"]["task"].stop()
-        # Relase the SDR.
-        autorx.sdr_list[_scan_sdr]["in_use"] = False
-        autorx.sdr_list[_scan_sdr]["task"] = None
         # Remove the scanner task from the task list
         autorx.task_list.pop("SCAN")
 
+        if _shared:
+            # The SDR is running the shared capture, which can only be released if nothing else is using it.
+            if len(shared_capture_users()) == 0:
+                stop_wideband_capture()
+        else:
+            # Relase the SDR.
+            autorx.sdr_list[_scan_sdr]["in_use"] = False
+            autorx.sdr_list[_scan_sdr]["task"] = None
+
 
 def start_decoder(freq: float,
                   sonde_type: str) -> None:
@@ -204,7 +415,7 @@ def start_decoder(freq: float,
         sonde_type (str): The radiosonde type ('RS41', 'RS92', 'DFM', 'M10, 'iMet')
 
     """
-    global config, RS_PATH, exporter_functions, rs92_ephemeris, temporary_block_list
+    global config, RS_PATH, rs92_ephemeris, temporary_block_list
 
     # Allocate a SDR.
     _device_idx = allocate_sdr(
@@ -238,13 +449,15 @@ def start_decoder(freq: float,
             bias=autorx.sdr_list[_device_idx]["bias"],
             save_decode_audio=config["save_decode_audio"],
             save_decode_iq=config["save_decode_iq"],
-            exporter=exporter_functions,
+            exporter=[telemetry_bus.publish],
             timeout=config["rx_timeout"],
             telem_filter=telemetry_filter,
             rs92_ephemeris=rs92_ephemeris,
             imet_location=config["station_code"],
             rs41_drift_tweak=config["rs41_drift_tweak"],
             experimental_decoder=config["experimental_decoders"][_exp_sonde_type],
+            async_runtime=config["async_decoders"],
+            python_fm_demod=config["python_fm_demod"],
         )
         autorx.sdr_list[_device_idx]["task"] = autorx.task_list[freq]["task"]
 
@@ -252,11 +465,112 @@ def start_decoder(freq: float,
     flask_emit_event("task_event")
 
 
+def start_shared_decoder(freq: float,
+                         sonde_type: str,
+                         capture: WidebandCapture = None) -> bool:
+    """ Attempt to start a decoder thread for a given sonde, using a channel of a wideband capture.
+
+    Args:
+        freq (float): Radiosonde frequency in Hz.
+        sonde_type (str): The radiosonde type ('RS41', 'RS92', 'DFM', 'M10, 'iMet')
+        capture (WidebandCapture): The capture to use. Defaults to the shared wideband capture.
+
+    Returns:
+        (bool): True if the decoder was started.
+    """
+    global config, RS_PATH, rs92_ephemeris, wideband_capture
+
+    if capture is None:
+        capture = wideband_capture
+
+    if (capture is None) or (not capture.covers(freq)):
+        return False
+
+    _device_idx = capture.device_idx
+
+    # The shared capture is only supported by the experimental decoder chain.
+    _decoder = SondeDecoder(
+        sonde_type=sonde_type,
+        sonde_freq=freq,
+        rs_path=RS_PATH,
+        sdr_fm=config["sdr_fm"],
+        device_idx=_device_idx,
+        gain=autorx.sdr_list[_device_idx]["gain"],
+        ppm=autorx.sdr_list[_device_idx]["ppm"],
+        bias=autorx.sdr_list[_device_idx]["bias"],
+        save_decode_audio=config["save_decode_audio"],
+        save_decode_iq=config["save_decode_iq"],
+        exporter=[telemetry_bus.publish],
+        timeout=config["rx_timeout"],
+        telem_filter=telemetry_filter,
+        rs92_ephemeris=rs92_ephemeris,
+        imet_location=config["station_code"],
+        rs41_drift_tweak=config["rs41_drift_tweak"],
+        experimental_decoder=True,
+        wideband_capture=capture,
+        async_runtime=config["async_decoders"],
+    )
+
+    if not _decoder.running():
+        # This sonde can't be decoded from the capture (i.e. an unsupported sonde type).
+        return False
+
+    logging.info("Task Manager - Decoding {0} sonde on {1:.3f} MHz using the wideband capture on SDR #{2}.".format(sonde_type, freq / 1e6, _device_idx))
+    autorx.task_list[freq] = {"device_idx": _device_idx, "task": _decoder, "shared": True, "capture": capture}
+
+    # Indicate to the web client that the task list has been updated.
+    flask_emit_event("task_event")
+    return True
+
+
+def start_virtual_decoder(freq: float,
+                          sonde_type: str) -> bool:
+    """ Attempt to start a decoder thread for a given sonde on a 'virtual SDR' - a channel of a wideband capture
+    which is only used by decoders. Each capture is shared by all sondes within its bandwidth, so a single SDR can
+    decode several sondes. If no running capture covers the sonde, a new capture is started on a free SDR.
+
+    Args:
+        freq (float): Radiosonde frequency in Hz.
+        sonde_type (str): The radiosonde type ('RS41', 'RS92', 'DFM', 'M10, 'iMet')
+
+    Returns:
+        (bool): True if the decoder was started.
+    """
+    if not config["virtual_sdr_decoding"]:
+        return False
+
+    # Only the experimental decoder chains can decode from a wideband capture.
+    if not config["experimental_decoders"].get(sonde_type.lstrip("-"), False):
+        return False
+
+    # Try the already running captures first.
+    for _capture in list(decoder_captures.values()):
+        if _capture.running() and start_shared_decoder(freq, sonde_type, _capture):
+            return True
+
+    _device_idx = allocate_sdr(
+        task_description="Wideband Capture ({0:.3f} MHz)".format(freq / 1e6)
+    )
+    if _device_idx is None:
+        return False
+
+    if start_decoder_capture(_device_idx, freq) is None:
+        return False
+
+    if not start_shared_decoder(freq, sonde_type, decoder_captures[_device_idx]):
+        stop_decoder_capture(_device_idx)
+        return False
+
+    return True
+
+
 def handle_scan_results():
     """ Read in Scan results via the scan results Queue.
 
-    Depending on how many SDRs are available, two things can happen:
-    - If there is a free SDR, allocate it to a decoder.
+    Depending on how many SDRs are available, three things can happen:
+    - If the shared SDR capture is running and can provide the sonde, decode from the shared capture.
+    - If there is a free SDR, allocate it to a decoder (or a wideband capture for decoders, if virtual SDR
+      decoding is enabled). A wideband capture which can already provide the sonde is used in preference.
     - If there is no free SDR, but a scanner is running, stop the scanner and start decoding.
     """
     global config, temporary_block_list
@@ -334,17 +648,26 @@ def handle_scan_results():
                     # TODO - Potentially add the frequency of the unsupported sonde to the temporary block list?
                     continue
 
-                if allocate_sdr(check_only=True) is not None:
+                if start_shared_decoder(_freq, _type):
+                    # Decoding from the shared wideband capture, alongside the scanner.
+                    pass
+
+                elif start_virtual_decoder(_freq, _type):
+                    # Decoding from a wideband capture shared with other decoders.
+                    pass
+
+                elif allocate_sdr(check_only=True) is not None:
                     # There is a SDR free! Start the decoder on that SDR
                     start_decoder(_freq, _type)
 
                 elif (allocate_sdr(check_only=True) is None) and (
                     "SCAN" in autorx.task_list
-                ):
-                    # We have run out of SDRs, but a scan thread is running.
+                ) and (shared_capture_users() in ([], ["SCAN"])):
+                    # We have run out of SDRs, but a scan thread is running (and its SDR is not being shared with decoders).
                     # Stop the scan thread and take that receiver!
                     stop_scanner()
-                    start_decoder(_freq, _type)
+                    if not start_virtual_decoder(_freq, _type):
+                        start_decoder(_freq, _type)
                 else:
                     # We have no SDRs free.
                     # TODO: Alert the user that a sonde was detected, but no SDR was available,
@@ -361,6 +684,7 @@ def clean_task_list():
             _running = autorx.task_list[_key]["task"].running()
             _task_sdr = autorx.task_list[_key]["device_idx"]
             _exit_state = autorx.task_list[_key]["task"].exit_state
+            _shared = autorx.task_list[_key].get("shared", False)
         except Exception as err:
             logging.error("Task Manager - Error getting task {} state - {}".format(_key, err))
             continue
@@ -377,7 +701,11 @@ def clean_task_list():
                 if "SCAN" in autorx.task_list:
                     autorx.task_list["SCAN"]["task"].add_temporary_block(_key)
 
-            if _exit_state == "FAILED SDR":
+            if _shared:
+                # This task was using a wideband capture, which keeps hold of the SDR.
+                pass
+
+            elif _exit_state == "FAILED SDR":
                 # The SDR was not able to be recovered after many attempts.
                 # Remove it from the SDR list and flag an error.
                 autorx.sdr_list.pop(_task_sdr)
@@ -405,13 +733,35 @@ def clean_task_list():
             temporary_block_list.pop(_freq)
             logging.info("Task Manager - Removed {0.3f} MHz from temporary block list.".format(_freq / 1e6))
 
+    if wideband_capture is not None:
+        if not wideband_capture.running():
+            # The shared capture has failed. Stop everything using it, so they can be cleaned up.
+            for _key in shared_capture_users():
+                autorx.task_list[_key]["task"].stop()
+
+        if len(shared_capture_users()) == 0:
+            # Nothing is using the shared capture any more (i.e. the scanner has been disabled).
+            stop_wideband_capture()
+
+    for _device_idx in list(decoder_captures.keys()):
+        _capture = decoder_captures[_device_idx]
+        if not _capture.running():
+            # The capture has failed. Stop all its decoders, so they can be cleaned up.
+            for _key in shared_capture_users(_capture):
+                autorx.task_list[_key]["task"].stop()
+
+        if len(shared_capture_users(_capture)) == 0:
+            # The last decoder using this capture has exited.
+            logging.info("Task Manager - No decoders left on the wideband capture on SDR #{}, stopping it.".format(_device_idx))
+            stop_decoder_capture(_device_idx)
+
     # Check if there is a scanner thread still running.
-    # If not, and if there is a SDR free, start one up again.
+    # If not, and if there is a SDR free (or the shared capture is running), start one up again.
     # Also check for a global scan inhibit flag.
     if (
         ("SCAN" not in autorx.task_list)
         and (not autorx.scan_inhibit)
-        and (allocate_sdr(check_only=True) is not None)
+        and ((allocate_sdr(check_only=True) is not None) or (wideband_capture is not None))
     ):
         # We have a SDR free, and we are not running a scan thread. Start one.
         start_scanner()
@@ -427,6 +777,19 @@ def stop_all():
         except Exception as err:
             logging.error("Error stopping task - {}".format(err))
 
+    stop_wideband_capture()
+    for _device_idx in list(decoder_captures.keys()):
+        stop_decoder_capture(_device_idx)
+
+    if frequency_stats is not None:
+        frequency_stats.save()
+
+    if spectrum_baseline is not None:
+        spectrum_baseline.save()
+
+    # Pass on any telemetry still in the bus before closing the exporters.
+    telemetry_bus.close()
+
     for _exporter in exporter_objects:
         try:
             _exporter.close()
@@ -587,7 +950,7 @@ def email_error(message: str = "foo"):
 
 def main():
     """ Main Loop """
-    global config, exporter_objects, exporter_functions, logging_level, rs92_ephemeris, gpsd_adaptor, email_exporter
+    global config, exporter_objects, exporter_functions, logging_level, rs92_ephemeris, gpsd_adaptor, email_exporter, frequency_stats, spectrum_baseline
 
     # Specify command arguments
     epilog_msg = '''\
@@ -728,6 +1091,24 @@ def main():
     if args.frequency != 0.0:
         config["whitelist"] = [args.frequency]
 
+    # Load the historical frequency statistics, used to decide the order in which the scanner checks peaks.
+    if config["frequency_priority"]:
+        frequency_stats = FrequencyStatistics(
+            log_directory=logging_path,
+            quantization=config["quantization"],
+            hour_window=config["frequency_priority_window"],
+        )
+
+    # Load the baseline spectrum, used to check newly appeared peaks first.
+    if config["spectrum_baseline"]:
+        spectrum_baseline = SpectrumBaseline(
+            log_directory=logging_path,
+            time_constant=config["spectrum_baseline_time_constant"] * 60,
+            rise_threshold=config["spectrum_baseline_rise"],
+            stable_time=config["spectrum_baseline_stable_time"] * 3600,
+            quantization=config["quantization"],
+        )
+
     # Start our exporter options
     # Telemetry Logger
     if config["per_sonde_log"]:
@@ -888,6 +1269,15 @@ def main():
     exporter_objects.append(_web_exporter)
     exporter_functions.append(_web_exporter.add)
 
+    # Decoders publish their telemetry to the telemetry bus, which passes it on to each exporter.
+    for _exporter in exporter_functions:
+        if isinstance(_exporter.__self__, Rotator):
+            # The rotator only ever uses the latest position.
+            telemetry_bus.subscribe(_exporter, queue_length=1)
+        else:
+            telemetry_bus.subscribe(_exporter)
+    telemetry_bus.start()
+
     # GPSD Startup
     if config["gpsd_enabled"]:
         gpsd_adaptor = GPSDAdaptor(
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Wideband IQ Channelizer
+#
+#   Released under GNU GPL v3 or later
+#
+#   Splits a wideband IQ stream (i.e. 2.4 MHz from a RTLSDR) into a set of narrowband
+#   (i.e. 48 kHz) channels, using overlap-save FFT filtering with frequency-domain decimation.
+#   A single forward FFT of each input block is shared between all channels.
+#
+import logging
+import numpy as np
+
+
+def design_lowpass(num_taps, cutoff):
+    """ Design a windowed-sinc (Blackman-Harris) FIR lowpass filter.
+
+    Args:
+        num_taps (int): Number of filter taps.
+        cutoff (float): Cutoff frequency, as a fraction of the sample rate (0 - 0.5).
+
+    Returns:
+        np.array: Filter taps, normalised to unity gain at DC.
+    """
+    _n = np.arange(num_taps) - (num_taps - 1) / 2.0
+    _h = 2 * cutoff * np.sinc(2 * cutoff * _n)
+
+    # 4-term Blackman-Harris window.
+    _x = 2 * np.pi * np.arange(num_taps) / (num_taps - 1)
+    _window = (
+        0.35875
+        - 0.48829 * np.cos(_x)
+        + 0.14128 * np.cos(2 * _x)
+        - 0.01168 * np.cos(3 * _x)
+    )
+
+    _h = _h * _window
+    return _h / np.sum(_h)
+
+
+def group_frequencies(frequencies, bandwidth, dc_guard=0):
+    """ Group a set of frequencies into the fewest number of tunings of a given bandwidth.
+
+    Args:
+        frequencies (list): Frequencies to group, in Hz.
+        bandwidth (float): Usable bandwidth of each tuning, in Hz.
+        dc_guard (float): If possible, shift each tuning so no frequency is within this distance (Hz) of the centre frequency,
+            to avoid the DC spike present on RTLSDRs.
+
+    Returns:
+        list: A list of (centre frequency (Hz), [frequencies]) tuples.
+    """
+    _freqs = np.sort(np.array(frequencies, dtype=float))
+    _groups = []
+
+    # Greedily grow each group from the lowest remaining frequency.
+    # For points on a line, this gives the minimum number of groups.
+    _i = 0
+    while _i < len(_freqs):
+        _end = np.searchsorted(
+            _freqs, _freqs[_i] + bandwidth - 2 * dc_guard, side="right"
+        )
+        _end = max(_end, _i + 1)
+        _group = _freqs[_i:_end]
+
+        _low = _group[0]
+        _high = _group[-1]
+        _centre = (_low + _high) / 2.0
+
+        if dc_guard > 0:
+            # Find a centre frequency that keeps all channels clear of DC, while still fitting within the bandwidth.
+            _slack = bandwidth / 2.0 - (_high - _low) / 2.0 - dc_guard
+            for _shift in np.linspace(0, max(_slack, 0), 10):
+                _clear_up = np.min(np.abs(_group - (_centre + _shift))) >= dc_guard
+                _clear_down = np.min(np.abs(_group - (_centre - _shift))) >= dc_guard
+                if _clear_up:
+                    _centre = _centre + _shift
+                    break
+                elif _clear_down:
+                    _centre = _centre - _shift
+                    break
+
+        _groups.append((_centre, list(_group)))
+        _i = _end
+
+    return _groups
+
+
+class ChannelizerChannel(object):
+    """ A single output channel of a Channelizer. """
+
+    def __init__(self, channelizer, frequency, output_rate, channel_bw):
+        """
+        Args:
+            channelizer (Channelizer): The channelizer this channel is part of.
+            frequency (float): Channel centre frequency, in Hz.
+            output_rate (int): Channel sample rate, in Hz.
+            channel_bw (float): Channel filter bandwidth, in Hz.
+        """
+        self.frequency = frequency
+        self.output_rate = int(output_rate)
+        self.decimation = channelizer.input_rate // self.output_rate
+
+        _fft_size = channelizer.fft_size
+        self.output_fft_size = _fft_size // self.decimation
+        self.output_discard = channelizer.overlap // self.decimation
+
+        # Frequency response of the channel filter.
+        _taps = design_lowpass(
+            channelizer.num_taps, (channel_bw / 2.0) / channelizer.input_rate
+        )
+        _response = np.fft.fft(_taps, _fft_size)
+
+        # Select the bins around DC which make up the decimated output spectrum.
+        _half = self.output_fft_size // 2
+        self.output_bins = np.concatenate(
+            (np.arange(0, _half), np.arange(_fft_size - _half, _fft_size))
+        )
+        self.filter_response = _response[self.output_bins] / self.decimation
+
+        # Bin offset of the channel.
+        _bin_width = channelizer.input_rate / float(_fft_size)
+        self.bin = int(round((frequency - channelizer.centre_freq) / _bin_width))
+        self.offset = (frequency - channelizer.centre_freq) - self.bin * _bin_width
+        self.output_bins = (self.output_bins + self.bin) % _fft_size
+
+        # Per-block phase correction.
+        # Shifting a channel down by k bins is equivalent to mixing with exp(-j*2*pi*k*n/N) with n restarting at
+        # each block, so the phase of each block needs to advance by 2*pi*k*block_step/N to be continuous.
+        self.phase_step = np.exp(
+            -2j * np.pi * self.bin * channelizer.block_step / float(_fft_size)
+        )
+        self.phase = 1.0 + 0.0j
+
+    def process(self, spectrum):
+        """ Extract the channel from the spectrum of an input block.
+
+        Args:
+            spectrum (np.array): FFT of an input block.
+
+        Returns:
+            np.array: Channel samples produced from the block.
+        """
+        # Rotate the channel to DC, filter and decimate by only keeping the bins around DC.
+        _out = np.fft.ifft(spectrum[self.output_bins] * self.filter_response)
+        _out = _out[self.output_discard :] * self.phase
+        self.phase *= self.phase_step
+        return _out
+
+
+class Channelizer(object):
+    """ FFT Overlap-Save Channelizer
+
+    Extracts a set of channels from a wideband complex IQ stream, producing a complex baseband
+    stream for each channel at a lower sample rate. The forward FFT of each input block is shared between
+    all channels, with only a (small) inverse FFT required per channel.
+
+    Channels default to the output sample rate given on creation, which must divide evenly into the input
+    sample rate. Channels can also be added at other rates, provided their decimation factor divides evenly
+    into the FFT size and overlap (see output_rate_for). Channels can be added and removed while the channelizer
+    is running, without disturbing the other channels.
+
+    Channel frequencies are rounded to the nearest FFT bin, and the rounding error (at most half the bin width)
+    is reported via the channel_offsets attribute.
+    """
+
+    def __init__(
+        self,
+        input_rate,
+        output_rate,
+        centre_freq,
+        channel_freqs,
+        channel_bw=None,
+        fft_size=None,
+        num_taps=None,
+    ):
+        """
+        Args:
+            input_rate (int): Input sample rate, in Hz.
+            output_rate (int): Output (channel) sample rate, in Hz. Must divide evenly into the input rate.
+            centre_freq (float): Centre frequency of the input stream, in Hz.
+            channel_freqs (list): Channel centre frequencies, in Hz. This may be empty, with channels added later
+                using add_channel.
+            channel_bw (float): Channel filter bandwidth (Hz). Defaults to 80% of the output sample rate.
+            fft_size (int): FFT size. Defaults to the input/output rate ratio multiplied by 1024. This is rounded up to
+                a power-of-two multiple of the input/output rate ratio.
+            num_taps (int): Channel filter length. Defaults to approximately a quarter of the FFT size.
+        """
+        if input_rate % output_rate != 0:
+            raise ValueError(
+                "Input rate (%d) must be a multiple of the output rate (%d)."
+                % (input_rate, output_rate)
+            )
+
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        self.decimation = self.input_rate // self.output_rate
+        self.centre_freq = centre_freq
+
+        if fft_size is None:
+            fft_size = self.decimation * 1024
+        # The FFT size must be a multiple of the decimation factor. Use a power-of-two multiple, to avoid
+        # FFT sizes with large prime factors (which are slow).
+        _blocks = 2 ** int(np.ceil(np.log2(np.ceil(fft_size / self.decimation))))
+        self.fft_size = _blocks * self.decimation
+
+        # The filter length is chosen so the overlap (num_taps-1) is a multiple of the decimation factor.
+        if num_taps is None:
+            num_taps = self.fft_size // 4
+        self.overlap = int(np.ceil((num_taps - 1) / self.decimation)) * self.decimation
+        self.num_taps = self.overlap + 1
+        # Number of new input samples consumed by each block.
+        self.block_step = self.fft_size - self.overlap
+
+        self.channels = []
+        for _freq in channel_freqs:
+            self.add_channel(_freq, channel_bw=channel_bw)
+
+        # Input buffer, starting with the overlap region zeroed.
+        self.buffer = np.zeros(self.overlap, dtype=np.complex64)
+
+    @property
+    def channel_freqs(self):
+        return [_c.frequency for _c in self.channels]
+
+    @property
+    def channel_offsets(self):
+        return [_c.offset for _c in self.channels]
+
+    def output_rate_for(self, sample_rate):
+        """ Find the lowest output rate this channelizer can produce which is at least a given sample rate.
+
+        Args:
+            sample_rate (int): Required sample rate, in Hz.
+
+        Returns:
+            int: Output rate, in Hz.
+        """
+        _decimation = max(self.input_rate // int(sample_rate), 1)
+        while (
+            (self.input_rate % _decimation != 0)
+            or (self.fft_size % _decimation != 0)
+            or (self.overlap % _decimation != 0)
+        ):
+            _decimation -= 1
+
+        return self.input_rate // _decimation
+
+    def add_channel(self, frequency, output_rate=None, channel_bw=None):
+        """ Add a channel.
+
+        Args:
+            frequency (float): Channel centre frequency, in Hz.
+            output_rate (int): Channel sample rate, in Hz. Defaults to the output rate of the channelizer.
+            channel_bw (float): Channel filter bandwidth (Hz). Defaults to 80% of the channel sample rate.
+
+        Returns:
+            ChannelizerChannel: The new channel.
+        """
+        if output_rate is None:
+            output_rate = self.output_rate
+
+        if output_rate != self.output_rate_for(output_rate):
+            raise ValueError(
+                "Output rate %d Hz is not supported by this channelizer." % output_rate
+            )
+
+        if abs(frequency - self.centre_freq) > (self.input_rate - output_rate) / 2.0:
+            raise ValueError(
+                "Channel %.3f MHz is outside the input bandwidth." % (frequency / 1e6)
+            )
+
+        if channel_bw is None:
+            channel_bw = 0.8 * output_rate
+
+        _channel = ChannelizerChannel(self, frequency, output_rate, channel_bw)
+        self.channels.append(_channel)
+        return _channel
+
+    def remove_channel(self, channel):
+        """ Remove a channel.
+
+        Args:
+            channel (ChannelizerChannel): Channel to remove, as returned by add_channel.
+        """
+        self.channels.remove(channel)
+
+    def process(self, samples):
+        """ Channelize a block of input samples.
+
+        Args:
+            samples (np.array): Complex input samples. These can be of any length.
+
+        Returns:
+            list: A list of complex sample arrays, one per channel, at each channel's output sample rate.
+                These may be empty if not enough input samples have been provided yet.
+        """
+        self.buffer = np.concatenate((self.buffer, samples.astype(np.complex64)))
+
+        if len(self.channels) == 0:
+            # Nothing to do, but keep enough samples for the next block to follow on.
+            _keep = self.overlap + (len(self.buffer) - self.overlap) % self.block_step
+            self.buffer = self.buffer[len(self.buffer) - _keep :]
+            return []
+
+        _outputs = [[] for _c in self.channels]
+
+        while len(self.buffer) >= self.fft_size:
+            _spectrum = np.fft.fft(self.buffer[: self.fft_size])
+
+            for _i, _channel in enumerate(self.channels):
+                _outputs[_i].append(_channel.process(_spectrum))
+
+            self.buffer = self.buffer[self.block_step :]
+
+        return [
+            np.concatenate(_o).astype(np.complex64)
+            if len(_o) > 0
+            else np.array([], dtype=np.complex64)
+            for _o in _outputs
+        ]
+
+
+def to_cs16(samples, scale=8192.0):
+    """ Convert complex samples to interleaved signed 16-bit IQ, as produced by rtl_fm -M raw.
+
+    Args:
+        samples (np.array): Complex samples.
+        scale (float): Scaling factor to apply.
+
+    Returns:
+        bytes: Interleaved 16-bit IQ data.
+    """
+    _out = np.empty(2 * len(samples), dtype=np.int16)
+    _out[0::2] = np.clip(samples.real * scale, -32768, 32767)
+    _out[1::2] = np.clip(samples.imag * scale, -32768, 32767)
+    return _out.tobytes()
+
+
+if __name__ == "__main__":
+    # Quick self-test - channelize a set of tones and check they end up where expected.
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s:%(message)s", level=logging.DEBUG
+    )
+
+    _fs = 2400000
+    _centre = 402000000
+    _t = np.arange(_fs) / float(_fs)
+    _tones = [401.5e6 + 1000, 402.3e6 - 2000, 402.9e6]
+    _x = np.zeros(len(_t), dtype=np.complex64)
+    for _tone in _tones:
+        _x += np.exp(2j * np.pi * (_tone - _centre) * _t).astype(np.complex64)
+
+    _chan = Channelizer(_fs, 48000, _centre, [401.5e6, 402.3e6, 402.9e6])
+
+    _outputs = [[] for _i in _tones]
+    for _block in np.array_split(_x, 37):
+        for _i, _out in enumerate(_chan.process(_block)):
+            _outputs[_i].append(_out)
+
+    for _i, _tone in enumerate(_tones):
+        _out = np.concatenate(_outputs[_i])[1000:]
+        _spec = np.abs(np.fft.fft(_out))
+        _peak = np.fft.fftfreq(len(_out), 1.0 / 48000)[np.argmax(_spec)]
+        print(
+            "Channel %.3f MHz: Expected tone offset %.1f Hz, Measured %.1f Hz, Amplitude %.3f"
+            % (
+                _chan.channel_freqs[_i] / 1e6,
+                _tone - _chan.channel_freqs[_i],
+                _peak,
+                np.mean(np.abs(_out)),
+            )
+        )
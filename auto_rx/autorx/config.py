@@ -135,6 +135,36 @@ def read_auto_rx_config(filename, no_sdr_test=False):
         "rs41_drift_tweak": False,
         "decoder_stats": False,
         "ngp_tweak": False,
+        "rtl_power_streaming": False,
+        "spectrum_backend": "rtl_power",
+        "spectrum_iq_source": "rtl_sdr",
+        "fft_sample_rate": 2048000,
+        "max_detection_sdrs": 1,
+        "wideband_detection": False,
+        "wideband_sample_rate": 2400000,
+        "whitelist_wideband_detection": False,
+        "detection_cache_time": 0,
+        "detection_cache_power_delta": 3.0,
+        "noise_floor_window": 0,
+        "noise_floor_percentile": 50.0,
+        "peak_clustering": False,
+        "peak_cluster_threshold": 5.0,
+        "peak_cluster_max_width": 100000,
+        "frequency_priority": False,
+        "frequency_priority_window": 1,
+        "detect_early_exit": False,
+        "detect_giveup_time": 3.0,
+        "detect_giveup_score": 0.9,
+        "detect_backend": "dft_detect",
+        "shared_sdr": False,
+        "virtual_sdr_decoding": False,
+        "spectrum_baseline": False,
+        "spectrum_baseline_time_constant": 60,
+        "spectrum_baseline_rise": 6.0,
+        "spectrum_baseline_stable_time": 4,
+        "spectrum_monitor": False,
+        "async_decoders": False,
+        "python_fm_demod": False,
         # Rotator Settings
         "enable_rotator": False,
         "rotator_update_rate": 30,
@@ -532,6 +562,254 @@ def read_auto_rx_config(filename, no_sdr_test=False):
             )
             auto_rx_config["experimental_decoders"]["IMET5"] = True
 
+        try:
+            auto_rx_config["rtl_power_streaming"] = config.getboolean(
+                "advanced", "rtl_power_streaming"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find rtl_power_streaming setting, using default (disabled)."
+            )
+            auto_rx_config["rtl_power_streaming"] = False
+
+        try:
+            auto_rx_config["spectrum_backend"] = config.get(
+                "advanced", "spectrum_backend"
+            )
+            auto_rx_config["spectrum_iq_source"] = config.get(
+                "advanced", "spectrum_iq_source"
+            )
+            auto_rx_config["fft_sample_rate"] = config.getint(
+                "advanced", "fft_sample_rate"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find spectrum backend settings, using default (rtl_power)."
+            )
+            auto_rx_config["spectrum_backend"] = "rtl_power"
+            auto_rx_config["spectrum_iq_source"] = "rtl_sdr"
+            auto_rx_config["fft_sample_rate"] = 2048000
+
+        if auto_rx_config["spectrum_backend"] not in ["rtl_power", "fft"]:
+            logging.error(
+                "Config - Unknown spectrum backend %s, using rtl_power."
+                % auto_rx_config["spectrum_backend"]
+            )
+            auto_rx_config["spectrum_backend"] = "rtl_power"
+
+        try:
+            auto_rx_config["detect_backend"] = config.get(
+                "advanced", "detect_backend"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find detect_backend setting, using default (dft_detect)."
+            )
+            auto_rx_config["detect_backend"] = "dft_detect"
+
+        if auto_rx_config["detect_backend"] not in ["dft_detect", "correlator"]:
+            logging.error(
+                "Config - Unknown detection backend %s, using dft_detect."
+                % auto_rx_config["detect_backend"]
+            )
+            auto_rx_config["detect_backend"] = "dft_detect"
+
+        try:
+            auto_rx_config["max_detection_sdrs"] = config.getint(
+                "advanced", "max_detection_sdrs"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find max_detection_sdrs setting, using default (1)."
+            )
+            auto_rx_config["max_detection_sdrs"] = 1
+
+        try:
+            auto_rx_config["wideband_detection"] = config.getboolean(
+                "advanced", "wideband_detection"
+            )
+            auto_rx_config["wideband_sample_rate"] = config.getint(
+                "advanced", "wideband_sample_rate"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find wideband_detection setting, using default (disabled)."
+            )
+            auto_rx_config["wideband_detection"] = False
+            auto_rx_config["wideband_sample_rate"] = 2400000
+
+        if auto_rx_config["wideband_sample_rate"] % 48000 != 0:
+            logging.error(
+                "Config - wideband_sample_rate must be a multiple of 48000 Hz, using default (2400000)."
+            )
+            auto_rx_config["wideband_sample_rate"] = 2400000
+
+        try:
+            auto_rx_config["whitelist_wideband_detection"] = config.getboolean(
+                "advanced", "whitelist_wideband_detection"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find whitelist_wideband_detection setting, using default (disabled)."
+            )
+            auto_rx_config["whitelist_wideband_detection"] = False
+
+        try:
+            auto_rx_config["detection_cache_time"] = config.getint(
+                "advanced", "detection_cache_time"
+            )
+            auto_rx_config["detection_cache_power_delta"] = config.getfloat(
+                "advanced", "detection_cache_power_delta"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find detection cache settings, using default (disabled)."
+            )
+            auto_rx_config["detection_cache_time"] = 0
+            auto_rx_config["detection_cache_power_delta"] = 3.0
+
+        try:
+            auto_rx_config["noise_floor_window"] = config.getfloat(
+                "advanced", "noise_floor_window"
+            )
+            auto_rx_config["noise_floor_percentile"] = config.getfloat(
+                "advanced", "noise_floor_percentile"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find noise floor estimation settings, using default (disabled)."
+            )
+            auto_rx_config["noise_floor_window"] = 0
+            auto_rx_config["noise_floor_percentile"] = 50.0
+
+        try:
+            auto_rx_config["peak_clustering"] = config.getboolean(
+                "advanced", "peak_clustering"
+            )
+            auto_rx_config["peak_cluster_threshold"] = config.getfloat(
+                "advanced", "peak_cluster_threshold"
+            )
+            auto_rx_config["peak_cluster_max_width"] = config.getfloat(
+                "advanced", "peak_cluster_max_width"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find peak clustering settings, using default (disabled, 5 dB, 100 kHz)."
+            )
+            auto_rx_config["peak_clustering"] = False
+            auto_rx_config["peak_cluster_threshold"] = 5.0
+            auto_rx_config["peak_cluster_max_width"] = 100000
+
+        try:
+            auto_rx_config["frequency_priority"] = config.getboolean(
+                "advanced", "frequency_priority"
+            )
+            auto_rx_config["frequency_priority_window"] = config.getint(
+                "advanced", "frequency_priority_window"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find frequency priority settings, using default (disabled, 1 hour window)."
+            )
+            auto_rx_config["frequency_priority"] = False
+            auto_rx_config["frequency_priority_window"] = 1
+
+        try:
+            auto_rx_config["detect_early_exit"] = config.getboolean(
+                "advanced", "detect_early_exit"
+            )
+            auto_rx_config["detect_giveup_time"] = config.getfloat(
+                "advanced", "detect_giveup_time"
+            )
+            auto_rx_config["detect_giveup_score"] = config.getfloat(
+                "advanced", "detect_giveup_score"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find detection early exit settings, using default (disabled, 3 seconds, 0.9)."
+            )
+            auto_rx_config["detect_early_exit"] = False
+            auto_rx_config["detect_giveup_time"] = 3.0
+            auto_rx_config["detect_giveup_score"] = 0.9
+
+        try:
+            auto_rx_config["shared_sdr"] = config.getboolean("advanced", "shared_sdr")
+        except:
+            logging.warning(
+                "Config - Did not find shared_sdr setting, using default (disabled)."
+            )
+            auto_rx_config["shared_sdr"] = False
+
+        try:
+            auto_rx_config["virtual_sdr_decoding"] = config.getboolean(
+                "advanced", "virtual_sdr_decoding"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find virtual_sdr_decoding setting, using default (disabled)."
+            )
+            auto_rx_config["virtual_sdr_decoding"] = False
+
+        try:
+            auto_rx_config["spectrum_baseline"] = config.getboolean(
+                "advanced", "spectrum_baseline"
+            )
+            auto_rx_config["spectrum_baseline_time_constant"] = config.getfloat(
+                "advanced", "spectrum_baseline_time_constant"
+            )
+            auto_rx_config["spectrum_baseline_rise"] = config.getfloat(
+                "advanced", "spectrum_baseline_rise"
+            )
+            auto_rx_config["spectrum_baseline_stable_time"] = config.getfloat(
+                "advanced", "spectrum_baseline_stable_time"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find spectrum baseline settings, using default (disabled, 60 minutes, 6 dB, 4 hours)."
+            )
+            auto_rx_config["spectrum_baseline"] = False
+            auto_rx_config["spectrum_baseline_time_constant"] = 60
+            auto_rx_config["spectrum_baseline_rise"] = 6.0
+            auto_rx_config["spectrum_baseline_stable_time"] = 4
+
+        try:
+            auto_rx_config["spectrum_monitor"] = config.getboolean(
+                "advanced", "spectrum_monitor"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find spectrum_monitor setting, using default (disabled)."
+            )
+            auto_rx_config["spectrum_monitor"] = False
+
+        try:
+            auto_rx_config["async_decoders"] = config.getboolean(
+                "advanced", "async_decoders"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find async_decoders setting, using default (disabled)."
+            )
+            auto_rx_config["async_decoders"] = False
+
+        try:
+            auto_rx_config["python_fm_demod"] = config.getboolean(
+                "advanced", "python_fm_demod"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find python_fm_demod setting, using default (disabled)."
+            )
+            auto_rx_config["python_fm_demod"] = False
+
+        if auto_rx_config["shared_sdr"]:
+            _span = (auto_rx_config["max_freq"] - auto_rx_config["min_freq"]) * 1e6
+            if _span > 0.8 * auto_rx_config["wideband_sample_rate"]:
+                logging.warning(
+                    "Config - Scan range (%.1f MHz) is wider than the usable bandwidth of the shared SDR capture (%.1f MHz). Only the centre of the scan range will be covered."
+                    % (_span / 1e6, 0.8 * auto_rx_config["wideband_sample_rate"] / 1e6)
+                )
+
         # If we are being called as part of a unit test, just return the config now.
         if no_sdr_test:
             return auto_rx_config
@@ -0,0 +1,535 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Sonde Header Correlator
+#
+#   Released under GNU GPL v3 or later
+#
+#   A NumPy implementation of the sonde type detection performed by dft_detect (in IQ mode), so detection
+#   can be run in-process rather than as a rtl_fm | dft_detect pipeline. IQ samples are FM demodulated,
+#   and correlated against the (pulse-shaped) frame header of each supported sonde type using FFT-based
+#   correlation. Any number of channels can be processed together, in which case the FFTs for all channels
+#   and sonde types are batched into single calls.
+#
+import logging
+import math
+import numpy as np
+from .channelizer import design_lowpass
+
+
+# Frame headers of each sonde type, as used by dft_detect.
+# Each entry is (type, baud rate, header bits, BT, detection threshold, max. header bit errors, FM lowpass, IF lowpass)
+#   FM lowpass: 0 = 4 kHz, 1 = 10 kHz (applied to the demodulated signal)
+#   IF lowpass: 0, 1 = if_bw, 2 = unfiltered (applied to the IQ before demodulation)
+# The types reported match the output of dft_detect, so can be parsed with scan.parse_dft_detect_output.
+SONDE_HEADERS = [
+    ("DFM9", 2500, "10011010100110010101101001010101", 1.0, 0.65, 2, 0, 0),
+    (
+        "RS41",
+        4800,
+        "00001000011011010101001110001000" "01000100011010010100100000011111",
+        0.5,
+        0.70,
+        2,
+        0,
+        0,
+    ),
+    (
+        "RS92",
+        4800,
+        "10100110011001101001"
+        "10100110011001101001"
+        "1010011001100110100110101010100110101001",
+        0.5,
+        0.70,
+        3,
+        0,
+        0,
+    ),
+    (
+        "LMS6",
+        4800,
+        "0101011000001000" "0001110010010111" "0001101010100111" "0011110100111110",
+        1.0,
+        0.60,
+        8,
+        0,
+        0,
+    ),
+    (
+        "IMET5",
+        4800,
+        "0000000001" "0101010101" "0001001001" "0001001001",
+        0.5,
+        0.80,
+        2,
+        0,
+        0,
+    ),
+    (
+        "MK2LMS",
+        9616,
+        "0010100111" "0010100111" "0001001001" "0010010101",
+        1.0,
+        0.70,
+        2,
+        1,
+        2,
+    ),
+    ("M10", 9608, "1001100110010100110010011001" "1010", 1.0, 0.76, 2, 1, 1),
+    (
+        "MEISEI",
+        2400,
+        "110011001101001101001101010100101010110010101010",
+        1.0,
+        0.70,
+        2,
+        0,
+        1,
+    ),
+    ("MRZ", 2400, "1001100110011001" "1001101010101010", 1.5, 0.80, 2, 0, 0),
+    (
+        "IMET1AB",
+        9600,
+        "0000"
+        "11110000111100001111000011110000"
+        "1111"
+        "0000"
+        "10101100110010101100101010101100"
+        "1111",
+        1.0,
+        0.80,
+        2,
+        1,
+        2,
+    ),
+    (
+        "IMETafsk",
+        9600,
+        "11110000111100001111000011110000" "11110000111100001111000011110000",
+        0.5,
+        0.80,
+        4,
+        1,
+        0,
+    ),
+]
+
+# Gain applied to the FM demodulator output (same as dft_detect).
+FM_GAIN = 0.8
+
+# FM (audio) lowpass bandwidths, in Hz.
+FM_LOWPASS_BW = [4000.0, 10000.0]
+
+
+def header_match_filter(bits, samples_per_bit, bt):
+    """ Generate the expected (Gaussian pulse-shaped) FM waveform of a header, normalised to unit energy.
+
+    Args:
+        bits (str): Header bits, as a string of '0' and '1' characters.
+        samples_per_bit (float): Samples per bit.
+        bt (float): Gaussian filter bandwidth-time product.
+
+    Returns:
+        np.array: Expected waveform.
+    """
+    _sigma = math.sqrt(math.log(2)) / (2 * math.pi * bt)
+    _erf = np.vectorize(math.erf)
+
+    def _pulse(t):
+        # Response of the Gaussian filter to a single bit centred on t=0.
+        return 0.5 * (
+            _erf((t + 0.5) / (_sigma * math.sqrt(2)))
+            - _erf((t - 0.5) / (_sigma * math.sqrt(2)))
+        )
+
+    _symbols = np.array([1.0 if _b == "1" else -1.0 for _b in bits])
+    _length = int(len(bits) * samples_per_bit + 0.5)
+
+    _i = np.arange(_length)
+    _pos = np.minimum((_i / samples_per_bit).astype(int), len(bits) - 1)
+    _t = (_i - _pos * samples_per_bit) / samples_per_bit - 0.5
+
+    # Each sample is affected by the current bit, and the bits either side of it.
+    _match = _symbols[_pos] * _pulse(_t)
+    _prev = _pos > 0
+    _match[_prev] += _symbols[_pos[_prev] - 1] * _pulse(_t[_prev] + 1)
+    _next = _pos < len(bits) - 1
+    _match[_next] += _symbols[_pos[_next] + 1] * _pulse(_t[_next] - 1)
+
+    return _match / np.sqrt(np.sum(_match ** 2))
+
+
+class SondeCorrelator(object):
+    """ Sonde Header Correlator
+
+    Detects sondes in one or more channels of IQ samples (i.e. 48 kHz, as produced by rtl_fm -M raw),
+    in the same way as dft_detect does with the --iq --dc options:
+        - The IQ samples are lowpass filtered and FM demodulated.
+        - Blocks of the demodulated signal are correlated against the expected waveform of each sonde type's header.
+        - Where the normalised correlation exceeds a threshold, the header bits are checked, and for some types
+          (M10/M20, iMet) some further checks are made to determine the exact type.
+        - The mean of the demodulated signal provides a frequency offset estimate.
+
+    Each channel stops being processed once a sonde has been detected in it.
+    """
+
+    # Time to wait after an iMet preamble is found to check the AFSK tones, in seconds.
+    IMET_CHECK_TIME = 1.0
+
+    def __init__(self, sample_rate=48000, channels=1, if_bw=20000):
+        """
+        Args:
+            sample_rate (int): IQ sample rate, in Hz.
+            channels (int): Number of channels to process.
+            if_bw (float): Bandwidth of the IF lowpass filter applied before demodulation, in Hz.
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.if_bw = if_bw
+
+        self.types = [_h[0] for _h in SONDE_HEADERS]
+        self.headers = [_h[2] for _h in SONDE_HEADERS]
+        self.thresholds = np.array([_h[4] for _h in SONDE_HEADERS])
+        self.max_errors = [_h[5] for _h in SONDE_HEADERS]
+        self.fm_lowpass = np.array([_h[6] for _h in SONDE_HEADERS])
+        self.if_lowpass = np.array([_h[7] for _h in SONDE_HEADERS])
+        self.samples_per_bit = [sample_rate / float(_h[1]) for _h in SONDE_HEADERS]
+
+        _matches = [
+            header_match_filter(_h[2], sample_rate / float(_h[1]), _h[3])
+            for _h in SONDE_HEADERS
+        ]
+        self.header_lengths = np.array([len(_m) for _m in _matches])
+
+        # Block sizes (as per dft_detect): Each correlation is performed over a window of
+        # fft_size samples, with enough history to contain the longest header.
+        self.history = 2 * int(np.max(self.header_lengths))
+        self.fft_size = 8192
+        while self.fft_size < 3 * self.history:
+            self.fft_size *= 2
+        self.window = self.fft_size
+        # Samples needed after the end of a header, to check the M10/M20 frame type.
+        self.tail = 256
+        # Each window searches for headers ending within the next 'step' samples.
+        self.step = self.window - self.history - self.tail
+
+        # Matched filters, time-reversed so the correlation can be performed as a convolution.
+        _filters = np.zeros((len(_matches), self.fft_size))
+        for _j, _match in enumerate(_matches):
+            _filters[_j, : len(_match)] = _match[::-1]
+        self.match_fft = np.fft.rfft(_filters, axis=-1)
+
+        # FM lowpass filters
+        _taps = int(4 * sample_rate / 2000) | 1
+        self.fm_delay = _taps // 2
+        _filters = np.zeros((len(FM_LOWPASS_BW), self.fft_size))
+        for _i, _bw in enumerate(FM_LOWPASS_BW):
+            _filters[_i, :_taps] = design_lowpass(_taps, _bw / sample_rate)
+        self.fm_lowpass_fft = np.fft.rfft(_filters, axis=-1)
+
+        # IF lowpass filter.
+        _taps = int(4 * sample_rate / 4000) | 1
+        self.if_taps = design_lowpass(_taps, if_bw / 2.0 / sample_rate)
+
+        # Per-channel state
+        # Last IQ samples of each channel, for the IF filter.
+        self.if_state = np.zeros((channels, len(self.if_taps) - 1), dtype=complex)
+        # Last filtered (and unfiltered) IQ sample of each channel, for the FM demodulator.
+        self.fm_state = np.ones((channels, 2), dtype=complex)
+        # Demodulated samples, for the filtered (0) and unfiltered (1) IQ.
+        self.buffer = np.zeros((channels, 2, 0))
+        # Number of samples processed.
+        self.samples = 0
+        # Highest correlation score seen in each channel, relative to the detection threshold.
+        self.max_scores = np.zeros(channels)
+        # Detection result for each channel.
+        self.results = [None] * channels
+        # Channels with an iMet preamble, awaiting a tone check: channel -> [score, offset, samples]
+        self.imet_pending = {}
+
+    def active_channels(self):
+        """ Get the indices of the channels which have not yet had a sonde detected. """
+        return [_c for _c in range(self.channels) if self.results[_c] is None]
+
+    def finished(self):
+        """ Check if all channels have had a sonde detected. """
+        return len(self.active_channels()) == 0
+
+    def demodulate(self, samples):
+        """ Filter and FM demodulate a block of IQ samples.
+
+        Args:
+            samples (np.array): IQ samples, with shape (channels, N).
+
+        Returns:
+            np.array: Demodulated samples, with shape (channels, 2, N).
+        """
+        # Remove any DC offset from the IQ.
+        samples = samples - np.mean(samples, axis=1, keepdims=True)
+
+        # IF lowpass filter, continuing on from the previous block.
+        _ext = np.concatenate((self.if_state, samples), axis=1)
+        _nfft = 1
+        while _nfft < _ext.shape[1]:
+            _nfft *= 2
+        _filtered = np.fft.ifft(
+            np.fft.fft(_ext, _nfft, axis=1) * np.fft.fft(self.if_taps, _nfft), axis=1
+        )[:, len(self.if_taps) - 1 : _ext.shape[1]]
+        self.if_state = _ext[:, _ext.shape[1] - (len(self.if_taps) - 1) :]
+
+        # FM demodulate
+        _iq = np.stack((_filtered, samples), axis=1)
+        _prev = np.concatenate(
+            (self.fm_state[:, :, np.newaxis], _iq[:, :, :-1]), axis=2
+        )
+        self.fm_state = _iq[:, :, -1]
+
+        return FM_GAIN * np.angle(_iq * np.conj(_prev)) / np.pi
+
+    def process(self, samples):
+        """ Process a block of IQ samples.
+
+        Args:
+            samples (np.array or list): IQ samples. Either a 1-D array (if there is only one channel),
+                or one equal-length array per channel.
+
+        Returns:
+            list: A list of (channel, type, score, offset) tuples, for each sonde detected in this block.
+                The type is as reported by dft_detect, the score is the normalised correlation (negative if the
+                signal is inverted), and the offset is the estimated frequency offset of the sonde, in Hz.
+        """
+        samples = np.atleast_2d(np.asarray(samples, dtype=complex))
+        if samples.shape[1] == 0:
+            return []
+
+        self.samples += samples.shape[1]
+        self.buffer = np.concatenate((self.buffer, self.demodulate(samples)), axis=2)
+
+        _detections = []
+
+        # Continue any pending iMet checks.
+        for _c in list(self.imet_pending.keys()):
+            _pending = self.imet_pending[_c]
+            _pending[2] = np.append(
+                _pending[2], self.buffer[_c, 0, -samples.shape[1] :]
+            )
+            _detections.extend(self.check_imet(_c))
+
+        while self.buffer.shape[2] >= self.window:
+            _detections.extend(self.correlate(self.buffer[:, :, : self.window]))
+            self.buffer = self.buffer[:, :, self.step :]
+
+        return _detections
+
+    def correlate(self, block):
+        """ Search for headers within a window of demodulated samples.
+
+        Args:
+            block (np.array): Demodulated samples, with shape (channels, 2, window).
+
+        Returns:
+            list: Detections, as per process()
+        """
+        _active = [_c for _c in self.active_channels() if _c not in self.imet_pending]
+        if len(_active) == 0:
+            return []
+
+        _block = block[_active]
+        # Demodulated stream used by each type (0 = IF filtered, 1 = unfiltered).
+        _stream = (self.if_lowpass == 2).astype(int)
+
+        # DC (i.e. frequency offset) of each stream, from the most recent samples.
+        _dc = np.mean(_block[:, :, -2 * self.history :], axis=2)
+
+        _x = np.fft.rfft(_block, self.fft_size, axis=2)
+        # Mostly remove the DC, as dft_detect does.
+        _x[:, :, 0] -= self.fft_size * _dc * 0.98
+
+        # Spectrum of each stream, FM lowpass filtered, for each sonde type. (channels, types, bins)
+        _x = _x[:, _stream, :] * self.fm_lowpass_fft[self.fm_lowpass][np.newaxis]
+        _filtered = np.fft.irfft(_x, self.fft_size, axis=2)
+        _corr = np.fft.irfft(_x * self.match_fft[np.newaxis], self.fft_size, axis=2)
+
+        # Find the correlation peak for each channel and type, extending the search by one sample
+        # either side so we can tell if the peak is at the edge of the search range.
+        _start = self.history - 2
+        _end = self.history + self.step
+        _peak = _start + np.argmax(np.abs(_corr[:, :, _start:_end]), axis=2)
+        _valid = (_peak >= self.history - 1) & (_peak < self.history - 1 + self.step)
+
+        # Normalise by the energy of the signal within the header.
+        _energy = np.concatenate(
+            (np.zeros(_filtered.shape[:2] + (1,)), np.cumsum(_filtered ** 2, axis=2)),
+            axis=2,
+        )
+        _norm = np.sqrt(
+            np.take_along_axis(_energy, (_peak + 1)[:, :, np.newaxis], axis=2)[:, :, 0]
+            - np.take_along_axis(
+                _energy,
+                (_peak + 1 - self.header_lengths[np.newaxis])[:, :, np.newaxis],
+                axis=2,
+            )[:, :, 0]
+        )
+        _score = np.take_along_axis(_corr, _peak[:, :, np.newaxis], axis=2)[:, :, 0]
+        _score = np.where(_norm > 0, _score / np.maximum(_norm, 1e-12), 0.0)
+
+        _relative = np.where(_valid, np.abs(_score) / self.thresholds[np.newaxis], 0.0)
+        self.max_scores[_active] = np.maximum(
+            self.max_scores[_active], np.max(_relative, axis=1)
+        )
+
+        _detections = []
+        for _i, _c in enumerate(_active):
+            _best = None
+            for _j in np.where(_relative[_i] > 1.0)[0]:
+                _type = self.check_header(
+                    _filtered[_i, _j], _peak[_i, _j], _j, _score[_i, _j]
+                )
+                if _type is None:
+                    continue
+
+                if (_best is None) or (abs(_score[_i, _j]) > abs(_best[1])):
+                    _offset = _dc[_i, _stream[_j]] * self.sample_rate / (2.0 * FM_GAIN)
+                    _best = (_type, _score[_i, _j], _offset, _j)
+
+            if _best is None:
+                continue
+
+            (_type, _sc, _offset, _j) = _best
+            if _type == "IMETafsk":
+                # Check the AFSK tones over the next second before reporting anything.
+                # The window is at the start of the buffer, so samples after it can be included too.
+                self.imet_pending[_c] = [
+                    abs(_sc),
+                    _offset,
+                    self.buffer[_c, 0, _peak[_i, _j] + 1 :],
+                ]
+                _detections.extend(self.check_imet(_c))
+            else:
+                self.results[_c] = (_type, _sc, _offset)
+                _detections.append((_c, _type, _sc, _offset))
+
+        return _detections
+
+    def check_header(self, signal, peak, type_idx, score):
+        """ Check the bits of a header found by correlation.
+
+        Args:
+            signal (np.array): Filtered demodulated signal.
+            peak (int): Index of the last sample of the header.
+            type_idx (int): Index of the sonde type in SONDE_HEADERS.
+            score (float): Correlation score. A negative score indicates an inverted signal.
+
+        Returns:
+            str/None: The sonde type, or None if the header bits contain too many errors.
+        """
+        _spb = self.samples_per_bit[type_idx]
+        _header = self.headers[type_idx]
+        _inverted = score < 0
+
+        _bits = self.read_bits(
+            signal, peak + 1 - self.header_lengths[type_idx], _spb, len(_header)
+        )
+        if _inverted:
+            _bits = ~_bits
+        _expected = np.array([_b == "1" for _b in _header])
+
+        if np.sum(_bits != _expected) >= self.max_errors[type_idx]:
+            return None
+
+        _type = self.types[type_idx]
+        if _type == "M10":
+            _type = self.check_m10(signal, peak, _spb, _header, _inverted)
+
+        return _type
+
+    def read_bits(self, signal, start, samples_per_bit, count, manchester=False):
+        """ Read bits from a demodulated signal, by summing the samples within each bit period.
+
+        Args:
+            signal (np.array): Demodulated signal.
+            start (int): Index of the first sample of the first bit.
+            samples_per_bit (float): Samples per bit.
+            count (int): Number of bits to read.
+            manchester (bool): If True, each bit is two symbols long, and is read as the difference between them.
+
+        Returns:
+            np.array: Boolean array of bits.
+        """
+        _symbols = 2 * count if manchester else count
+        _edges = start + np.ceil(np.arange(_symbols + 1) * samples_per_bit).astype(int)
+        _edges = np.clip(_edges, 0, len(signal))
+        # Pad the signal so every edge is a valid index. reduceat returns the value of the
+        # starting sample (rather than 0) for empty blocks, so these are cleared.
+        _sums = np.add.reduceat(np.append(signal, 0.0), _edges)[:-1]
+        _sums = np.where(_edges[1:] > _edges[:-1], _sums, 0.0)
+
+        if manchester:
+            _sums = _sums[0::2] - _sums[1::2]
+
+        return _sums >= 0
+
+    def check_m10(self, signal, peak, samples_per_bit, header, inverted):
+        """ Determine if a M10-type header belongs to a M10 or M20, using the frame type byte which follows it. """
+        # The first bits of the frame are part of the header.
+        _ofs = max(0, min((len(header) - 28) // 2, 8))
+        _mb = [(header[28 + 2 * _k] == "1") != inverted for _k in range(_ofs)]
+        _mb += list(
+            self.read_bits(
+                signal, peak + 1, samples_per_bit, 16 - _ofs, manchester=True
+            )
+        )
+
+        # Differential decoding
+        _bit0 = inverted
+        _value = 0
+        for _b in _mb:
+            _value = (_value << 1) | int(_b == _bit0)
+            _bit0 = _b
+
+        _weight = bin(_value & 0x0F).count("1")
+        if _weight < 2 or (_weight == 2 and (_value & 0xF0) == 0x20):
+            return "M20"
+        else:
+            return "M10"
+
+    def check_imet(self, channel):
+        """ Check the tones following an iMet preamble, once enough samples are available.
+        iMet-4 (and iMet-1-RS) sondes use 1200/2200 Hz AFSK, which other iMet variants don't.
+
+        Returns:
+            list: Detections, as per process()
+        """
+        (_score, _offset, _samples) = self.imet_pending[channel]
+        if len(_samples) < self.IMET_CHECK_TIME * self.sample_rate:
+            return []
+
+        self.imet_pending.pop(channel)
+        _samples = _samples[: int(self.IMET_CHECK_TIME * self.sample_rate)]
+
+        # Average the magnitude spectrum over blocks of samples.
+        _block = self.fft_size // 2 - 3
+        _count = len(_samples) // _block
+        _blocks = _samples[: _count * _block].reshape(_count, _block)
+        _spectrum = np.sum(np.abs(np.fft.rfft(_blocks, self.fft_size, axis=1)), axis=0)
+
+        _df = self.sample_rate / float(self.fft_size)
+        _width = max(int(50.0 / _df), 1)
+
+        def _tone_power(freq):
+            _bin = int(freq / _df) - _width // 4
+            return np.sum(_spectrum[_bin : _bin + _width])
+
+        _p800 = _tone_power(800)
+        _p2200 = _tone_power(2200)
+        _p2400 = _tone_power(2400)
+
+        if (_p2200 > _p2400) and (_p2200 > _p800):
+            self.results[channel] = ("IMET4", _score, _offset)
+            return [(channel, "IMET4", _score, _offset)]
+
+        logging.debug(
+            "Correlator - iMet preamble found in channel %d, but not iMet-4 tones."
+            % channel
+        )
+        return []
@@ -5,18 +5,26 @@
 #   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
 #   Released under GNU GPL v3 or later
 #
+import asyncio
 import autorx
 import logging
-import json
-import os
-import signal
-import subprocess
+import shlex
+import sys
 import time
 import traceback
-from dateutil.parser import parse
 from threading import Thread
+from concurrent.futures import TimeoutError
 from types import FunctionType, MethodType
-from .utils import AsynchronousFileReader, rtlsdr_test, position_info
+from .decoder_runtime import get_decoder_runtime, open_pipe_reader, read_lines
+from .fm_demod import FMDemodulator
+from .pipeline import Pipeline
+from .utils import (
+    AsynchronousFileReader,
+    rtlsdr_test,
+    position_info,
+    parse_telemetry_json,
+    parse_telemetry_datetime,
+)
 from .gps import get_ephemeris, get_almanac
 from .sonde_specific import *
 from .fsk_demod import FSKDemodStats
@@ -42,6 +50,10 @@ VALID_SONDE_TYPES = [
 # is now applied to all radiosonde types. This may need to be re-evaluated in the future.
 DRIFTY_SONDE_TYPES = VALID_SONDE_TYPES  # ['RS92', 'DFM', 'LMS6']
 
+# Maximum time to wait for an asynchronous decoder task to finish when stopping it, in seconds.
+# The pipeline is killed after 2 seconds, so this should only be reached if the task itself is stuck.
+DECODER_STOP_TIMEOUT = 10
+
 
 class SondeDecoder(object):
     """
@@ -134,6 +146,9 @@ class SondeDecoder(object):
         rs41_drift_tweak=False,
         experimental_decoder=False,
         imet_location="SONDE",
+        wideband_capture=None,
+        async_runtime=False,
+        python_fm_demod=False,
     ):
         """ Initialise and start a Sonde Decoder.
 
@@ -165,6 +180,14 @@ class SondeDecoder(object):
             experimental_decoder (bool): If True, use the experimental fsk_demod-based decode chain.
 
             imet_location (str): OPTIONAL - A location field which is use in the generation of iMet unique ID.
+
+            wideband_capture (WidebandCapture): OPTIONAL - Decode from a channel of this shared wideband capture, instead of
+                running rtl_fm on the SDR. Only supported by the experimental decode chain.
+
+            async_runtime (bool): If True, manage the decoder subprocesses on the shared asyncio decoder runtime
+                (refer autorx.decoder_runtime), instead of using a set of polling threads for each decoder.
+            python_fm_demod (bool): If True, FM demodulate and resample the signal in-process (refer autorx.fm_demod),
+                instead of using rtl_fm's FM demodulator and sox. Only applies to the standard decode chain.
         """
         # Thread running flag
         self.decoder_running = True
@@ -188,6 +211,18 @@ class SondeDecoder(object):
         self.rs41_drift_tweak = rs41_drift_tweak
         self.experimental_decoder = experimental_decoder
         self.imet_location = imet_location
+        self.wideband_capture = wideband_capture
+        self.async_runtime = async_runtime
+        self.python_fm_demod = python_fm_demod
+
+        # Channel of the shared wideband capture, if one is in use, and the thread feeding it to the demodulator.
+        self.iq_channel = None
+        self.iq_channel_thread = None
+
+        # rtl_fm pipeline and in-process FM demodulator, if in use, and the thread feeding the demodulator output to the decoder.
+        self.sdr_pipeline = None
+        self.fm_demod = None
+        self.fm_demod_thread = None
 
         # iMet ID store. We latch in the first iMet ID we calculate, to avoid issues with iMet-1-RS units
         # which don't necessarily have a consistent packet count to time increment ratio.
@@ -195,8 +230,10 @@ class SondeDecoder(object):
         # not flooding the various databases with sonde IDs in the case of a bad sonde.
         self.imet_id = None
 
-        # This will become our decoder thread.
+        # This will become our decoder thread (or a Future, if using the async runtime).
         self.decoder = None
+        # Set to stop the decoder, when using the async runtime.
+        self.decoder_stop = None
 
         self.exit_state = "OK"
 
@@ -218,7 +255,11 @@ class SondeDecoder(object):
             return
 
         # Test if the supplied RTLSDR is working.
-        _rtlsdr_ok = rtlsdr_test(device_idx)
+        if self.wideband_capture is not None:
+            # The SDR is already running the shared capture.
+            _rtlsdr_ok = self.wideband_capture.running()
+        else:
+            _rtlsdr_ok = rtlsdr_test(device_idx)
 
         # TODO: How should this error be handled?
         if not _rtlsdr_ok:
@@ -254,89 +295,137 @@ class SondeDecoder(object):
             # Otherwise, bomb out.
             raise TypeError("Supplied exporter has incorrect type.")
 
-        self.decoder_command = None  # Decoder command for 'regular' decoders.
-        self.decoder_command_2 = (
-            None  # Second part of split demod/decode command for experimental decoders.
+        self.decoder_pipeline = (
+            None  # Pipeline of processes which run the demodulator and decoder.
         )
         self.demod_stats = (
             None  # FSKDemodStats object, used to parse demodulator statistics.
         )
 
+        if (self.wideband_capture is not None) and (not self.experimental_decoder):
+            self.log_error(
+                "Shared wideband capture requires the experimental decoder chain."
+            )
+            self.decoder_running = False
+            return
+
         # Generate the decoder command.
         if self.experimental_decoder:
             # Create a copy of the RX frequency, which will be updated when generating the decoder command.
             self.rx_frequency = self.sonde_freq
-            # Generate the demodulator / decoder commands, and get the fsk_demod stats parser, tuned for the particular
+            # Generate the demodulator / decoder pipeline, and get the fsk_demod stats parser, tuned for the particular
             # sonde.
-            (
-                self.decoder_command,
-                self.decoder_command_2,
-                self.demod_stats,
-            ) = self.generate_decoder_command_experimental()
+            try:
+                _commands = self.generate_decoder_command_experimental()
+            except ValueError as e:
+                # The shared wideband capture can't provide a channel for this sonde.
+                self.log_error("Could not use shared wideband capture - %s" % str(e))
+                _commands = None
+
+            if _commands is not None:
+                (self.decoder_pipeline, self.demod_stats) = _commands
         else:
-            # 'Regular' decoder - just a single command.
-            self.decoder_command = self.generate_decoder_command()
+            # 'Regular' decoder - no demodulator statistics.
+            self.decoder_pipeline = self.generate_decoder_command()
 
-        if self.decoder_command is None:
+        if self.decoder_pipeline is None:
             self.log_error("Could not generate decoder command. Not starting decoder.")
             self.decoder_running = False
+
+            if self.iq_channel is not None:
+                self.iq_channel.close()
         else:
             # Start up the decoder thread.
-            self.decode_process = None
             self.async_reader = None
 
             self.decoder_running = True
-            self.decoder = Thread(target=self.decoder_thread)
-            self.decoder.start()
+            if self.async_runtime:
+                self.decoder = get_decoder_runtime().submit(self.decoder_task())
+            else:
+                self.decoder = Thread(target=self.decoder_thread)
+                self.decoder.start()
 
-    def generate_decoder_command(self):
-        """ Generate the shell command which runs the relevant radiosonde decoder - Standard decoders.
+    def sdr_fm_stage(self, mode, sample_rate, frequency):
+        """ Generate the rtl_fm command which receives the sonde signal.
+
+        Args:
+            mode (str): rtl_fm demodulation mode ('fm' or 'raw').
+            sample_rate (int/str): Output sample rate (i.e. 48000, or '48k').
+            frequency (int): Receive frequency, in Hz.
 
         Returns:
-            str/None: The shell command which will be run in the decoder thread, or none if a valid decoder could not be found.
+            list: The rtl_fm command, as a list of arguments.
         """
-        # Common options to rtl_fm
+        _cmd = shlex.split(self.sdr_fm)
 
         # Add a -T option if bias is enabled
-        bias_option = "-T " if self.bias else ""
+        if self.bias:
+            _cmd.append("-T")
+
+        _cmd += ["-p", "%d" % int(self.ppm), "-d", str(self.device_idx)]
 
         # Add a gain parameter if we have been provided one.
         if self.gain != -1:
-            gain_param = "-g %.1f " % self.gain
-        else:
-            gain_param = ""
+            _cmd += ["-g", "%.1f" % self.gain]
+
+        _cmd += ["-M", mode, "-F9", "-s", str(sample_rate), "-f", "%d" % frequency]
+
+        return _cmd
+
+    def sox_stage(self, sample_rate, effects):
+        """ Generate the sox command which converts the rtl_fm output to 48 kHz 8-bit audio for the decoders.
+
+        Args:
+            sample_rate (int): rtl_fm output sample rate.
+            effects (list): Filters to apply, as a list of (type, frequency) tuples, where type is 'highpass' or 'lowpass'.
+
+        Returns:
+            list: The sox command, as a list of arguments.
+        """
+        return [
+            "sox",
+            "-t",
+            "raw",
+            "-r",
+            str(sample_rate),
+            "-e",
+            "s",
+            "-b",
+            "16",
+            "-c",
+            "1",
+            "-",
+            "-r",
+            "48000",
+            "-b",
+            "8",
+            "-t",
+            "wav",
+            "-",
+        ] + [str(_arg) for _effect in effects for _arg in _effect]
+
+    def generate_decoder_command(self):
+        """ Generate the pipeline which runs the relevant radiosonde decoder - Standard decoders.
+
+        Returns:
+            Pipeline/None: The pipeline which will be run in the decoder thread, or none if a valid decoder could not be found.
+        """
 
         if self.sonde_type == "RS41":
             # RS41 Decoder command.
             # rtl_fm -p 0 -g -1 -M fm -F9 -s 15k -f 405500000 | sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - lowpass 2600 2>/dev/null | ./rs41ecc --crc --ecc --ptu
             # Note: Have removed a 'highpass 20' filter from the sox line, will need to re-evaluate if adding that is useful in the future.
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null | " % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
+            _rx_bw = 15000
 
             # If selected by the user, we can add a highpass filter into the sox command. This helps handle up to about 5ppm of receiver drift
             # before performance becomes significantly degraded. By default this is off, as it is not required with TCXO RTLSDRs, and actually
             # slightly degrades performance.
             if self.rs41_drift_tweak:
-                _highpass = "highpass 20 "
+                _filters = [("highpass", 20), ("lowpass", 2600)]
             else:
-                _highpass = ""
-
-            decode_cmd += (
-                "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - %slowpass 2600 2>/dev/null | "
-                % _highpass
-            )
+                _filters = [("lowpass", 2600)]
 
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
-
-            decode_cmd += "./rs41mod --ptu2 --json 2>/dev/null"
+            _decoder = ["./rs41mod", "--ptu2", "--json"]
 
         elif self.sonde_type == "RS92":
             # Decoding a RS92 requires either an ephemeris or an almanac file.
@@ -361,48 +450,36 @@ class SondeDecoder(object):
                         )
                         return None
                     else:
-                        _rs92_gps_data = "-a almanac.txt --gpsepoch 2"  # Note - This will need to be updated in... 19 years.
+                        _rs92_gps_data = [
+                            "-a",
+                            "almanac.txt",
+                            "--gpsepoch",
+                            "2",
+                        ]  # Note - This will need to be updated in... 19 years.
                 else:
-                    _rs92_gps_data = "-e ephemeris.dat"
+                    _rs92_gps_data = ["-e", "ephemeris.dat"]
             else:
-                _rs92_gps_data = "-e %s" % self.rs92_ephemeris
+                _rs92_gps_data = ["-e", self.rs92_ephemeris]
 
             # Adjust the receive bandwidth based on the band the scanning is occuring in.
             if self.sonde_freq < 1000e6:
                 # 400-406 MHz sondes - use a 12 kHz FM demod bandwidth.
                 _rx_bw = 12000
                 # We may be able to get PTU data from these!
-                _ptu_opts = "--ptu"
+                _ptu_opts = ["--ptu"]
             else:
                 # 1680 MHz sondes - use a 28 kHz FM demod bandwidth.
                 # NOTE: This is a first-pass of this bandwidth, and may need to be optimized.
                 _rx_bw = 28000
                 # No PTU data availble for RS92-NGP sondes.
-                _ptu_opts = "--ngp --ptu"
+                _ptu_opts = ["--ngp", "--ptu"]
 
-            # Now construct the decoder command.
             # rtl_fm -p 0 -g 26.0 -M fm -F9 -s 12k -f 400500000 | sox -t raw -r 12k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 lowpass 2500 2>/dev/null | ./rs92ecc -vx -v --crc --ecc --vel -e ephemeris.dat
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _rx_bw,
-                self.sonde_freq,
-            )
-            decode_cmd += (
-                "sox -t raw -r %d -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - lowpass 2500 highpass 20 2>/dev/null |"
-                % _rx_bw
-            )
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
-
-            decode_cmd += (
-                "./rs92mod -vx -v --crc --ecc --vel --json %s %s 2>/dev/null"
-                % (_rs92_gps_data, _ptu_opts)
+            _filters = [("lowpass", 2500), ("highpass", 20)]
+            _decoder = (
+                ["./rs92mod", "-vx", "-v", "--crc", "--ecc", "--vel", "--json"]
+                + _rs92_gps_data
+                + _ptu_opts
             )
 
         elif self.sonde_type == "DFM":
@@ -410,215 +487,140 @@ class SondeDecoder(object):
             # As of 2019-02-10, dfm09ecc auto-detects if the signal is inverted,
             # so we don't need to specify an invert flag.
             # 2019-02-27: Added the --dist flag, which should reduce bad positions a bit.
-
-            # Note: Have removed a 'highpass 20' filter from the sox line, will need to re-evaluate if adding that is useful in the future.
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 lowpass 2000 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
+            _rx_bw = 15000
+            _filters = [("highpass", 20), ("lowpass", 2000)]
 
             # DFM decoder
-            decode_cmd += "./dfm09mod -vv --ecc --json --dist --auto 2>/dev/null"
+            _decoder = ["./dfm09mod", "-vv", "--ecc", "--json", "--dist", "--auto"]
 
         elif self.sonde_type == "M10":
             # M10 Sondes
-
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 22k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 22k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
+            _rx_bw = 22000
+            _filters = [("highpass", 20)]
 
             # M10 decoder
-            decode_cmd += "./m10mod --json --ptu -vvv 2>/dev/null"
+            _decoder = ["./m10mod", "--json", "--ptu", "-vvv"]
 
         elif self.sonde_type == "IMET":
             # iMet-4 Sondes
-
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
+            _rx_bw = 15000
+            _filters = [("highpass", 20)]
 
             # iMet-4 (IMET1RS) decoder
-            decode_cmd += "./imet1rs_dft --json 2>/dev/null"
+            _decoder = ["./imet1rs_dft", "--json"]
 
         elif self.sonde_type == "IMET5":
-            # iMet-54 Sondes
-
-            decode_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s 48k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
+            # iMet-54 Sondes - these are decoded from IQ, so there is no sox stage.
+            _pipeline = Pipeline()
+            _pipeline.add_stage(self.sdr_fm_stage("raw", "48k", self.sonde_freq))
 
-            # Add in tee command to save audio to disk if debugging is enabled.
+            # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                decode_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
 
             # iMet-54 Decoder
-            decode_cmd += (
-                "./imet54mod --ecc --IQ 0.0 --lp - 48000 16 --json --ptu 2>/dev/null"
+            _pipeline.add_stage(
+                [
+                    "./imet54mod",
+                    "--ecc",
+                    "--IQ",
+                    "0.0",
+                    "--lp",
+                    "-",
+                    "48000",
+                    "16",
+                    "--json",
+                    "--ptu",
+                ]
             )
+            return _pipeline
 
         elif self.sonde_type == "MRZ":
             # Meteo-Radiy MRZ Sondes
-
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
+            _rx_bw = 15000
+            _filters = [("highpass", 20)]
 
             # MRZ decoder
-            decode_cmd += "./mp3h1mod --auto --json --ptu 2>/dev/null"
+            _decoder = ["./mp3h1mod", "--auto", "--json", "--ptu"]
 
         elif self.sonde_type == "MK2LMS":
             # 1680 MHz LMS6 sondes, using 9600 baud MK2A-format telemetry.
             # TODO: see if we need to use a high-pass filter, and how much it degrades telemetry reception.
             # This fsk_demod command *almost* works (using the updated fsk_demod)
             # rtl_fm -p 0 -d 0 -M raw -F9 -s 307712 -f 1676000000 2>/dev/null |~/Dev/codec2-upstream/build/src/fsk_demod --cs16 -p 32 --mask=100000 --stats=5  2 307712 9616 - - 2> stats.txt | python ./test/bit_to_samples.py 48080 9616 | sox -t raw -r 48080 -e unsigned-integer -b 8 -c 1 - -r 48080 -b 8 -t wav - 2>/dev/null| ./mk2a_lms1680 --json
+            _rx_bw = 200000
+            _filters = [("highpass", 20)]
 
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 200k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 200k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
-
-            # iMet-4 (IMET1RS) decoder
             if self.inverted:
                 self.log_debug("Using inverted MK2A decoder.")
-                decode_cmd += "./mk2a_lms1680 -i --json 2>/dev/null"
+                _decoder = ["./mk2a_lms1680", "-i", "--json"]
             else:
-                decode_cmd += "./mk2a_lms1680 --json 2>/dev/null"
+                _decoder = ["./mk2a_lms1680", "--json"]
 
         elif self.sonde_type.startswith("LMS"):
             # LMS6 Decoder command.
             # rtl_fm -p 0 -g -1 -M fm -F9 -s 15k -f 405500000 | sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - lowpass 2600 2>/dev/null | ./rs41ecc --crc --ecc --ptu
             # Note: Have removed a 'highpass 20' filter from the sox line, will need to re-evaluate if adding that is useful in the future.
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null | " % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
+            _rx_bw = 15000
 
             # If selected by the user, we can add a highpass filter into the sox command. This helps handle up to about 5ppm of receiver drift
             # before performance becomes significantly degraded. By default this is off, as it is not required with TCXO RTLSDRs, and actually
             # slightly degrades performance.
             if self.rs41_drift_tweak:
-                _highpass = "highpass 20 "
+                _filters = [("highpass", 20), ("lowpass", 2600)]
             else:
-                _highpass = ""
-
-            decode_cmd += (
-                "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - %slowpass 2600 2>/dev/null | "
-                % _highpass
-            )
+                _filters = [("lowpass", 2600)]
 
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
-
-            decode_cmd += "./lms6Xmod --json 2>/dev/null"
+            _decoder = ["./lms6Xmod", "--json"]
 
         elif self.sonde_type == "MEISEI":
             # Meisei IMS-100 Sondes
             # Starting out with a 15 kHz bandwidth filter.
-
-            decode_cmd = "%s %s-p %d -d %s %s-M fm -F9 -s 15k -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                self.sonde_freq,
-            )
-            decode_cmd += "sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -b 8 -t wav - highpass 20 2>/dev/null |"
-
-            # Add in tee command to save audio to disk if debugging is enabled.
-            if self.save_decode_audio:
-                decode_cmd += " tee decode_%s.wav |" % str(self.device_idx)
+            _rx_bw = 15000
+            _filters = [("highpass", 20)]
 
             # Meisei IMS-100 decoder
-            decode_cmd += "./meisei100mod --json 2>/dev/null"
+            _decoder = ["./meisei100mod", "--json"]
 
         elif self.sonde_type == "UDP":
             # UDP Input Mode.
             # Used only for testing of new decoders, prior to them being integrated into auto_rx.
-            decode_cmd = "python -m autorx.udplistener"
+            return Pipeline().add_stage([sys.executable, "-m", "autorx.udplistener"])
 
         else:
             return None
 
-        return decode_cmd
+        if self.python_fm_demod:
+            # rtl_fm -M raw | (in-process FM demodulator) | decoder
+            # The demodulator output is written into the decoder pipeline by the decoder thread.
+            self.sdr_pipeline = Pipeline().add_stage(
+                self.sdr_fm_stage("raw", _rx_bw, self.sonde_freq)
+            )
+            self.fm_demod = FMDemodulator(_rx_bw, _filters)
+            _pipeline = Pipeline(stdin=True)
+        else:
+            # rtl_fm | sox | decoder
+            _pipeline = Pipeline()
+            _pipeline.add_stage(self.sdr_fm_stage("fm", _rx_bw, self.sonde_freq))
+            _pipeline.add_stage(self.sox_stage(_rx_bw, _filters))
+
+        # Add in tee command to save audio to disk if debugging is enabled.
+        if self.save_decode_audio:
+            _pipeline.add_stage(["tee", "decode_%s.wav" % str(self.device_idx)])
+
+        _pipeline.add_stage(_decoder)
+
+        return _pipeline
 
     def generate_decoder_command_experimental(self):
-        """ Generate the shell command which runs the relevant radiosonde decoder - Experimental Decoders
+        """ Generate the pipeline which runs the relevant radiosonde demodulator and decoder - Experimental Decoders
 
         Returns:
-            Tuple(str, str, FSKDemodState) / None: The demod & decoder commands, and a FSKDemodStats object to process the demodulator statistics.
+            Tuple(Pipeline, FSKDemodState) / None: The demod & decoder pipeline, and a FSKDemodStats object to process the demodulator statistics.
 
         """
 
         self.log_info("Using fsk_demod decoder chain.")
-        # Common options to rtl_fm
-
-        # Add a -T option if bias is enabled
-        bias_option = "-T " if self.bias else ""
-
-        # Add a gain parameter if we have been provided one.
-        if self.gain != -1:
-            gain_param = "-g %.1f " % self.gain
-        else:
-            gain_param = ""
 
         # Emit demodulator statistics every X modem frames.
         _stats_rate = 5
@@ -634,28 +636,31 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -b %d -u %d -s --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
-            decode_cmd = "./rs41mod --ptu2 --json --softin -i 2>/dev/null"
+            _pipeline.add_stage(["./rs41mod", "--ptu2", "--json", "--softin", "-i"])
 
             # RS41s transmit pulsed beacons - average over the last 2 frames, and use a peak-hold
             demod_stats = FSKDemodStats(averaging_time=2.0, peak_hold=True)
@@ -684,20 +689,25 @@ class SondeDecoder(object):
                         )
                         return None
                     else:
-                        _rs92_gps_data = "-a almanac.txt --gpsepoch 2"  # Note - This will need to be updated in... 19 years.
+                        _rs92_gps_data = [
+                            "-a",
+                            "almanac.txt",
+                            "--gpsepoch",
+                            "2",
+                        ]  # Note - This will need to be updated in... 19 years.
                 else:
-                    _rs92_gps_data = "-e ephemeris.dat"
+                    _rs92_gps_data = ["-e", "ephemeris.dat"]
             else:
-                _rs92_gps_data = "-e %s" % self.rs92_ephemeris
+                _rs92_gps_data = ["-e", self.rs92_ephemeris]
 
             if self.sonde_freq > 1000e6:
                 # Use a higher IQ rate for 1680 MHz sondes, at the expense of some CPU usage.
                 _sdr_rate = 96000
-                _ptu_ops = "--ngp --ptu"
+                _ptu_ops = ["--ngp", "--ptu"]
             else:
                 # On 400 MHz, use 48 khz - RS92s dont drift far enough to need any more than this.
                 _sdr_rate = 48000
-                _ptu_ops = "--ptu"
+                _ptu_ops = ["--ptu"]
 
             _output_rate = 48000
             _baud_rate = 4800
@@ -708,31 +718,45 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
 
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -b %d -u %d -s --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
-            decode_cmd = (
-                "./rs92mod -vx -v --crc --ecc --vel --json --softin -i %s %s 2>/dev/null"
-                % (_rs92_gps_data, _ptu_ops)
+            _pipeline.add_stage(
+                [
+                    "./rs92mod",
+                    "-vx",
+                    "-v",
+                    "--crc",
+                    "--ecc",
+                    "--vel",
+                    "--json",
+                    "--softin",
+                    "-i",
+                ]
+                + _rs92_gps_data
+                + _ptu_ops
             )
 
             # RS92s transmit continuously - average over the last 2 frames, and use a mean
@@ -751,31 +775,43 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
 
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -b %d -u %d -s --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
             # DFM decoder
-            decode_cmd = (
-                "./dfm09mod -vv --ecc --json --dist --auto --softin -i 2>/dev/null"
+            _pipeline.add_stage(
+                [
+                    "./dfm09mod",
+                    "-vv",
+                    "--ecc",
+                    "--json",
+                    "--dist",
+                    "--auto",
+                    "--softin",
+                    "-i",
+                ]
             )
 
             # DFM sondes transmit continuously - average over the last 2 frames, and use a mean
@@ -795,27 +831,37 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
 
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += (
-                "./fsk_demod --cs16 -b %d -u %d -s -p 5 --stats=%d 2 %d %d - -"
-                % (_lower, _upper, _stats_rate, _sdr_rate, _baud_rate)
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "-p",
+                    "5",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
             # M10 decoder
-            decode_cmd = "./m10mod --json --ptu -vvv --softin -i 2>/dev/null"
+            _pipeline.add_stage(
+                ["./m10mod", "--json", "--ptu", "-vvv", "--softin", "-i"]
+            )
 
             # M10 sondes transmit in short, irregular pulses - average over the last 2 frames, and use a peak hold
             demod_stats = FSKDemodStats(averaging_time=2.0, peak_hold=True)
@@ -833,27 +879,37 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
 
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += (
-                "./fsk_demod --cs16 -b %d -u %d -s -p 5 --stats=%d 2 %d %d - -"
-                % (_lower, _upper, _stats_rate, _sdr_rate, _baud_rate)
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "-p",
+                    "5",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
             # M20 decoder
-            decode_cmd = "./mXXmod --json --ptu -vvv --softin -i 2>/dev/null"
+            _pipeline.add_stage(
+                ["./mXXmod", "--json", "--ptu", "-vvv", "--softin", "-i"]
+            )
 
             # M20 sondes transmit in short, irregular pulses - average over the last 2 frames, and use a peak hold
             demod_stats = FSKDemodStats(averaging_time=2.0, peak_hold=True)
@@ -871,28 +927,31 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -b %d -u %d -s --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
-            decode_cmd = "./lms6Xmod --json --softin --vit2 -i 2>/dev/null"
+            _pipeline.add_stage(["./lms6Xmod", "--json", "--softin", "--vit2", "-i"])
 
             # LMS sondes transmit continuously - average over the last 2 frames, and use a mean
             demod_stats = FSKDemodStats(averaging_time=2.0, peak_hold=False)
@@ -910,28 +969,33 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -b %d -u %d -s --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "-s",
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
-            decode_cmd = "./imet54mod --ecc --json --softin -i --ptu 2>/dev/null"
+            _pipeline.add_stage(
+                ["./imet54mod", "--ecc", "--json", "--softin", "-i", "--ptu"]
+            )
 
             # iMet54 sondes transmit in bursts. Use a peak hold.
             demod_stats = FSKDemodStats(averaging_time=2.0, peak_hold=True)
@@ -949,30 +1013,33 @@ class SondeDecoder(object):
             _upper = int(0.475 * _sdr_rate)
             _freq = int(self.sonde_freq - _sdr_rate * _offset)
 
-            demod_cmd = "%s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |" % (
-                self.sdr_fm,
-                bias_option,
-                int(self.ppm),
-                str(self.device_idx),
-                gain_param,
-                _sdr_rate,
-                _freq,
-            )
+            _pipeline = self.generate_sdr_command(_sdr_rate, _freq)
 
             # Add in tee command to save IQ to disk if debugging is enabled.
             if self.save_decode_iq:
-                demod_cmd += " tee decode_IQ_%s.bin |" % str(self.device_idx)
-
-            demod_cmd += "./fsk_demod --cs16 -s -b %d -u %d --stats=%d 2 %d %d - -" % (
-                _lower,
-                _upper,
-                _stats_rate,
-                _sdr_rate,
-                _baud_rate,
+                _pipeline.add_stage(["tee", "decode_IQ_%s.bin" % str(self.device_idx)])
+
+            _pipeline.add_stage(
+                [
+                    "./fsk_demod",
+                    "--cs16",
+                    "-s",
+                    "-b",
+                    _lower,
+                    "-u",
+                    _upper,
+                    "--stats=%d" % _stats_rate,
+                    "2",
+                    _sdr_rate,
+                    _baud_rate,
+                    "-",
+                    "-",
+                ],
+                stderr=True,
             )
 
             # MRZ decoder
-            decode_cmd = "./mp3h1mod --auto --json --softin --ptu 2>/dev/null"
+            _pipeline.add_stage(["./mp3h1mod", "--auto", "--json", "--softin", "--ptu"])
 
             # MRZ sondes transmit continuously - average over the last frame, and use a mean
             demod_stats = FSKDemodStats(averaging_time=1.0, peak_hold=False)
@@ -981,7 +1048,29 @@ class SondeDecoder(object):
         else:
             return None
 
-        return (demod_cmd, decode_cmd, demod_stats)
+        return (_pipeline, demod_stats)
+
+    def generate_sdr_command(self, sample_rate, frequency):
+        """ Generate the start of the demodulator pipeline for the experimental decoders, which supplies the IQ stream
+        (16-bit IQ, at the requested sample rate) to fsk_demod.
+
+        If a shared wideband capture is in use, a channel is added to the capture instead, and the IQ stream is written
+        into the pipeline's stdin by the decoder thread.
+
+        Args:
+            sample_rate (int): IQ sample rate, in Hz.
+            frequency (int): IQ centre frequency, in Hz.
+
+        Returns:
+            Pipeline: A pipeline containing the rtl_fm command, or an empty pipeline which accepts input if using a
+                shared wideband capture.
+        """
+        if self.wideband_capture is not None:
+            # This will throw a ValueError if the channel can't be provided by the capture.
+            self.iq_channel = self.wideband_capture.add_channel(frequency, sample_rate)
+            return Pipeline(stdin=True)
+
+        return Pipeline().add_stage(self.sdr_fm_stage("raw", sample_rate, frequency))
 
     def stats_thread(self, asyncreader):
         """ Process demodulator statistics from a supplied AsynchronousFileReader object (which will be hooked into stderr from fsk_demod) """
@@ -994,50 +1083,83 @@ class SondeDecoder(object):
 
         asyncreader.stop()
 
+    def start_decoder_input(self):
+        """ Start supplying the decoder pipeline with its input, if it is not produced by the pipeline itself
+        (i.e. from a shared wideband capture, or the in-process FM demodulator). """
+        if self.iq_channel is not None:
+            # Feed the demodulator from the shared wideband capture.
+            self.iq_channel_thread = Thread(
+                target=self.iq_channel.pump, args=(self.decoder_pipeline.stdin,)
+            )
+            self.iq_channel_thread.start()
+
+        elif self.fm_demod is not None:
+            self.log_debug("SDR Command: %s" % self.sdr_pipeline.command_string())
+            self.sdr_pipeline.start()
+
+            # Feed the decoder from the in-process FM demodulator.
+            self.fm_demod_thread = Thread(
+                target=self.fm_demod.pump,
+                args=(self.sdr_pipeline.stdout, self.decoder_pipeline.stdin),
+            )
+            self.fm_demod_thread.start()
+
+    def stop_decoder_input(self):
+        """ Stop supplying the decoder pipeline with its input. """
+        if self.iq_channel is not None:
+            # Release our channel of the shared wideband capture.
+            self.iq_channel.close()
+            if self.iq_channel_thread is not None:
+                self.iq_channel_thread.join()
+
+        elif self.fm_demod is not None:
+            self.stop_pipeline(self.sdr_pipeline)
+            if self.fm_demod_thread is not None:
+                self.fm_demod_thread.join()
+
+    def stop_pipeline(self, pipeline):
+        """ Stop a pipeline, and log the exit code and CPU usage of each of its processes. """
+        pipeline.stop()
+
+        for _stage in pipeline.stage_status():
+            if _stage["pid"] is None:
+                # Not started.
+                continue
+
+            self.log_debug(
+                "%s (PID %s) exited with code %s, CPU time %s."
+                % (
+                    _stage["name"],
+                    str(_stage["pid"]),
+                    str(_stage["returncode"]),
+                    "%.1fs" % _stage["cpu_time"]
+                    if _stage["cpu_time"] is not None
+                    else "unknown",
+                )
+            )
+
     def decoder_thread(self):
-        """ Runs the supplied decoder command(s) as a subprocess, and passes returned lines to handle_decoder_line. """
+        """ Runs the decoder pipeline, and passes returned lines to handle_decoder_line. """
 
         # Timeout Counter.
         _last_packet = time.time()
 
-        if self.decoder_command_2 is None:
-            # No second decoder command, so we only need to process stdout from the one process.
-            self.log_debug("Decoder Command: %s" % self.decoder_command)
-
-            # Start the thread.
-            self.decode_process = subprocess.Popen(
-                self.decoder_command,
-                shell=True,
-                stdin=None,
-                stdout=subprocess.PIPE,
-                preexec_fn=os.setsid,
-            )
+        self.log_debug("Decoder Command: %s" % self.decoder_pipeline.command_string())
 
-        else:
-            # Two decoder commands! This means one is a demod command, from which we need to handle stderr,
-            # and one is a decoder, which we pipe in stdout from the demodulator.
-            self.log_debug("Demodulator Command: %s" % self.decoder_command)
-            self.log_debug("Decoder Command: %s" % self.decoder_command_2)
-
-            # Startup the subprocesses
-            self.demod_process = subprocess.Popen(
-                self.decoder_command,
-                shell=True,
-                stdin=None,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid,
-            )
-            self.decode_process = subprocess.Popen(
-                self.decoder_command_2,
-                shell=True,
-                stdin=self.demod_process.stdout,
-                stdout=subprocess.PIPE,
-                preexec_fn=os.setsid,
-            )
+        try:
+            self.decoder_pipeline.start()
+            self.start_decoder_input()
+        except Exception as e:
+            self.log_error("Could not start decoder subprocess - %s" % str(e))
+            self.decoder_pipeline.stop()
+            self.stop_decoder_input()
+            self.decoder_running = False
+            return
 
+        if self.demod_stats is not None:
+            # The demodulator's stderr contains its statistics.
             self.demod_reader = AsynchronousFileReader(
-                self.demod_process.stderr, autostart=True
+                self.decoder_pipeline.stderr, autostart=True
             )
 
             # Start thread to process demodulator stats.
@@ -1047,7 +1169,7 @@ class SondeDecoder(object):
             self.demod_stats_thread.start()
 
         self.async_reader = AsynchronousFileReader(
-            self.decode_process.stdout, autostart=True
+            self.decoder_pipeline.stdout, autostart=True
         )
 
         self.log_info("Starting decoder subprocess.")
@@ -1078,25 +1200,11 @@ class SondeDecoder(object):
                 time.sleep(0.1)
 
         # Either our subprocess has exited, or the user has asked to close the process.
-        # Try many things to kill off the subprocess.
         try:
             # Stop the async reader
             self.async_reader.stop()
-            # Send a SIGKILL to the subprocess PID via OS.
-            try:
-                os.killpg(os.getpgid(self.decode_process.pid), signal.SIGKILL)
-                if self.experimental_decoder:
-                    os.killpg(os.getpgid(self.demod_process.pid), signal.SIGKILL)
-            except Exception as e:
-                self.log_debug("SIGKILL via os.killpg failed. - %s" % str(e))
-            time.sleep(1)
-            try:
-                # Send a SIGKILL via subprocess
-                self.decode_process.kill()
-                if self.experimental_decoder:
-                    self.demod_process.kill()
-            except Exception as e:
-                self.log_debug("SIGKILL via subprocess.kill failed - %s" % str(e))
+            # Stop the pipeline, and wait for all of its processes to exit.
+            self.stop_pipeline(self.decoder_pipeline)
             # Finally, join the async reader.
             self.async_reader.join()
 
@@ -1104,9 +1212,118 @@ class SondeDecoder(object):
             traceback.print_exc()
             self.log_error("Error while killing subprocess - %s" % str(e))
 
+        self.stop_decoder_input()
+
         self.log_info("Closed decoder subprocess.")
         self.decoder_running = False
 
+    async def decoder_task(self):
+        """ Runs the decoder pipeline, reading its output on the decoder runtime, and passes returned lines to
+        handle_decoder_line as soon as they are received. Equivalent to decoder_thread. """
+
+        self.decoder_stop = asyncio.Event()
+        _loop = asyncio.get_event_loop()
+        _transports = []
+        _stats_reader = None
+        _read = None
+        _stop = None
+
+        try:
+            self.log_debug(
+                "Decoder Command: %s" % self.decoder_pipeline.command_string()
+            )
+            # Starting the pipeline and its input can block (i.e. while rtl_fm starts up), so do this
+            # outside of the event loop, so the other decoders are not held up.
+            await _loop.run_in_executor(None, self.decoder_pipeline.start)
+            await _loop.run_in_executor(None, self.start_decoder_input)
+
+            (_output, _transport) = await open_pipe_reader(self.decoder_pipeline.stdout)
+            _transports.append(_transport)
+
+            if self.demod_stats is not None:
+                # Process demodulator stats as they arrive.
+                (_stats, _transport) = await open_pipe_reader(
+                    self.decoder_pipeline.stderr
+                )
+                _transports.append(_transport)
+                _stats_reader = asyncio.ensure_future(
+                    read_lines(_stats, self.demod_stats.update)
+                )
+
+            self.log_info("Starting decoder subprocess.")
+
+            # Timeout Counter.
+            _last_packet = time.time()
+            _stop = asyncio.ensure_future(self.decoder_stop.wait())
+
+            while self.decoder_running:
+                if _read is None:
+                    _read = asyncio.ensure_future(_output.readline())
+
+                # Wait for a line, a stop request, or the timeout to expire - whichever comes first.
+                if (self.timeout > 0) and (not self.udp_mode):
+                    _wait = max(_last_packet + self.timeout - time.time(), 0)
+                else:
+                    _wait = None
+
+                (_done, _pending) = await asyncio.wait(
+                    [_read, _stop], timeout=_wait, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if _read in _done:
+                    try:
+                        _line = _read.result()
+                    except ValueError:
+                        # Line longer than the stream buffer limit - skip over it.
+                        _read = None
+                        continue
+                    _read = None
+
+                    if not _line:
+                        # The decoder has exited.
+                        break
+
+                    # Pass the line into the handler, and see if it is OK.
+                    _ok = self.handle_decoder_line(_line)
+
+                    # If we decoded a valid JSON blob, update our last-packet time.
+                    if _ok:
+                        _last_packet = time.time()
+
+                elif _stop in _done:
+                    break
+
+                else:
+                    # If we have not seen data for a while, break.
+                    self.log_error("RX Timed out.")
+                    self.exit_state = "Timeout"
+                    break
+
+        except Exception as e:
+            traceback.print_exc()
+            self.log_error("Error running decoder - %s" % str(e))
+
+        finally:
+            for _future in [_read, _stop, _stats_reader]:
+                if _future is not None:
+                    _future.cancel()
+
+            for _transport in _transports:
+                _transport.close()
+
+            # Either our subprocess has exited, or the user has asked to close the process.
+            # Stop the pipeline, and wait for all of its processes to exit.
+            await _loop.run_in_executor(None, self.stop_pipeline, self.decoder_pipeline)
+            await _loop.run_in_executor(None, self.stop_decoder_input)
+
+            self.log_info("Closed decoder subprocess.")
+            self.decoder_running = False
+
+    def wake_decoder(self):
+        """ Wake up the decoder task, so it can see the decoder has been stopped. Must be called from the event loop. """
+        if self.decoder_stop is not None:
+            self.decoder_stop.set()
+
     def handle_decoder_line(self, data):
         """ Handle a line of output from the decoder subprocess, and pass it onto all of the telemetry
             exporters.
@@ -1118,21 +1335,21 @@ class SondeDecoder(object):
             bool:   True if the line was decoded to a JSON object correctly, False otherwise.
         """
 
-        # Catch 'bad' first characters.
+        # Catch 'bad' characters.
         try:
-            _first_char = data.decode("ascii")[0]
+            _line = data.decode("ascii")
         except UnicodeDecodeError:
             return
 
         # Don't even try and decode lines which don't start with a '{'
         # These may be other output from the decoder, which we shouldn't try to parse.
         # TODO: Perhaps we should add the option to log the raw data output from the decoders?
-        if data.decode("ascii")[0] != "{":
+        if (len(_line) == 0) or (_line[0] != "{"):
             return
 
         else:
             try:
-                _telemetry = json.loads(data.decode("ascii"))
+                _telemetry = parse_telemetry_json(_line)
             except Exception as e:
                 self.log_debug("Line could not be parsed as JSON - %s" % str(e))
                 return False
@@ -1184,7 +1401,9 @@ class SondeDecoder(object):
 
             # Check the datetime field is parseable.
             try:
-                _telemetry["datetime_dt"] = parse(_telemetry["datetime"])
+                _telemetry["datetime_dt"] = parse_telemetry_datetime(
+                    _telemetry["datetime"]
+                )
             except Exception as e:
                 self.log_error(
                     "Invalid date/time in telemetry dict - %s (Sonde may not have GPS lock)"
@@ -1371,7 +1590,21 @@ class SondeDecoder(object):
         """ Kill the currently running decoder subprocess """
         self.decoder_running = False
 
-        if self.decoder is not None:
+        if self.decoder is None:
+            return
+
+        if self.async_runtime:
+            get_decoder_runtime().call_soon(self.wake_decoder)
+            # Wait for the decoder task to finish.
+            try:
+                self.decoder.result(timeout=DECODER_STOP_TIMEOUT)
+            except TimeoutError:
+                self.log_error(
+                    "Decoder task did not stop within %d seconds, cancelling."
+                    % DECODER_STOP_TIMEOUT
+                )
+                self.decoder.cancel()
+        else:
             self.decoder.join()
 
     def running(self):
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Asynchronous Decoder Runtime
+#
+#   Released under GNU GPL v3 or later
+#
+#   Runs a single asyncio event loop (in its own thread), on which the outputs of all decoder subprocesses are read.
+#   Decoder output lines are handled as soon as they are produced, and timeouts are event-driven, instead
+#   of each decoder polling its subprocess outputs from a set of threads.
+#
+import asyncio
+import logging
+from threading import Thread, Lock
+
+
+class DecoderRuntime(object):
+    """ Shared asyncio event loop for decoder subprocesses """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = Thread(target=self.run_loop, daemon=True)
+        self.loop_thread.start()
+
+    def run_loop(self):
+        """ Run the event loop until the program exits. """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """ Run a coroutine on the event loop.
+
+        Args:
+            coroutine: Coroutine object to run.
+
+        Returns:
+            concurrent.futures.Future: Future which completes when the coroutine has finished.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, function, *args):
+        """ Call a function from within the event loop (i.e. to set an asyncio.Event from another thread). """
+        self.loop.call_soon_threadsafe(function, *args)
+
+
+# The runtime is started when it is first needed.
+_runtime = None
+_runtime_lock = Lock()
+
+
+def get_decoder_runtime():
+    """ Get the shared decoder runtime, starting it if it is not already running. """
+    global _runtime
+
+    with _runtime_lock:
+        if _runtime is None:
+            logging.debug("Decoder Runtime - Starting asyncio event loop.")
+            _runtime = DecoderRuntime()
+
+    return _runtime
+
+
+async def open_pipe_reader(pipe):
+    """ Read from a pipe (i.e. the stdout of a subprocess.Popen object) using an asyncio stream.
+
+    Args:
+        pipe (file): Pipe to read from.
+
+    Returns:
+        tuple: (asyncio.StreamReader, asyncio.ReadTransport) - The transport should be closed when finished with.
+    """
+    _loop = asyncio.get_event_loop()
+    _reader = asyncio.StreamReader()
+    (_transport, _protocol) = await _loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(_reader), pipe
+    )
+    return (_reader, _transport)
+
+
+async def read_lines(stream, callback):
+    """ Pass each line read from an asyncio stream to a callback, until the stream is closed.
+
+    Args:
+        stream (asyncio.StreamReader): Stream to read from (i.e. a subprocess's stderr).
+        callback (function): Function to call with each line (bytes).
+    """
+    while True:
+        try:
+            _line = await stream.readline()
+        except ValueError:
+            # Line longer than the stream buffer limit - skip over it.
+            continue
+
+        if not _line:
+            break
+
+        try:
+            callback(_line)
+        except Exception as e:
+            # Keep reading, so the subprocess doesn't block on a full pipe.
+            logging.debug("Decoder Runtime - Error handling line - %s" % str(e))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - In-Process FM Demodulator
+#
+#   Released under GNU GPL v3 or later
+#
+#   Replaces the 'rtl_fm -M fm | sox' stages of the standard decoder chains. IQ from 'rtl_fm -M raw' is
+#   FM demodulated, resampled to 48 kHz, filtered (using the same filters as the sox command lines),
+#   and written out as a 8-bit WAV stream into the decoder's stdin.
+#
+import math
+import struct
+import numpy as np
+from scipy.signal import butter, sosfilt
+from .channelizer import design_lowpass
+from .scan import convert_iq, IQ_SAMPLE_SIZE
+
+
+# Sample rate of the audio supplied to the decoders.
+FM_DEMOD_OUTPUT_RATE = 48000
+
+# rtl_fm scales its FM discriminator output so +/- pi radians is +/- 2^14 (16-bit), which sox then reduces to
+# 8-bit by dropping the lower byte. Use the same scaling, so the decoders see the same audio levels.
+FM_DEMOD_SCALE = 64.0 / np.pi
+
+
+def wav_header(sample_rate, bits=8, channels=1):
+    """ Generate a header for a WAV stream of unknown length.
+
+    Args:
+        sample_rate (int): Sample rate, in Hz.
+        bits (int): Bits per sample.
+        channels (int): Number of channels.
+
+    Returns:
+        bytes: The 44-byte WAV header.
+    """
+    _block_align = channels * bits // 8
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVEfmt "
+        + struct.pack(
+            "<IHHIIHH",
+            16,
+            1,
+            channels,
+            sample_rate,
+            sample_rate * _block_align,
+            _block_align,
+            bits,
+        )
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+class Resampler(object):
+    """ Streaming Rational Resampler
+
+    Resamples a stream (real or complex) by a rational factor (up/down) using a polyphase FIR filter, with the
+    filter state carried over between blocks.
+    """
+
+    def __init__(
+        self,
+        input_rate,
+        output_rate,
+        taps_per_phase=16,
+        block_size=4096,
+        dtype=np.float32,
+    ):
+        """
+        Args:
+            input_rate (int): Input sample rate, in Hz.
+            output_rate (int): Output sample rate, in Hz.
+            taps_per_phase (int): Filter length, relative to the larger of the up/down factors.
+            block_size (int): Expected maximum block size, used to size the input buffer.
+            dtype: Sample type (i.e. np.float32 for audio, or np.complex64 for IQ).
+        """
+        _gcd = math.gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // _gcd
+        self.down = int(input_rate) // _gcd
+
+        # The filter runs at the upsampled rate, and limits the bandwidth to 90% of the lower of the two rates.
+        _num_taps = taps_per_phase * max(self.up, self.down)
+        _num_taps = int(math.ceil(_num_taps / float(self.up))) * self.up
+        _cutoff = 0.45 * min(self.up, self.down) / float(self.up * self.down)
+        _taps = design_lowpass(_num_taps, _cutoff) * self.up
+
+        # Split the filter into polyphase components. Output samples are calculated from a window of the most
+        # recent input samples (oldest first), so each component is reversed.
+        self.taps_per_phase = _num_taps // self.up
+        self.phases = _taps.reshape(self.taps_per_phase, self.up).T[:, ::-1].copy()
+
+        # Input buffer, made up of the last (taps_per_phase - 1) samples of the previous block, followed by the current block.
+        self.history = self.taps_per_phase - 1
+        self.buffer = np.zeros(self.history + block_size, dtype=dtype)
+        # Position of the next output sample, in upsampled samples, relative to the start of the next block.
+        self.position = 0
+
+    def process(self, samples):
+        """ Resample a block of input samples.
+
+        Args:
+            samples (np.array): Input samples. These can be of any length.
+
+        Returns:
+            np.array: Resampled output samples.
+        """
+        _count = len(samples)
+        if self.history + _count > len(self.buffer):
+            _buffer = np.zeros(self.history + _count, dtype=self.buffer.dtype)
+            _buffer[: self.history] = self.buffer[: self.history]
+            self.buffer = _buffer
+
+        self.buffer[self.history : self.history + _count] = samples
+
+        # Output samples whose most recent input sample is within this block.
+        _outputs = max(
+            int(math.ceil((_count * self.up - self.position) / float(self.down))), 0
+        )
+        _t = self.position + np.arange(_outputs) * self.down
+        _index = _t // self.up
+        _phase = _t % self.up
+
+        # Sliding windows over the buffer - window i ends with input sample i of this block.
+        _windows = np.lib.stride_tricks.as_strided(
+            self.buffer,
+            shape=(_count, self.taps_per_phase),
+            strides=(self.buffer.strides[0], self.buffer.strides[0]),
+            writeable=False,
+        )
+        _output = np.einsum("ij,ij->i", _windows[_index], self.phases[_phase])
+
+        self.position = self.position + _outputs * self.down - _count * self.up
+        self.buffer[: self.history] = self.buffer[_count : _count + self.history]
+
+        return _output
+
+
+class FMDemodulator(object):
+    """ In-Process FM Demodulator
+
+    Takes 16-bit IQ (as produced by rtl_fm -M raw), and produces 8-bit 48 kHz audio, equivalent to
+    'rtl_fm -M fm ... | sox -t raw ... -r 48000 -b 8 -t wav - <filters>'.
+    """
+
+    def __init__(
+        self, input_rate, filters=[], output_rate=FM_DEMOD_OUTPUT_RATE, block_time=0.1,
+    ):
+        """
+        Args:
+            input_rate (int): IQ sample rate, in Hz.
+            filters (list): Audio filters, as a list of (type, frequency) tuples, where type is 'highpass' or 'lowpass'.
+                These are 2-pole Butterworth filters, as used by sox, and are applied at the output sample rate.
+            output_rate (int): Audio sample rate, in Hz.
+            block_time (float): Amount of IQ to process at a time, in seconds.
+        """
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        self.block_size = int(self.input_rate * block_time)
+
+        self.resampler = Resampler(
+            self.input_rate, self.output_rate, block_size=self.block_size
+        )
+
+        if len(filters) > 0:
+            self.sos = np.vstack(
+                [
+                    butter(2, _freq, btype=_type, fs=self.output_rate, output="sos")
+                    for (_type, _freq) in filters
+                ]
+            )
+            self.filter_state = np.zeros((self.sos.shape[0], 2))
+        else:
+            self.sos = None
+
+        # IQ buffer, starting with the last sample of the previous block, so the discriminator is continuous across blocks.
+        self.iq = np.zeros(self.block_size + 1, dtype=np.complex64)
+
+    def process(self, samples):
+        """ Demodulate a block of IQ samples.
+
+        Args:
+            samples (np.array): Complex IQ samples.
+
+        Returns:
+            bytes: Unsigned 8-bit audio samples.
+        """
+        _count = len(samples)
+        if _count == 0:
+            return b""
+
+        if _count + 1 > len(self.iq):
+            _iq = np.zeros(_count + 1, dtype=np.complex64)
+            _iq[0] = self.iq[0]
+            self.iq = _iq
+
+        self.iq[1 : _count + 1] = samples
+
+        # Polar discriminator.
+        _audio = np.angle(self.iq[1 : _count + 1] * np.conj(self.iq[:_count]))
+        self.iq[0] = self.iq[_count]
+
+        _audio = self.resampler.process(_audio)
+
+        if self.sos is not None:
+            (_audio, self.filter_state) = sosfilt(
+                self.sos, _audio, zi=self.filter_state
+            )
+
+        _audio = np.clip(np.round(_audio * FM_DEMOD_SCALE) + 128, 0, 255)
+        return _audio.astype(np.uint8).tobytes()
+
+    def pump(self, input, output):
+        """ Demodulate IQ from a file object (i.e. the stdout of rtl_fm), and write the audio as a WAV stream into
+        another file object (i.e. the stdin of a decoder), until either can no longer be read from or written to.
+
+        Args:
+            input (file): File object to read 16-bit IQ from.
+            output (file): File object to write audio to.
+        """
+        _buffer = bytearray(self.block_size * IQ_SAMPLE_SIZE["cs16"])
+
+        try:
+            output.write(wav_header(self.output_rate))
+
+            while True:
+                _length = input.readinto(_buffer)
+                if not _length:
+                    break
+
+                output.write(
+                    self.process(convert_iq(memoryview(_buffer)[:_length], "cs16"))
+                )
+                output.flush()
+
+        except (IOError, ValueError):
+            # Either the SDR or the decoder has exited.
+            pass
+
+        try:
+            output.close()
+        except (IOError, ValueError):
+            pass
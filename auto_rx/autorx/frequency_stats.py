@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Historical Frequency Statistics
+#
+#   Released under GNU GPL v3 or later
+#
+#   Keeps a persistent record of which (quantized) frequencies have produced sonde detections,
+#   and at what times of day, so the scanner can try the most likely frequencies first.
+#   Statistics are stored as JSON in the log directory, and are initially populated
+#   from the filenames of any existing TelemetryLogger log files.
+#
+import datetime
+import glob
+import json
+import logging
+import os
+import time
+import numpy as np
+from threading import Lock
+
+
+class FrequencyStatistics(object):
+    """ Per-Frequency Sonde Detection Statistics
+
+    For each quantized frequency, the following is recorded:
+        'count' (int): Total number of sonde detections.
+        'hours' (list): Number of detections in each UTC hour of the day (24 entries).
+        'last_seen' (str): ISO-8601 timestamp of the most recent detection.
+
+    """
+
+    STATS_FILENAME = "frequency_stats.json"
+
+    def __init__(
+        self,
+        log_directory="./log",
+        quantization=10000,
+        hour_window=1,
+        bootstrap=True,
+        save_interval=600,
+    ):
+        """ Initialise the frequency statistics store.
+
+        Args:
+            log_directory (str): Directory containing the TelemetryLogger log files, and where the statistics are saved.
+            quantization (float): Quantize frequencies to this value in Hz. This should match the scanner quantization.
+            hour_window (int): When scoring a frequency, also count detections made within this many hours
+                either side of the current hour.
+            bootstrap (bool): If no statistics file exists, populate the statistics from existing log files.
+            save_interval (float): Save the statistics to disk at most this often (seconds), as detections are added.
+        """
+
+        self.log_directory = str(log_directory)
+        self.quantization = quantization
+        self.hour_window = hour_window
+        self.save_interval = save_interval
+        self.filename = os.path.join(self.log_directory, self.STATS_FILENAME)
+
+        self.stats = {}
+        self.stats_lock = Lock()
+        # Held while writing the statistics file, so only one save happens at a time.
+        self.save_lock = Lock()
+        self.last_save = time.time()
+
+        if os.path.exists(self.filename):
+            self.load()
+        elif bootstrap:
+            self.bootstrap_from_logs()
+            self.save()
+
+    def quantize(self, frequency):
+        """ Quantize a frequency (Hz) to the statistics key. """
+        return int(round(frequency / self.quantization) * self.quantization)
+
+    def load(self):
+        """ Read in the statistics file. """
+        try:
+            with open(self.filename, "r") as _f:
+                _data = json.load(_f)
+
+            with self.stats_lock:
+                self.stats = {}
+                for _freq in _data:
+                    self.stats[int(_freq)] = _data[_freq]
+
+            self.log_info(
+                "Loaded statistics for %d frequencies from %s"
+                % (len(self.stats), self.filename)
+            )
+        except Exception as e:
+            self.log_error("Could not read %s - %s" % (self.filename, str(e)))
+
+    def save(self):
+        """ Write the statistics out to the statistics file. """
+        try:
+            with self.save_lock:
+                with self.stats_lock:
+                    _data = json.dumps(self.stats)
+
+                # Write to a temporary file and then rename it, so we don't leave a corrupt file behind if interrupted.
+                _temp_filename = self.filename + ".tmp"
+                with open(_temp_filename, "w") as _f:
+                    _f.write(_data)
+                os.rename(_temp_filename, self.filename)
+                self.last_save = time.time()
+        except Exception as e:
+            self.log_error("Could not write %s - %s" % (self.filename, str(e)))
+
+    def bootstrap_from_logs(self):
+        """ Populate the statistics from the filenames of existing TelemetryLogger log files.
+
+        Log filenames are of the form YYYYMMDD-HHMMSS_<id>_<type>_<freq_khz>_sonde.log, where the timestamp
+        is the time the sonde was first decoded.
+        """
+        _files = glob.glob(os.path.join(self.log_directory, "*_sonde.log"))
+        _count = 0
+
+        for _file in _files:
+            _fields = os.path.basename(_file).split("_")
+            try:
+                # Parse from either end, in case the serial number contains underscores.
+                _time = datetime.datetime.strptime(_fields[0], "%Y%m%d-%H%M%S")
+                _freq = float(_fields[-2]) * 1e3
+            except (ValueError, IndexError):
+                self.log_debug("Could not parse log filename %s" % _file)
+                continue
+
+            self.add_detection(_freq, _time)
+            _count += 1
+
+        self.log_info(
+            "Populated statistics for %d frequencies from %d log files."
+            % (len(self.stats), _count)
+        )
+
+    def add_detection(self, frequency, timestamp=None):
+        """ Record a sonde detection on a frequency. The statistics are saved if save_interval has passed since
+        the last save.
+
+        Args:
+            frequency (float): Frequency of the sonde, in Hz.
+            timestamp (datetime): Time of the detection (UTC). Defaults to the current time.
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow()
+
+        _freq = self.quantize(frequency)
+
+        with self.stats_lock:
+            if _freq not in self.stats:
+                self.stats[_freq] = {"count": 0, "hours": [0] * 24, "last_seen": ""}
+
+            _entry = self.stats[_freq]
+            _entry["count"] += 1
+            _entry["hours"][timestamp.hour] += 1
+            _entry["last_seen"] = max(_entry["last_seen"], timestamp.isoformat())
+
+        if time.time() - self.last_save > self.save_interval:
+            self.save()
+
+    def score(self, frequency, timestamp=None):
+        """ Score a frequency based on the number of detections around the current time of day.
+
+        Args:
+            frequency (float): Frequency to score, in Hz.
+            timestamp (datetime): Time to score for (UTC). Defaults to the current time.
+
+        Returns:
+            float: Detection score. Higher scores indicate a sonde is more likely to be present.
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow()
+
+        with self.stats_lock:
+            _entry = self.stats.get(self.quantize(frequency), None)
+            if _entry is None:
+                return 0.0
+
+            _score = 0.0
+            for _offset in range(-self.hour_window, self.hour_window + 1):
+                # Detections further away from the current hour are weighted lower.
+                _weight = 1.0 / (1 + abs(_offset))
+                _score += _weight * _entry["hours"][(timestamp.hour + _offset) % 24]
+
+            # Use the total detection count to break ties.
+            return _score + _entry["count"] * 1e-6
+
+    def priority_order(self, frequencies, timestamp=None):
+        """ Determine the order in which a set of frequencies should be checked.
+
+        Frequencies with no history keep their existing (i.e. peak power) order, after those with history.
+
+        Args:
+            frequencies (np.array): Frequencies to order, in Hz.
+            timestamp (datetime): Time to order for (UTC). Defaults to the current time.
+
+        Returns:
+            np.array: Indices into frequencies, in the order they should be checked.
+        """
+        _scores = np.array([self.score(_f, timestamp) for _f in frequencies])
+        # A stable sort keeps the existing order for equal scores.
+        return np.argsort(-_scores, kind="mergesort")
+
+    def log_debug(self, line):
+        """ Helper function to log a debug message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.debug("Frequency Statistics - %s" % line)
+
+    def log_info(self, line):
+        """ Helper function to log an informational message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.info("Frequency Statistics - %s" % line)
+
+    def log_error(self, line):
+        """ Helper function to log an error message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.error("Frequency Statistics - %s" % line)
+
+
+if __name__ == "__main__":
+    # Print out the statistics for a log directory.
+    import sys
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s:%(message)s", level=logging.DEBUG
+    )
+
+    _stats = FrequencyStatistics(
+        log_directory=sys.argv[1] if len(sys.argv) > 1 else "./log", bootstrap=True
+    )
+
+    _freqs = sorted(_stats.stats.keys())
+    for _freq in _stats.priority_order(_freqs):
+        print(
+            "%.3f MHz: %d detections, score %.2f, last seen %s"
+            % (
+                _freqs[_freq] / 1e6,
+                _stats.stats[_freqs[_freq]]["count"],
+                _stats.score(_freqs[_freq]),
+                _stats.stats[_freqs[_freq]]["last_seen"],
+            )
+        )
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Subprocess Pipelines
+#
+#   Released under GNU GPL v3 or later
+#
+#   Runs a chain of processes (i.e. rtl_fm | sox | rs41mod), with each stage described as an argument list,
+#   and connected to the next stage with a pipe, without starting a shell. The PID, CPU usage and exit code
+#   of each stage are tracked, and the pipeline can be stopped without having to guess how long it takes to exit.
+#
+import os
+import shlex
+import signal
+import subprocess
+import time
+
+
+def process_cpu_time(pid):
+    """ Get the CPU time (user + system, in seconds) used by a running process, or None if it is not available. """
+    try:
+        with open("/proc/%d/stat" % pid, "r") as _f:
+            _stat = _f.read()
+    except (IOError, OSError):
+        return None
+
+    # The process name (field 2) may contain spaces, so split after the closing bracket.
+    # utime and stime are fields 14 and 15.
+    _fields = _stat[_stat.rfind(")") + 2 :].split()
+    return (int(_fields[11]) + int(_fields[12])) / float(os.sysconf("SC_CLK_TCK"))
+
+
+def signal_stage(process, signum):
+    """ Send a signal to a pipeline stage, and any processes it has started. """
+    try:
+        # Each stage is started in its own session, so its process group ID is its PID.
+        os.killpg(process.pid, signum)
+    except OSError:
+        try:
+            process.send_signal(signum)
+        except OSError:
+            pass
+
+
+class Pipeline(object):
+    """ Subprocess Pipeline
+
+    Stages are added with add_stage, and then started together with start. The output of the last stage is
+    available via stdout. If requested, the stderr of a stage is available via stderr, and the input of the
+    first stage via stdin.
+    """
+
+    def __init__(self, stdin=False):
+        """
+        Args:
+            stdin (bool): If True, provide a pipe to write into the first stage (via the stdin attribute).
+                Otherwise, the first stage has no input.
+        """
+        self.use_stdin = stdin
+        self.stages = []
+
+        self.stdin = None
+        self.stdout = None
+        self.stderr = None
+
+    def add_stage(self, argv, stderr=False, name=None):
+        """ Add a stage to the end of the pipeline.
+
+        Args:
+            argv (list): Program and arguments to run.
+            stderr (bool): If True, provide the stderr output of this stage via the stderr attribute. Otherwise, it is discarded.
+                Only one stage can have its stderr output provided.
+            name (str): Name of this stage, used in log messages. Defaults to the program name.
+
+        Returns:
+            Pipeline: This pipeline, so calls can be chained.
+        """
+        if stderr and any([_s["stderr"] for _s in self.stages]):
+            raise ValueError("Only one stage can provide stderr output.")
+
+        self.stages.append(
+            {
+                "argv": [str(_arg) for _arg in argv],
+                "name": name if name is not None else os.path.basename(str(argv[0])),
+                "stderr": stderr,
+                "process": None,
+                "cpu_time": None,
+            }
+        )
+        return self
+
+    def command_string(self):
+        """ Get the equivalent shell command for the pipeline, for logging. """
+        return " | ".join(
+            [" ".join([shlex.quote(_arg) for _arg in _s["argv"]]) for _s in self.stages]
+        )
+
+    def start(self):
+        """ Start all stages of the pipeline.
+
+        If any stage fails to start, the stages which have been started are stopped, and the exception is raised.
+        """
+        _input = subprocess.PIPE if self.use_stdin else subprocess.DEVNULL
+
+        try:
+            for _i, _stage in enumerate(self.stages):
+                _stage["process"] = subprocess.Popen(
+                    _stage["argv"],
+                    stdin=_input,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE if _stage["stderr"] else subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+
+                if _i == 0:
+                    self.stdin = _stage["process"].stdin
+                else:
+                    # This stage now has its own copy of the previous stage's output. Close ours, so the previous
+                    # stage gets a SIGPIPE if this stage exits.
+                    _input.close()
+
+                if _stage["stderr"]:
+                    self.stderr = _stage["process"].stderr
+
+                _input = _stage["process"].stdout
+
+        except Exception:
+            if (_input is not None) and (
+                _input not in [subprocess.PIPE, subprocess.DEVNULL]
+            ):
+                _input.close()
+            self.stop()
+            raise
+
+        self.stdout = _input
+
+    def running(self):
+        """ Check if any stage of the pipeline is still running. """
+        return any(
+            [
+                (_s["process"] is not None) and (_s["process"].poll() is None)
+                for _s in self.stages
+            ]
+        )
+
+    def update_cpu_times(self):
+        """ Record the CPU time used by each running stage. """
+        for _stage in self.stages:
+            if (_stage["process"] is not None) and (_stage["process"].poll() is None):
+                _cpu_time = process_cpu_time(_stage["process"].pid)
+                if _cpu_time is not None:
+                    _stage["cpu_time"] = _cpu_time
+
+    def stop(self, timeout=2.0):
+        """ Stop all stages of the pipeline.
+
+        Each stage (and any processes it has started) is sent a SIGTERM, and any stage which has not exited after
+        the timeout is sent a SIGKILL.
+
+        Args:
+            timeout (float): Time to wait for the stages to exit after the SIGTERM, in seconds.
+        """
+        # Record the CPU usage of each stage before it exits.
+        self.update_cpu_times()
+
+        _started = [_s["process"] for _s in self.stages if _s["process"] is not None]
+
+        for _process in _started:
+            if _process.poll() is None:
+                signal_stage(_process, signal.SIGTERM)
+
+        _deadline = time.time() + timeout
+        for _process in _started:
+            try:
+                _process.wait(timeout=max(_deadline - time.time(), 0))
+            except subprocess.TimeoutExpired:
+                signal_stage(_process, signal.SIGKILL)
+                _process.wait()
+
+        for _file in [self.stdin, self.stdout, self.stderr]:
+            if _file is not None:
+                try:
+                    _file.close()
+                except (IOError, OSError, ValueError):
+                    pass
+
+    def stage_status(self):
+        """ Get the status of each stage.
+
+        Returns:
+            list: A dict for each stage, containing the name, pid, returncode (None if still running, or not started)
+                and cpu_time (seconds, or None if not known).
+        """
+        self.update_cpu_times()
+
+        _status = []
+        for _stage in self.stages:
+            _process = _stage["process"]
+            _status.append(
+                {
+                    "name": _stage["name"],
+                    "pid": _process.pid if _process is not None else None,
+                    "returncode": _process.poll() if _process is not None else None,
+                    "cpu_time": _stage["cpu_time"],
+                }
+            )
+
+        return _status
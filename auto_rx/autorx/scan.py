@@ -10,31 +10,42 @@ import logging
 import numpy as np
 import os
 import platform
+import signal
+import socket
+import struct
 import subprocess
 import time
 import traceback
-from threading import Thread, Lock
+from threading import Event, Thread, Lock
 from types import FunctionType, MethodType
+from .channelizer import Channelizer, group_frequencies, to_cs16
+from .correlator import SondeCorrelator
+from .scan_stats import ScanStatistics, new_scan_cycle
 from .utils import (
+    AsynchronousFileReader,
+    cluster_peaks,
     detect_peaks,
+    interval_mask,
+    lookup_peak_levels,
     rtlsdr_test,
     reset_rtlsdr_by_serial,
     reset_all_rtlsdrs,
     peak_decimation,
+    rolling_noise_floor,
 )
 
 try:
     # Python 2
-    from StringIO import StringIO
+    from Queue import Queue, Empty
 except ImportError:
     # Python 3
-    from io import StringIO
+    from queue import Queue, Empty
 
 try:
     from .web import flask_emit_event
 except ImportError:
     # Running in a test scenario. Make a dummy flask_emit_event function.
-    def flask_emit_event(event_name, data):
+    def flask_emit_event(event_name, data={}):
         print("Running in a test scenario, no data emitted to flask.")
         pass
 
@@ -43,14 +54,21 @@ except ImportError:
 scan_result = {
     "freq": [],
     "power": [],
+    "freq_min": [],
+    "power_min": [],
     "peak_freq": [],
     "peak_lvl": [],
     "timestamp": "No data yet.",
     "threshold": 0,
+    "cache_hits": 0,
+    "cache_misses": 0,
 }
 
+# Global for scan cycle timing statistics
+scan_stats = ScanStatistics()
 
-def run_rtl_power(
+
+def generate_rtl_power_command(
     start,
     stop,
     step,
@@ -61,24 +79,26 @@ def run_rtl_power(
     ppm=0,
     gain=-1,
     bias=False,
+    single_shot=True,
 ):
-    """ Capture spectrum data using rtl_power (or drop-in equivalent), and save to a file.
+    """ Generate a rtl_power command string.
 
     Args:
         start (int): Start of search window, in Hz.
         stop (int): End of search window, in Hz.
         step (int): Search step, in Hz.
-        filename (str): Output results to this file. Defaults to ./log_power.csv
+        filename (str): Output results to this file. A filename of '-' results in rtl_power writing to stdout.
         dwell (int): How long to average on the frequency range for.
         sdr_power (str): Path to the rtl_power utility.
         device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
         ppm (int): SDR Frequency accuracy correction, in ppm.
         gain (float): SDR Gain setting, in dB.
         bias (bool): If True, enable the bias tee on the SDR.
+        single_shot (bool): If True, exit after a single sweep. Otherwise, rtl_power runs until it is killed,
+            producing a sweep every dwell seconds.
 
     Returns:
-        bool: True if rtl_power ran successfuly, False otherwise.
-
+        str: The rtl_power command. Single-shot commands are wrapped in a timeout call.
     """
     # Example: rtl_power -f 400400000:403500000:800 -i20 -1 -c 20% -p 0 -d 0 -g 26.0 log_power.csv
 
@@ -91,10 +111,6 @@ def run_rtl_power(
     else:
         gain_param = ""
 
-    # If the output log file exists, remove it.
-    if os.path.exists(filename):
-        os.remove(filename)
-
     # Add -k 30 option, to SIGKILL rtl_power 30 seconds after the regular timeout expires.
     # Note that this only works with the GNU Coreutils version of Timeout, not the IBM version,
     # which is provided with OSX (Darwin).
@@ -103,22 +119,114 @@ def run_rtl_power(
     else:
         timeout_kill = "-k 30 "
 
-    rtl_power_cmd = (
-        "timeout %s%d %s %s-f %d:%d:%d -i %d -1 -c 20%% -p %d -d %s %s%s"
-        % (
-            timeout_kill,
-            dwell + 10,
-            sdr_power,
-            bias_option,
-            start,
-            stop,
-            step,
-            dwell,
-            int(ppm),  # Should this be an int?
-            str(device_idx),
-            gain_param,
-            filename,
+    if single_shot:
+        timeout_option = "timeout %s%d " % (timeout_kill, dwell + 10)
+        single_shot_option = "-1 "
+    else:
+        timeout_option = ""
+        single_shot_option = ""
+
+    rtl_power_cmd = "%s%s %s-f %d:%d:%d -i %d %s-c 20%% -p %d -d %s %s%s" % (
+        timeout_option,
+        sdr_power,
+        bias_option,
+        start,
+        stop,
+        step,
+        dwell,
+        single_shot_option,
+        int(ppm),  # Should this be an int?
+        str(device_idx),
+        gain_param,
+        filename,
+    )
+
+    return rtl_power_cmd
+
+
+def log_rtl_power_error(output, returncode, device_idx=0, bias=False):
+    """ Log a failed rtl_power call, with some hints as to the cause.
+
+    Args:
+        output (str): Error output from rtl_power.
+        returncode (int): Return code of the rtl_power call.
+        device_idx (int or str): Device index or serial number of the RTLSDR.
+        bias (bool): If True, the bias tee option was used.
+    """
+    logging.critical(
+        "Scanner #%s - rtl_power call failed with return code %s."
+        % (str(device_idx), returncode)
+    )
+    # Look at the error output in a bit more details.
+    if "No supported devices found" in output:
+        logging.critical(
+            "Scanner #%s - rtl_power could not find device with ID %s, is your configuration correct?"
+            % (str(device_idx), str(device_idx))
+        )
+    elif "illegal option" in output:
+        if bias:
+            logging.critical(
+                "Scanner #%s - rtl_power reported an illegal option was used. Are you using a rtl_power version with bias tee support?"
+                % str(device_idx)
+            )
+        else:
+            logging.critical(
+                "Scanner #%s - rtl_power reported an illegal option was used. (This shouldn't happen... are you running an ancient version?)"
+                % str(device_idx)
+            )
+    else:
+        # Something else odd happened, dump the entire error output to the log for further analysis.
+        logging.critical(
+            "Scanner #%s - rtl_power reported error: %s" % (str(device_idx), output)
         )
+
+
+def run_rtl_power(
+    start,
+    stop,
+    step,
+    filename="log_power.csv",
+    dwell=20,
+    sdr_power="rtl_power",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+):
+    """ Capture spectrum data using rtl_power (or drop-in equivalent), and save to a file.
+
+    Args:
+        start (int): Start of search window, in Hz.
+        stop (int): End of search window, in Hz.
+        step (int): Search step, in Hz.
+        filename (str): Output results to this file. Defaults to ./log_power.csv
+        dwell (int): How long to average on the frequency range for.
+        sdr_power (str): Path to the rtl_power utility.
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (float): SDR Gain setting, in dB.
+        bias (bool): If True, enable the bias tee on the SDR.
+
+    Returns:
+        bool: True if rtl_power ran successfuly, False otherwise.
+
+    """
+
+    # If the output log file exists, remove it.
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    rtl_power_cmd = generate_rtl_power_command(
+        start,
+        stop,
+        step,
+        filename=filename,
+        dwell=dwell,
+        sdr_power=sdr_power,
+        device_idx=device_idx,
+        ppm=ppm,
+        gain=gain,
+        bias=bias,
     )
 
     logging.info("Scanner #%s - Running frequency scan." % str(device_idx))
@@ -132,44 +240,183 @@ def run_rtl_power(
         )
     except subprocess.CalledProcessError as e:
         # Something went wrong...
-        logging.critical(
-            "Scanner #%s - rtl_power call failed with return code %s."
-            % (str(device_idx), e.returncode)
+        log_rtl_power_error(
+            e.output.decode("ascii"), e.returncode, device_idx=device_idx, bias=bias
         )
-        # Look at the error output in a bit more details.
-        _output = e.output.decode("ascii")
-        if "No supported devices found" in _output:
-            logging.critical(
-                "Scanner #%s - rtl_power could not find device with ID %s, is your configuration correct?"
-                % (str(device_idx), str(device_idx))
-            )
-        elif "illegal option" in _output:
-            if bias:
-                logging.critical(
-                    "Scanner #%s - rtl_power reported an illegal option was used. Are you using a rtl_power version with bias tee support?"
-                    % str(device_idx)
-                )
-            else:
-                logging.critical(
-                    "Scanner #%s - rtl_power reported an illegal option was used. (This shouldn't happen... are you running an ancient version?)"
-                    % str(device_idx)
-                )
-        else:
-            # Something else odd happened, dump the entire error output to the log for further analysis.
-            logging.critical(
-                "Scanner #%s - rtl_power reported error: %s"
-                % (str(device_idx), _output)
-            )
-
         return False
     else:
         # No errors reported!
         return True
 
 
+def start_rtl_power_stream(
+    start,
+    stop,
+    step,
+    dwell=20,
+    sdr_power="rtl_power",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+    single_shot=True,
+):
+    """ Start rtl_power (or drop-in equivalent) with its output written to a pipe, rather than a file.
+
+    Args:
+        start (int): Start of search window, in Hz.
+        stop (int): End of search window, in Hz.
+        step (int): Search step, in Hz.
+        dwell (int): How long to average on the frequency range for.
+        sdr_power (str): Path to the rtl_power utility.
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (float): SDR Gain setting, in dB.
+        bias (bool): If True, enable the bias tee on the SDR.
+        single_shot (bool): If True, exit after a single sweep. Otherwise, keep producing sweeps until killed.
+
+    Returns:
+        tuple: A tuple consisting of the rtl_power subprocess.Popen object, and an AsynchronousFileReader
+            collecting its stderr output. Pass these to read_rtl_power_stream and close_rtl_power_stream.
+    """
+    rtl_power_cmd = generate_rtl_power_command(
+        start,
+        stop,
+        step,
+        filename="-",
+        dwell=dwell,
+        sdr_power=sdr_power,
+        device_idx=device_idx,
+        ppm=ppm,
+        gain=gain,
+        bias=bias,
+        single_shot=single_shot,
+    )
+
+    logging.info("Scanner #%s - Running frequency scan (streaming)." % str(device_idx))
+    logging.debug(
+        "Scanner #%s - Running command: %s" % (str(device_idx), rtl_power_cmd)
+    )
+
+    _process = subprocess.Popen(
+        rtl_power_cmd,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=os.setsid,
+    )
+    # Collect stderr in a separate thread, so a chatty rtl_power can't block on a full pipe.
+    _stderr = AsynchronousFileReader(_process.stderr, autostart=True)
+
+    return (_process, _stderr)
+
+
+def parse_rtl_power_line(line):
+    """ Parse a single hop (line) of rtl_power output.
+
+    Args:
+        line (str): A line of rtl_power CSV output.
+
+    Returns:
+        tuple: A tuple consisting of:
+            freq (np.array): Centre frequencies of each bin in the hop, in Hz.
+            power (np.array): Measured signal power of each bin in the hop, in dB.
+            freq_step (float): Frequency step between points, in Hz.
+    """
+    fields = line.split(",", 6)
+
+    if len(fields) < 6:
+        logging.error("Scanner - Invalid number of samples in input - corrupt?")
+        raise Exception("Scanner - Invalid number of samples in input - corrupt?")
+
+    start_freq = float(fields[2])
+    stop_freq = float(fields[3])
+    freq_step = float(fields[4])
+
+    if len(fields) == 7 and fields[6].strip() != "":
+        power = np.array(fields[6].split(","), dtype=float)
+    else:
+        power = np.array([])
+
+    freq = np.linspace(start_freq, stop_freq, len(power))
+
+    return (freq, power, freq_step)
+
+
+def read_rtl_power_stream(process, stop=None):
+    """ Read hops from a streaming rtl_power process as they are produced.
+
+    Args:
+        process (subprocess.Popen): rtl_power process, as returned by start_rtl_power_stream.
+        stop (int): End of the search window, in Hz. If provided, stop reading as soon as a hop
+            reaching this frequency is received, rather than waiting for rtl_power to close its output.
+
+    Yields:
+        tuple: (freq, power, freq_step) for each hop, as returned by parse_rtl_power_line.
+    """
+    for _line in iter(process.stdout.readline, b""):
+        _line = _line.decode("ascii").strip()
+        if _line == "":
+            continue
+
+        (_freq, _power, _step) = parse_rtl_power_line(_line)
+
+        yield (_freq, _power, _step)
+
+        # rtl_power produces hops in order of increasing frequency, so once we have a hop
+        # covering the top of the search range, the sweep is complete.
+        if (stop is not None) and (len(_freq) > 0) and (_freq[-1] >= (stop - _step)):
+            return
+
+
+def close_rtl_power_stream(process, stderr, device_idx=0, bias=False, timeout=30):
+    """ Wait for a streaming rtl_power process to exit, killing it if necessary, and check for errors.
+
+    Args:
+        process (subprocess.Popen): rtl_power process, as returned by start_rtl_power_stream.
+        stderr (AsynchronousFileReader): stderr reader, as returned by start_rtl_power_stream.
+        device_idx (int or str): Device index or serial number of the RTLSDR.
+        bias (bool): If True, the bias tee option was used.
+        timeout (int): Time to wait for rtl_power to exit (seconds) before killing it.
+
+    Returns:
+        bool: True if rtl_power exited cleanly, False otherwise.
+    """
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logging.error(
+            "Scanner #%s - rtl_power did not exit, killing." % str(device_idx)
+        )
+        try:
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+        except Exception as e:
+            logging.debug(
+                "Scanner #%s - Error killing rtl_power - %s" % (str(device_idx), str(e))
+            )
+        process.wait()
+
+    stderr.join(timeout=1)
+    process.stdout.close()
+    process.stderr.close()
+
+    # rtl_power being stopped with a SIGTERM (i.e. by a SpectrumMonitor) is not an error.
+    if process.returncode not in (0, -signal.SIGTERM):
+        _output = b"".join(stderr.readlines()).decode("ascii", errors="ignore")
+        log_rtl_power_error(
+            _output, process.returncode, device_idx=device_idx, bias=bias
+        )
+        return False
+
+    return True
+
+
 def read_rtl_power(filename):
     """ Read in frequency samples from a single-shot log file produced by rtl_power 
 
+    The whole file is read in a single pass, and all of the power samples are converted
+    to floats in one vectorised call, rather than parsing (and appending) line-by-line.
+
     Args:
         filename (str): Filename to read in.
 
@@ -181,21 +428,23 @@ def read_rtl_power(filename):
 
     """
 
-    # Output buffers.
-    freq = np.array([])
-    power = np.array([])
-
     freq_step = 0
 
-    # Open file.
-    f = open(filename, "r")
+    # Per-hop parameters, extracted from the hop headers.
+    _hop_start = []
+    _hop_stop = []
+    _hop_samples = []
+    # Raw (unparsed) sample fields for each hop.
+    _sample_text = []
 
     # rtl_power log files are csv's, with the first 6 fields in each line describing the time and frequency scan parameters
     # for the remaining fields, which contain the power samples.
+    with open(filename, "r") as f:
+        _lines = f.read().splitlines()
 
-    for line in f:
-        # Split line into fields.
-        fields = line.split(",")
+    for line in _lines:
+        # Split the header fields off the line, leaving the sample fields as a single string.
+        fields = line.split(",", 6)
 
         if len(fields) < 6:
             logging.error(
@@ -205,22 +454,44 @@ def read_rtl_power(filename):
                 "Scanner - Invalid number of samples in input file - corrupt?"
             )
 
-        start_date = fields[0]
-        start_time = fields[1]
-        start_freq = float(fields[2])
-        stop_freq = float(fields[3])
+        _hop_start.append(float(fields[2]))
+        _hop_stop.append(float(fields[3]))
         freq_step = float(fields[4])
-        n_samples = int(fields[5])
 
-        # freq_range = np.arange(start_freq,stop_freq,freq_step)
-        samples = np.loadtxt(StringIO(",".join(fields[6:])), delimiter=",")
-        freq_range = np.linspace(start_freq, stop_freq, len(samples))
+        # Use the number of samples actually present in the line (rather than the count
+        # given in fields[5]), so that a truncated final line is still handled.
+        if len(fields) == 7 and fields[6].strip() != "":
+            _sample_text.append(fields[6])
+            _hop_samples.append(fields[6].count(",") + 1)
+        else:
+            _hop_samples.append(0)
+
+    _hop_samples = np.array(_hop_samples, dtype=int)
+    _total_samples = int(np.sum(_hop_samples))
+
+    # Parse all the power samples in a single call.
+    power = np.fromstring(",".join(_sample_text), sep=",")
+    if len(power) != _total_samples:
+        logging.error(
+            "Scanner - Could not parse power samples in input file - corrupt?"
+        )
+        raise Exception(
+            "Scanner - Could not parse power samples in input file - corrupt?"
+        )
+
+    # Generate the frequency axis. Each hop is evenly spaced between its start and stop frequencies,
+    # which is equivalent to a np.linspace(start, stop, n_samples) per hop.
+    freq = np.empty(_total_samples)
+    if _total_samples > 0:
+        _hop_idx = np.repeat(np.arange(len(_hop_samples)), _hop_samples)
+        _hop_offset = np.cumsum(_hop_samples) - _hop_samples
+        _bin_idx = np.arange(_total_samples) - _hop_offset[_hop_idx]
 
-        # Add frequency range and samples to output buffers.
-        freq = np.append(freq, freq_range)
-        power = np.append(power, samples)
+        _start = np.array(_hop_start)
+        _span = np.array(_hop_stop) - _start
+        _bin_width = _span / np.maximum(_hop_samples - 1, 1)
 
-    f.close()
+        freq[:] = _start[_hop_idx] + _bin_idx * _bin_width[_hop_idx]
 
     # Sanitize power values, to remove the nan's that rtl_power puts in there occasionally.
     power = np.nan_to_num(power)
@@ -228,320 +499,1588 @@ def read_rtl_power(filename):
     return (freq, power, freq_step)
 
 
-def detect_sonde(
-    frequency,
-    rs_path="./",
-    dwell_time=10,
-    sdr_fm="rtl_fm",
-    device_idx=0,
-    ppm=0,
-    gain=-1,
-    bias=False,
-    save_detection_audio=False,
-    ngp_tweak=False,
-):
-    """ Receive some FM and attempt to detect the presence of a radiosonde. 
+#
+# Native FFT Spectrum Scanning
+#
+# An alternative to rtl_power, which computes averaged, windowed power spectra from raw IQ samples.
+# IQ samples can be sourced from rtl_sdr, a rtl_tcp server, or a recorded IQ file.
+#
+
+
+def convert_iq(data, iq_format="cu8"):
+    """ Convert raw IQ data into complex samples.
 
     Args:
-        frequency (int): Frequency to perform the detection on, in Hz.
-        rs_path (str): Path to the RS binaries (i.e rs_detect). Defaults to ./
-        dwell_time (int): Timeout before giving up detection.
-        sdr_fm (str): Path to rtl_fm, or drop-in equivalent. Defaults to 'rtl_fm'
-        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
-        ppm (int): SDR Frequency accuracy correction, in ppm.
-        gain (int): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
-        bias (bool): If True, enable the bias tee on the SDR.
-        save_detection_audio (bool): Save the audio used in detection to a file.
-        ngp_tweak (bool): When scanning in the 1680 MHz sonde band, use a narrower FM filter for better RS92-NGP detection.
+        data (bytes): Raw IQ data.
+        iq_format (str): Sample format - 'cu8' (unsigned 8-bit, as produced by rtl_sdr and rtl_tcp),
+            'cs16' (signed 16-bit) or 'cf32' (32-bit float).
 
     Returns:
-        str/None: Returns None if no sonde found, otherwise returns a sonde type, from the following:
-            'RS41' - Vaisala RS41
-            'RS92' - Vaisala RS92
-            'DFM' - Graw DFM06 / DFM09 (similar telemetry formats)
-            'M10' - MeteoModem M10
-            'M20' - MeteoModem M20
-            'iMet' - interMet iMet
-            'MK2LMS' - LMS6, 1680 MHz variant (using MK2A 9600 baud telemetry)
-
+        np.array: Complex (np.complex64) samples.
     """
+    if iq_format == "cu8":
+        _raw = np.frombuffer(data, dtype=np.uint8)
+        _raw = _raw[: len(_raw) // 2 * 2].astype(np.float32)
+        _raw = (_raw - 127.5) / 128.0
+    elif iq_format == "cs16":
+        _raw = np.frombuffer(data[: len(data) // 4 * 4], dtype=np.int16)
+        _raw = _raw.astype(np.float32) / 32768.0
+    elif iq_format == "cf32":
+        _raw = np.frombuffer(data[: len(data) // 8 * 8], dtype=np.float32)
+    else:
+        raise ValueError("Unknown IQ format: %s" % iq_format)
 
-    # Notes:
-    # 400 MHz sondes: Use --bw 20  (20 kHz BW)
-    # 1680 MHz RS92 Setting: --bw 32
-    # 1680 MHz LMS6-1680: Use FM demod. as usual.
+    return _raw.view(np.complex64)
 
-    # Example command (for command-line testing):
-    # rtl_fm -T -p 0 -M fm -g 26.0 -s 15k -f 401500000 | sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -t wav - highpass 20 | ./rs_detect -z -t 8
 
-    # Add a -T option if bias is enabled
-    bias_option = "-T " if bias else ""
+IQ_SAMPLE_SIZE = {"cu8": 2, "cs16": 4, "cf32": 8}
 
-    # Add a gain parameter if we have been provided one.
-    if gain != -1:
-        gain_param = "-g %.1f " % gain
-    else:
-        gain_param = ""
 
-    # Adjust the detection bandwidth based on the band the scanning is occuring in.
-    if frequency < 1000e6:
-        # 400-406 MHz sondes - use a 22 kHz detection bandwidth.
-        _mode = "IQ"
-        _iq_bw = 48000
-        _if_bw = 20
-    else:
-        # 1680 MHz sondes
-        # Both the RS92-NGP and 1680 MHz LMS6 have a much wider bandwidth than their 400 MHz counterparts.
-        # The RS92-NGP is maybe 25 kHz wide, and the LMS6 is 175 kHz (!!) wide.
-        # Given the huge difference between these two, we default to using a very wide FM bandwidth, but allow the user
-        # to narrow this if only RS92-NGPs are expected.
-        if ngp_tweak:
-            # RS92-NGP detection
-            _mode = "IQ"
-            _iq_bw = 48000
-            _if_bw = 32
+class RTLSDRIQSource(object):
+    """ Capture IQ samples using rtl_sdr (or drop-in equivalent). A new rtl_sdr process is started for each capture. """
+
+    iq_format = "cu8"
+    # rtl_sdr can be tuned anywhere.
+    centre_freq = None
+
+    def __init__(
+        self,
+        device_idx=0,
+        sample_rate=2048000,
+        ppm=0,
+        gain=-1,
+        bias=False,
+        rtl_sdr_path="rtl_sdr",
+        chunk_size=262144,
+    ):
+        """
+        Args:
+            device_idx (int or str): Device index or serial number of the RTLSDR.
+            sample_rate (int): Sample rate, in Hz.
+            ppm (int): SDR Frequency accuracy correction, in ppm.
+            gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+            bias (bool): If True, enable the bias tee on the SDR.
+            rtl_sdr_path (str): Path to rtl_sdr.
+            chunk_size (int): Number of samples to return in each chunk.
+        """
+        self.device_idx = device_idx
+        self.sample_rate = sample_rate
+        self.ppm = ppm
+        self.gain = gain
+        self.bias = bias
+        self.rtl_sdr_path = rtl_sdr_path
+        self.chunk_size = chunk_size
+
+    def capture(self, frequency, num_samples):
+        """ Capture IQ samples at a frequency.
+
+        Args:
+            frequency (float): Centre frequency, in Hz.
+            num_samples (int): Number of samples to capture.
+
+        Yields:
+            np.array: Chunks of complex samples.
+        """
+        # Add a -T option if bias is enabled
+        bias_option = "-T " if self.bias else ""
+
+        # Add a gain parameter if we have been provided one.
+        if self.gain != -1:
+            gain_param = "-g %.1f " % self.gain
+        else:
+            gain_param = ""
+
+        _cmd = "timeout %d %s %s-p %d -d %s %s-s %d -f %d -n %d - 2>/dev/null" % (
+            num_samples // self.sample_rate + 10,
+            self.rtl_sdr_path,
+            bias_option,
+            int(self.ppm),
+            str(self.device_idx),
+            gain_param,
+            self.sample_rate,
+            frequency,
+            num_samples,
+        )
+        logging.debug(
+            "Scanner #%s - Running command: %s" % (str(self.device_idx), _cmd)
+        )
+
+        _process = subprocess.Popen(
+            _cmd, shell=True, stdout=subprocess.PIPE, preexec_fn=os.setsid
+        )
+        _chunk_bytes = self.chunk_size * IQ_SAMPLE_SIZE[self.iq_format]
+
+        try:
+            while True:
+                _data = _process.stdout.read(_chunk_bytes)
+                if not _data:
+                    break
+                yield convert_iq(_data, self.iq_format)
+        finally:
+            if _process.poll() is None:
+                os.killpg(os.getpgid(_process.pid), signal.SIGTERM)
+            _process.stdout.close()
+            _process.wait()
+
+        if _process.returncode not in (0, -signal.SIGTERM):
+            raise IOError("rtl_sdr exited with return code %d" % _process.returncode)
+
+    def close(self):
+        pass
+
+
+class RTLTCPIQSource(object):
+    """ Capture IQ samples from a rtl_tcp server. The connection is held open between captures. """
+
+    iq_format = "cu8"
+    centre_freq = None
+
+    # rtl_tcp command codes.
+    CMD_SET_FREQ = 0x01
+    CMD_SET_SAMPLE_RATE = 0x02
+    CMD_SET_GAIN_MODE = 0x03
+    CMD_SET_GAIN = 0x04
+    CMD_SET_FREQ_CORRECTION = 0x05
+    CMD_SET_BIAS_TEE = 0x0E
+
+    def __init__(
+        self,
+        host="localhost",
+        port=1234,
+        sample_rate=2048000,
+        ppm=0,
+        gain=-1,
+        bias=False,
+        settle_time=0.1,
+        chunk_size=262144,
+        timeout=10,
+    ):
+        """
+        Args:
+            host (str): Hostname of the rtl_tcp server.
+            port (int): Port of the rtl_tcp server.
+            sample_rate (int): Sample rate, in Hz.
+            ppm (int): SDR Frequency accuracy correction, in ppm.
+            gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+            bias (bool): If True, enable the bias tee on the SDR.
+            settle_time (float): Discard this many seconds of samples after each retune.
+            chunk_size (int): Number of samples to return in each chunk.
+            timeout (int): Socket timeout, in seconds.
+        """
+        self.host = host
+        self.port = port
+        self.sample_rate = sample_rate
+        self.ppm = ppm
+        self.gain = gain
+        self.bias = bias
+        self.settle_time = settle_time
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        self.sock = None
+
+    def connect(self):
+        """ Connect to the rtl_tcp server, and configure the SDR. """
+        self.sock = socket.create_connection((self.host, self.port), self.timeout)
+
+        # The server first sends a 12-byte header: 'RTL0', tuner type, number of gain steps.
+        _header = self._read_bytes(12)
+        if _header[:4] != b"RTL0":
+            self.close()
+            raise IOError("Invalid header from rtl_tcp server.")
+
+        self.send_command(self.CMD_SET_SAMPLE_RATE, self.sample_rate)
+        self.send_command(self.CMD_SET_FREQ_CORRECTION, int(self.ppm) & 0xFFFFFFFF)
+        if self.gain == -1:
+            self.send_command(self.CMD_SET_GAIN_MODE, 0)
+        else:
+            self.send_command(self.CMD_SET_GAIN_MODE, 1)
+            # Gain is set in tenths of a dB.
+            self.send_command(self.CMD_SET_GAIN, int(self.gain * 10))
+        self.send_command(self.CMD_SET_BIAS_TEE, 1 if self.bias else 0)
+
+    def send_command(self, command, param):
+        """ Send a command to the rtl_tcp server. """
+        self.sock.sendall(struct.pack(">BI", command, param))
+
+    def _read_bytes(self, num_bytes):
+        """ Read exactly num_bytes from the socket. """
+        _data = bytearray()
+        while len(_data) < num_bytes:
+            _chunk = self.sock.recv(num_bytes - len(_data))
+            if not _chunk:
+                raise IOError("rtl_tcp connection closed.")
+            _data.extend(_chunk)
+        return bytes(_data)
+
+    def capture(self, frequency, num_samples):
+        """ Capture IQ samples at a frequency.
+
+        Args:
+            frequency (float): Centre frequency, in Hz.
+            num_samples (int): Number of samples to capture.
+
+        Yields:
+            np.array: Chunks of complex samples.
+        """
+        if self.sock is None:
+            self.connect()
+
+        try:
+            self.send_command(self.CMD_SET_FREQ, int(frequency))
+
+            _sample_size = IQ_SAMPLE_SIZE[self.iq_format]
+            # Discard samples buffered before (and during) the retune.
+            self._read_bytes(int(self.settle_time * self.sample_rate) * _sample_size)
+
+            _remaining = num_samples
+            while _remaining > 0:
+                _count = min(self.chunk_size, _remaining)
+                yield convert_iq(
+                    self._read_bytes(_count * _sample_size), self.iq_format
+                )
+                _remaining -= _count
+        except (socket.error, socket.timeout) as e:
+            self.close()
+            raise IOError("rtl_tcp error - %s" % str(e))
+
+    def close(self):
+        """ Close the connection to the rtl_tcp server. """
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except:
+                pass
+            self.sock = None
+
+
+class FileIQSource(object):
+    """ Read IQ samples from a recorded file, for offline testing.
+    The recording is treated as a single capture at a fixed centre frequency.
+    """
+
+    def __init__(
+        self,
+        filename,
+        centre_freq,
+        sample_rate=2048000,
+        iq_format="cu8",
+        loop=True,
+        chunk_size=262144,
+    ):
+        """
+        Args:
+            filename (str): IQ recording to read.
+            centre_freq (float): Centre frequency of the recording, in Hz.
+            sample_rate (int): Sample rate of the recording, in Hz.
+            iq_format (str): Sample format of the recording - 'cu8', 'cs16' or 'cf32'.
+            loop (bool): Loop back to the start of the file if more samples are requested than are available.
+            chunk_size (int): Number of samples to return in each chunk.
+        """
+        self.filename = filename
+        self.centre_freq = centre_freq
+        self.sample_rate = sample_rate
+        self.iq_format = iq_format
+        self.loop = loop
+        self.chunk_size = chunk_size
+
+    def capture(self, frequency, num_samples):
+        """ Read IQ samples from the file. The requested frequency is ignored.
+
+        Args:
+            frequency (float): Centre frequency, in Hz (unused).
+            num_samples (int): Number of samples to read.
+
+        Yields:
+            np.array: Chunks of complex samples.
+        """
+        _sample_size = IQ_SAMPLE_SIZE[self.iq_format]
+        _remaining = num_samples
+
+        with open(self.filename, "rb") as _f:
+            while _remaining > 0:
+                _count = min(self.chunk_size, _remaining)
+                _data = _f.read(_count * _sample_size)
+
+                if len(_data) < _sample_size:
+                    if self.loop and _remaining < num_samples:
+                        _f.seek(0)
+                        continue
+                    else:
+                        break
+
+                _samples = convert_iq(_data, self.iq_format)
+                _remaining -= len(_samples)
+                yield _samples
+
+    def close(self):
+        pass
+
+
+def iq_power_spectrum(chunks, fft_size, overlap=0.5, window=None):
+    """ Compute an averaged, windowed power spectrum (Welch's method) from chunks of IQ samples.
+
+    Args:
+        chunks (iterable): Chunks of complex samples.
+        fft_size (int): FFT size.
+        overlap (float): Fractional overlap between FFT segments (0 - <1).
+        window (np.array): Window function, of length fft_size. Defaults to a Hann window.
+
+    Returns:
+        np.array: Power of each FFT bin in dB (FFT-shifted, so DC is in the centre), or None if no
+            samples were available.
+    """
+    if window is None:
+        window = np.hanning(fft_size).astype(np.float32)
+
+    _hop = max(1, int(fft_size * (1.0 - overlap)))
+    _window_power = np.sum(window ** 2)
+
+    _accumulator = np.zeros(fft_size)
+    _segments = 0
+    # Carry samples over between chunks, so segments are not lost at chunk boundaries.
+    _carry = np.array([], dtype=np.complex64)
+
+    for _chunk in chunks:
+        _samples = np.concatenate((_carry, _chunk))
+        if len(_samples) < fft_size:
+            _carry = _samples
+            continue
+
+        # Remove the DC offset from this chunk.
+        _samples = _samples - np.mean(_samples)
+
+        _num_frames = (len(_samples) - fft_size) // _hop + 1
+        _frames = np.lib.stride_tricks.as_strided(
+            _samples,
+            shape=(_num_frames, fft_size),
+            strides=(_samples.strides[0] * _hop, _samples.strides[0]),
+            writeable=False,
+        )
+        _spectra = np.fft.fft(_frames * window, axis=1)
+        _accumulator += np.sum(np.abs(_spectra) ** 2, axis=0)
+        _segments += _num_frames
+
+        # Keep the samples not yet used in a whole segment.
+        _carry = _samples[_num_frames * _hop :]
+
+    if _segments == 0:
+        return None
+
+    _power = _accumulator / (_segments * _window_power)
+
+    return 10 * np.log10(np.fft.fftshift(_power) + 1e-20)
+
+
+def fft_power_scan(
+    start,
+    stop,
+    step,
+    iq_source,
+    dwell=20,
+    sample_rate=2048000,
+    crop=0.2,
+    overlap=0.5,
+    max_samples=None,
+):
+    """ Capture spectrum data using a native FFT scanner, producing output equivalent to read_rtl_power.
+
+    The frequency range is split into hops, with the edges of each hop (where the SDR filter response
+    rolls off) cropped off, in the same way as rtl_power's -c option.
+
+    Args:
+        start (int): Start of search window, in Hz.
+        stop (int): End of search window, in Hz.
+        step (int): Maximum search step (FFT bin width), in Hz.
+        iq_source: IQ source object (RTLSDRIQSource, RTLTCPIQSource or FileIQSource).
+        dwell (int): Total time to average over, across all hops, in seconds.
+        sample_rate (int): Sample rate, in Hz.
+        crop (float): Fraction of each hop to discard.
+        overlap (float): Fractional overlap between FFT segments.
+        max_samples (int): If provided, limit the number of samples processed per hop.
+
+    Returns:
+        tuple: A tuple consisting of:
+            freq (np.array): List of centre frequencies in Hz
+            power (np.array): List of measured signal powers, in dB.
+            freq_step (float): Frequency step between points, in Hz
+    """
+    # Pick a power-of-2 FFT size giving a bin width at or below the requested step.
+    _fft_size = int(2 ** np.ceil(np.log2(sample_rate / float(step))))
+    _bin_width = sample_rate / float(_fft_size)
+    _window = np.hanning(_fft_size).astype(np.float32)
+    _bin_offsets = (np.arange(_fft_size) - _fft_size // 2) * _bin_width
+
+    _usable_bw = sample_rate * (1.0 - crop)
+
+    if iq_source.centre_freq is not None:
+        # Fixed-frequency source, i.e. a recording. Use a single 'hop'.
+        _hop_centres = [iq_source.centre_freq]
+    else:
+        _num_hops = int(np.ceil((stop - start) / _usable_bw))
+        _hop_centres = start + _usable_bw * (np.arange(_num_hops) + 0.5)
+
+    _samples_per_hop = int(dwell * sample_rate / len(_hop_centres))
+    if max_samples is not None:
+        _samples_per_hop = min(_samples_per_hop, max_samples)
+
+    _freq = []
+    _power = []
+
+    for _centre in _hop_centres:
+        _spectrum = iq_power_spectrum(
+            iq_source.capture(_centre, _samples_per_hop),
+            _fft_size,
+            overlap=overlap,
+            window=_window,
+        )
+
+        if _spectrum is None:
+            raise IOError("No samples received from IQ source.")
+
+        # Replace the DC bin with its neighbours, to remove the DC spike.
+        _spectrum[_fft_size // 2] = 0.5 * (
+            _spectrum[_fft_size // 2 - 1] + _spectrum[_fft_size // 2 + 1]
+        )
+
+        # Crop to the usable bandwidth of this hop, and the requested frequency range.
+        _hop_freqs = _centre + _bin_offsets
+        _mask = (
+            (np.abs(_bin_offsets) < (_usable_bw / 2.0))
+            & (_hop_freqs >= start)
+            & (_hop_freqs <= stop)
+        )
+
+        _freq.append(_hop_freqs[_mask])
+        _power.append(_spectrum[_mask])
+
+    return (np.concatenate(_freq), np.concatenate(_power), _bin_width)
+
+
+def parse_dft_detect_output(ret_output, device_idx=0):
+    """ Parse the output of dft_detect into a sonde type and frequency offset.
+
+    Args:
+        ret_output (str): Output from dft_detect.
+        device_idx (int or str): Device index of the SDR used, for logging.
+
+    Returns:
+        tuple: (sonde type, frequency offset (Hz)). The sonde type is None if no sonde was detected.
+            Refer detect_sonde for the possible sonde types.
+    """
+    # Check for no output from dft_detect.
+    if ret_output is None or ret_output == "":
+        # logging.error("Scanner - dft_detect returned no output?")
+        return (None, 0.0)
+
+    # Split the line into sonde type and correlation score.
+    _fields = ret_output.split(":")
+
+    if len(_fields) < 2:
+        logging.error(
+            "Scanner - malformed output from dft_detect: %s" % ret_output.strip()
+        )
+        return (None, 0.0)
+
+    _type = _fields[0]
+    _score = _fields[1]
+
+    # Detect any frequency correction information:
+    try:
+        if "," in _score:
+            _offset_est = float(_score.split(",")[1].split("Hz")[0].strip())
+            _score = float(_score.split(",")[0].strip())
+        else:
+            _score = float(_score.strip())
+            _offset_est = 0.0
+    except Exception as e:
+        logging.error(
+            "Scanner - Error parsing dft_detect output: %s" % ret_output.strip()
+        )
+        return (None, 0.0)
+
+    _sonde_type = None
+
+    if "RS41" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a RS41! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "RS41"
+    elif "RS92" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a RS92! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "RS92"
+    elif "DFM" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a DFM Sonde! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "DFM"
+    elif "M10" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a M10 Sonde! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "M10"
+    elif "M20" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a M20 Sonde! (Not yet supported...) (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "M20"
+    elif "IMET4" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a iMet-4 Sonde! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "IMET"
+    elif "IMET1" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a iMet Sonde! (Type %s - Unsupported) (Score: %.2f)"
+            % (str(device_idx), _type, _score)
+        )
+        _sonde_type = "IMET1"
+    elif "IMETafsk" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a iMet Sonde! (Type %s - Unsupported) (Score: %.2f)"
+            % (str(device_idx), _type, _score)
+        )
+        _sonde_type = "IMET1"
+    elif "IMET5" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a iMet-54 Sonde! (Score: %.2f)"
+            % (str(device_idx), _score)
+        )
+        _sonde_type = "IMET5"
+    elif "LMS6" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a LMS6 Sonde! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        _sonde_type = "LMS6"
+    elif "C34" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a Meteolabor C34/C50 Sonde! (Not yet supported...) (Score: %.2f)"
+            % (str(device_idx), _score)
+        )
+        _sonde_type = "C34C50"
+    elif "MRZ" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a Meteo-Radiy MRZ Sonde! (Score: %.2f)"
+            % (str(device_idx), _score)
+        )
+        if _score < 0:
+            _sonde_type = "-MRZ"
+        else:
+            _sonde_type = "MRZ"
+
+    elif "MK2LMS" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a 1680 MHz LMS6 Sonde (MK2A Telemetry)! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        if _score < 0:
+            _sonde_type = "-MK2LMS"
+        else:
+            _sonde_type = "MK2LMS"
+
+    elif "MEISEI" in _type:
+        logging.debug(
+            "Scanner #%s - Detected a Meisei Sonde! (Score: %.2f, Offset: %.1f Hz)"
+            % (str(device_idx), _score, _offset_est)
+        )
+        # Not currently sure if we expect to see inverted Meisei sondes.
+        if _score < 0:
+            _sonde_type = "-MEISEI"
+        else:
+            _sonde_type = "MEISEI"
+    else:
+        _sonde_type = None
+
+    return (_sonde_type, _offset_est)
+
+
+# Interval between correlation score reports from dft_detect, in seconds.
+DFT_DETECT_SCORE_INTERVAL = 0.5
+
+# Cache of which dft_detect binaries support the --scores option.
+dft_detect_scores_support = {}
+
+
+def dft_detect_supports_scores(rs_path="./"):
+    """ Check if the dft_detect binary supports reporting correlation scores (--scores).
+
+    Older dft_detect builds will treat the option as a filename, so detection would always fail.
+
+    Args:
+        rs_path (str): Path to the RS binaries (i.e dft_detect).
+
+    Returns:
+        bool: True if the --scores option is supported.
+    """
+
+    _binary = os.path.join(rs_path, "dft_detect")
+
+    if _binary not in dft_detect_scores_support:
+        try:
+            _help = subprocess.run(
+                [_binary, "--help"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                timeout=5,
+            ).stdout.decode("utf8", errors="ignore")
+            dft_detect_scores_support[_binary] = "--scores" in _help
+        except Exception as e:
+            logging.debug("Scanner - Could not run %s - %s" % (_binary, str(e)))
+            dft_detect_scores_support[_binary] = False
+
+        if not dft_detect_scores_support[_binary]:
+            logging.warning(
+                "Scanner - %s does not support --scores, detection will run for the full dwell time. Re-build the RS utilities to enable early exit."
+                % _binary
+            )
+
+    return dft_detect_scores_support[_binary]
+
+
+def run_dft_detect_streaming(
+    command, dwell_time=10, device_idx=0, giveup_time=3.0, giveup_score=0.9
+):
+    """ Run a dft_detect command (with the --scores option), reading its output as it is produced.
+
+    dft_detect exits as soon as a sonde header is found. While searching, it reports the maximum correlation score
+    seen (as a fraction of the detection threshold) every DFT_DETECT_SCORE_INTERVAL seconds. If, after giveup_time
+    seconds, no score has come close to the threshold, it is unlikely there is a sonde present, and the detection
+    is stopped early.
+
+    Args:
+        command (str): Detection command (rtl_fm | dft_detect pipeline).
+        dwell_time (int): dft_detect dwell time, in seconds.
+        device_idx (int or str): Device index or serial number of the RTLSDR.
+        giveup_time (float): Time (in seconds of received samples) after which detection can be stopped early.
+        giveup_score (float): Stop early if no score has exceeded this fraction of the detection threshold.
+
+    Returns:
+        str: The dft_detect detection output line, or an empty string if no sonde was detected.
+    """
+    _start = time.time()
+    _process = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        preexec_fn=os.setsid,
+    )
+
+    _max_score = 0.0
+    _sample_time = 0.0
+    _result = ""
+    _gave_up = False
+
+    for _line in iter(_process.stdout.readline, b""):
+        _line = _line.decode("utf8", errors="ignore")
+
+        if not _line.startswith("SCORE:"):
+            # Anything else is a detection.
+            _result = _line
+            break
+
+        try:
+            _fields = _line[6:].split(",")
+            _sample_time = float(_fields[0])
+            _max_score = max(_max_score, float(_fields[1]))
+        except (ValueError, IndexError):
+            logging.error(
+                "Scanner #%s - malformed output from dft_detect: %s"
+                % (str(device_idx), _line.strip())
+            )
+            continue
+
+        if (_sample_time >= giveup_time) and (_max_score < giveup_score):
+            _gave_up = True
+            break
+
+    if _result == "" and _process.poll() is None:
+        # Stop the rest of the detection pipeline.
+        try:
+            os.killpg(os.getpgid(_process.pid), signal.SIGTERM)
+        except Exception as e:
+            logging.debug(
+                "Scanner #%s - Error stopping dft_detect - %s"
+                % (str(device_idx), str(e))
+            )
+
+    _process.stdout.close()
+    _process.wait()
+    _runtime = time.time() - _start
+
+    if _result != "":
+        logging.debug(
+            "Scanner #%s - dft_detect found a sonde after %.1f seconds."
+            % (str(device_idx), _runtime)
+        )
+    elif _gave_up:
+        logging.debug(
+            "Scanner #%s - Stopped detection after %.1f seconds (max score %.2f)."
+            % (str(device_idx), _runtime, _max_score)
+        )
+    elif (_sample_time == 0.0) and (_runtime >= dwell_time * 2):
+        # The pipeline ran until the rtl_fm timeout without producing any samples.
+        logging.error("Scanner #%s - dft_detect timed out." % str(device_idx))
+        raise IOError("Possible RTLSDR lockup.")
+    else:
+        logging.debug(
+            "Scanner #%s - dft_detect exited in %.1f seconds with no sonde detected."
+            % (str(device_idx), _runtime)
+        )
+
+    return _result
+
+
+# Amount of IQ to pass to the correlator detection backend at a time, in seconds.
+CORRELATOR_CHUNK_TIME = 0.1
+
+
+def format_correlator_detection(sonde_type, score, offset):
+    """ Format a detection from the correlator backend in the same way as dft_detect's output,
+    so it can be handled by parse_dft_detect_output. """
+    return "%s: %.4f , %+.1fHz\n" % (sonde_type, score, offset)
+
+
+def run_correlator_detection(
+    command,
+    sample_rate=48000,
+    if_bw=20,
+    dwell_time=10,
+    device_idx=0,
+    early_exit=False,
+    giveup_time=3.0,
+    giveup_score=0.9,
+    save_audio=None,
+):
+    """ Run a rtl_fm command producing 16-bit IQ, and detect sondes within its output using the
+    in-process correlator (autorx.correlator), instead of piping it into dft_detect.
+
+    Args:
+        command (str): rtl_fm command.
+        sample_rate (int): IQ sample rate, in Hz.
+        if_bw (int): IF filter bandwidth, in kHz (as per dft_detect's --bw option).
+        dwell_time (int): Time to attempt detection for, in seconds of received samples.
+        device_idx (int or str): Device index or serial number of the RTLSDR.
+        early_exit (bool): Give up on the detection early if the correlation scores stay well below the detection threshold.
+        giveup_time (float): If early_exit is set, give up after this many seconds...
+        giveup_score (float): ...if no correlation score has exceeded this fraction of the detection threshold.
+        save_audio (str): If provided, save the received IQ to this file.
+
+    Returns:
+        str: The detection result, in the same format as dft_detect's output, or an empty string if no sonde was detected.
+    """
+    _start = time.time()
+    _process = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        preexec_fn=os.setsid,
+    )
+
+    _correlator = SondeCorrelator(sample_rate=sample_rate, if_bw=if_bw * 1000)
+    _chunk_bytes = int(sample_rate * CORRELATOR_CHUNK_TIME) * IQ_SAMPLE_SIZE["cs16"]
+    _audio = open(save_audio, "wb") if save_audio else None
+
+    _result = ""
+    _gave_up = False
+
+    try:
+        while _correlator.samples < dwell_time * sample_rate:
+            _data = _process.stdout.read(_chunk_bytes)
+            if not _data:
+                break
+
+            if _audio:
+                _audio.write(_data)
+
+            _detections = _correlator.process(convert_iq(_data, "cs16"))
+            if len(_detections) > 0:
+                (_channel, _type, _score, _offset) = _detections[0]
+                _result = format_correlator_detection(_type, _score, _offset)
+                break
+
+            if (
+                early_exit
+                and (_correlator.samples >= giveup_time * sample_rate)
+                and (_correlator.max_scores[0] < giveup_score)
+            ):
+                _gave_up = True
+                break
+
+    finally:
+        if _audio:
+            _audio.close()
+
+        if _process.poll() is None:
+            # Stop rtl_fm
+            try:
+                os.killpg(os.getpgid(_process.pid), signal.SIGTERM)
+            except Exception as e:
+                logging.debug(
+                    "Scanner #%s - Error stopping rtl_fm - %s"
+                    % (str(device_idx), str(e))
+                )
+
+        _process.stdout.close()
+        _process.wait()
+
+    _runtime = time.time() - _start
+
+    if _result != "":
+        logging.debug(
+            "Scanner #%s - Correlator found a sonde after %.1f seconds."
+            % (str(device_idx), _runtime)
+        )
+    elif _gave_up:
+        logging.debug(
+            "Scanner #%s - Stopped detection after %.1f seconds (max score %.2f)."
+            % (str(device_idx), _runtime, _correlator.max_scores[0])
+        )
+    elif (_correlator.samples == 0) and (_process.returncode == 124):
+        # rtl_fm ran until its timeout without producing any samples.
+        logging.error("Scanner #%s - rtl_fm timed out." % str(device_idx))
+        raise IOError("Possible RTLSDR lockup.")
+    else:
+        logging.debug(
+            "Scanner #%s - Correlator finished in %.1f seconds with no sonde detected."
+            % (str(device_idx), _runtime)
+        )
+
+    return _result
+
+
+def detect_sonde(
+    frequency,
+    rs_path="./",
+    dwell_time=10,
+    sdr_fm="rtl_fm",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+    save_detection_audio=False,
+    ngp_tweak=False,
+    early_exit=False,
+    giveup_time=3.0,
+    giveup_score=0.9,
+    detect_backend="dft_detect",
+):
+    """ Receive some FM and attempt to detect the presence of a radiosonde. 
+
+    Args:
+        frequency (int): Frequency to perform the detection on, in Hz.
+        rs_path (str): Path to the RS binaries (i.e rs_detect). Defaults to ./
+        dwell_time (int): Timeout before giving up detection.
+        sdr_fm (str): Path to rtl_fm, or drop-in equivalent. Defaults to 'rtl_fm'
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (int): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+        bias (bool): If True, enable the bias tee on the SDR.
+        save_detection_audio (bool): Save the audio used in detection to a file.
+        ngp_tweak (bool): When scanning in the 1680 MHz sonde band, use a narrower FM filter for better RS92-NGP detection.
+        early_exit (bool): Have dft_detect report correlation scores while running, and give up on the detection
+            early if they stay well below the detection threshold. Requires a version of dft_detect supporting --scores.
+        giveup_time (float): If early_exit is set, give up after this many seconds...
+        giveup_score (float): ...if no correlation score has exceeded this fraction of the detection threshold.
+        detect_backend (str): 'dft_detect' to run detection using a rtl_fm | dft_detect pipeline, or 'correlator'
+            to run it in-process (autorx.correlator). The correlator only supports IQ detection, so dft_detect is
+            always used for 1680 MHz LMS6 detection.
+
+    Returns:
+        str/None: Returns None if no sonde found, otherwise returns a sonde type, from the following:
+            'RS41' - Vaisala RS41
+            'RS92' - Vaisala RS92
+            'DFM' - Graw DFM06 / DFM09 (similar telemetry formats)
+            'M10' - MeteoModem M10
+            'M20' - MeteoModem M20
+            'iMet' - interMet iMet
+            'MK2LMS' - LMS6, 1680 MHz variant (using MK2A 9600 baud telemetry)
+
+    """
+
+    # Notes:
+    # 400 MHz sondes: Use --bw 20  (20 kHz BW)
+    # 1680 MHz RS92 Setting: --bw 32
+    # 1680 MHz LMS6-1680: Use FM demod. as usual.
+
+    # Example command (for command-line testing):
+    # rtl_fm -T -p 0 -M fm -g 26.0 -s 15k -f 401500000 | sox -t raw -r 15k -e s -b 16 -c 1 - -r 48000 -t wav - highpass 20 | ./rs_detect -z -t 8
+
+    # Add a -T option if bias is enabled
+    bias_option = "-T " if bias else ""
+
+    # The correlator can only be used on IQ. (See below for the detection modes used in each band.)
+    _use_correlator = (detect_backend == "correlator") and (
+        (frequency < 1000e6) or ngp_tweak
+    )
+
+    # Have dft_detect report intermediate correlation scores, if supported.
+    if early_exit and (_use_correlator or dft_detect_supports_scores(rs_path)):
+        scores_option = "--scores %.1f " % DFT_DETECT_SCORE_INTERVAL
+    else:
+        early_exit = False
+        scores_option = ""
+
+    # Add a gain parameter if we have been provided one.
+    if gain != -1:
+        gain_param = "-g %.1f " % gain
+    else:
+        gain_param = ""
+
+    # Adjust the detection bandwidth based on the band the scanning is occuring in.
+    if frequency < 1000e6:
+        # 400-406 MHz sondes - use a 22 kHz detection bandwidth.
+        _mode = "IQ"
+        _iq_bw = 48000
+        _if_bw = 20
+    else:
+        # 1680 MHz sondes
+        # Both the RS92-NGP and 1680 MHz LMS6 have a much wider bandwidth than their 400 MHz counterparts.
+        # The RS92-NGP is maybe 25 kHz wide, and the LMS6 is 175 kHz (!!) wide.
+        # Given the huge difference between these two, we default to using a very wide FM bandwidth, but allow the user
+        # to narrow this if only RS92-NGPs are expected.
+        if ngp_tweak:
+            # RS92-NGP detection
+            _mode = "IQ"
+            _iq_bw = 48000
+            _if_bw = 32
         else:
             # LMS6-1680 Detection
             _mode = "FM"
             _rx_bw = 200000
 
-    if _mode == "IQ":
-        # IQ decoding
-        # Sample source (rtl_fm, in IQ mode)
-        rx_test_command = (
-            "timeout %ds %s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null |"
-            % (
-                dwell_time * 2,
-                sdr_fm,
-                bias_option,
-                int(ppm),
-                str(device_idx),
-                gain_param,
-                _iq_bw,
-                frequency,
-            )
-        )
-        # Saving of Debug audio, if enabled,
-        if save_detection_audio:
-            rx_test_command += "tee detect_%s.raw | " % str(device_idx)
+    if _mode == "IQ":
+        # IQ decoding
+        # Sample source (rtl_fm, in IQ mode)
+        _sdr_command = (
+            "timeout %ds %s %s-p %d -d %s %s-M raw -F9 -s %d -f %d 2>/dev/null"
+            % (
+                dwell_time * 2,
+                sdr_fm,
+                bias_option,
+                int(ppm),
+                str(device_idx),
+                gain_param,
+                _iq_bw,
+                frequency,
+            )
+        )
+        rx_test_command = _sdr_command + " |"
+        # Saving of Debug audio, if enabled,
+        if save_detection_audio:
+            rx_test_command += "tee detect_%s.raw | " % str(device_idx)
+
+        rx_test_command += os.path.join(
+            rs_path, "dft_detect"
+        ) + " -t %d %s--iq --bw %d --dc - %d 16 2>/dev/null" % (
+            dwell_time,
+            scores_option,
+            _if_bw,
+            _iq_bw,
+        )
+
+    elif _mode == "FM":
+        # FM decoding
+
+        # Sample Source (rtl_fm)
+        rx_test_command = (
+            "timeout %ds %s %s-p %d -d %s %s-M fm -F9 -s %d -f %d 2>/dev/null |"
+            % (
+                dwell_time * 2,
+                sdr_fm,
+                bias_option,
+                int(ppm),
+                str(device_idx),
+                gain_param,
+                _rx_bw,
+                frequency,
+            )
+        )
+        # Sample filtering
+        rx_test_command += (
+            "sox -t raw -r %d -e s -b 16 -c 1 - -r 48000 -t wav - highpass 20 2>/dev/null | "
+            % _rx_bw
+        )
+
+        # Saving of Debug audio, if enabled,
+        if save_detection_audio:
+            rx_test_command += "tee detect_%s.wav | " % str(device_idx)
+
+        # Sample decoding / detection
+        # Note that we detect for dwell_time seconds, and timeout after dwell_time*2, to catch if no samples are being passed through.
+        rx_test_command += os.path.join(
+            rs_path, "dft_detect"
+        ) + " -t %d %s2>/dev/null" % (dwell_time, scores_option)
+
+    if _use_correlator:
+        logging.debug(
+            "Scanner #%s - Using detection command: %s (in-process correlator)"
+            % (str(device_idx), _sdr_command)
+        )
+    else:
+        logging.debug(
+            "Scanner #%s - Using detection command: %s"
+            % (str(device_idx), rx_test_command)
+        )
+    logging.debug(
+        "Scanner #%s - Attempting sonde detection on %.3f MHz"
+        % (str(device_idx), frequency / 1e6)
+    )
+
+    if _use_correlator:
+        ret_output = run_correlator_detection(
+            _sdr_command,
+            sample_rate=_iq_bw,
+            if_bw=_if_bw,
+            dwell_time=dwell_time,
+            device_idx=device_idx,
+            early_exit=early_exit,
+            giveup_time=giveup_time,
+            giveup_score=giveup_score,
+            save_audio=("detect_%s.raw" % str(device_idx))
+            if save_detection_audio
+            else None,
+        )
+        return parse_dft_detect_output(ret_output, device_idx)
+
+    if early_exit:
+        ret_output = run_dft_detect_streaming(
+            rx_test_command,
+            dwell_time=dwell_time,
+            device_idx=device_idx,
+            giveup_time=giveup_time,
+            giveup_score=giveup_score,
+        )
+        return parse_dft_detect_output(ret_output, device_idx)
+
+    try:
+        FNULL = open(os.devnull, "w")
+        _start = time.time()
+        ret_output = subprocess.check_output(rx_test_command, shell=True, stderr=FNULL)
+        FNULL.close()
+        ret_output = ret_output.decode("utf8")
+    except subprocess.CalledProcessError as e:
+        # dft_detect returns a code of 1 if no sonde is detected.
+        # logging.debug("Scanner - dfm_detect return code: %s" % e.returncode)
+        if e.returncode == 124:
+            logging.error("Scanner #%s - dft_detect timed out." % str(device_idx))
+            raise IOError("Possible RTLSDR lockup.")
+
+        elif e.returncode >= 2:
+            ret_output = e.output.decode("utf8")
+        else:
+            _runtime = time.time() - _start
+            logging.debug(
+                "Scanner #%s - dft_detect exited in %.1f seconds with return code %d."
+                % (str(device_idx), _runtime, e.returncode)
+            )
+            return (None, 0.0)
+    except Exception as e:
+        # Something broke when running the detection function.
+        logging.error(
+            "Scanner #%s - Error when running dft_detect - %s"
+            % (str(device_idx), str(e))
+        )
+        return (None, 0.0)
+
+    _runtime = time.time() - _start
+    logging.debug(
+        "Scanner - dft_detect exited in %.1f seconds with return code 1." % _runtime
+    )
+
+    return parse_dft_detect_output(ret_output, device_idx)
+
+
+# Maximum width (Hz) of a signal which peak clustering will merge. The widest sonde signals (LMS6-1680) are
+# under 100 kHz wide, so anything wider is interference, or several signals close together.
+PEAK_CLUSTER_MAX_WIDTH = 100000
+# Minimum dip (dB) between two peaks for peak clustering to treat them as separate signals.
+PEAK_CLUSTER_MIN_DIP = 6.0
+
+# Sample rates (Hz) usable for wideband detection - multiples of 48 kHz which are within the RTLSDR's supported ranges.
+WIDEBAND_SAMPLE_RATES = [240000, 288000] + list(range(960000, 3200001, 48000))
+
+
+def wideband_usable_bandwidth(sample_rate, channel_rate=48000):
+    """ Bandwidth (Hz) of a wideband capture which can be used for detection.
+    Only the central 80% of the capture bandwidth is used, leaving space for the channel filters at the edges.
+    """
+    return 0.8 * sample_rate - channel_rate
+
+
+def wideband_sample_rate_for(frequencies, max_sample_rate=2400000):
+    """ Find the lowest wideband capture sample rate which can check a set of frequencies in a single tuning.
+
+    Args:
+        frequencies (list): Frequencies to be checked, in Hz.
+        max_sample_rate (int): Maximum sample rate to use, in Hz.
+
+    Returns:
+        int: Sample rate, in Hz. If the frequencies are spread too widely to be checked in a single tuning,
+            max_sample_rate is returned, and the frequencies will be checked in multiple tunings.
+    """
+    for _rate in WIDEBAND_SAMPLE_RATES:
+        if _rate >= max_sample_rate:
+            break
+
+        _tunings = group_frequencies(
+            frequencies, wideband_usable_bandwidth(_rate), dc_guard=25000
+        )
+        if len(_tunings) == 1:
+            return _rate
+
+    return max_sample_rate
+
+
+def detect_sonde_wideband(
+    frequencies,
+    rs_path="./",
+    dwell_time=10,
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+    sample_rate=2400000,
+    iq_source=None,
+    detect_backend="dft_detect",
+):
+    """ Attempt to detect radiosondes on a set of frequencies at the same time, using a single wideband capture.
+
+    The frequencies are grouped into as few tunings as possible. For each tuning, a wideband IQ capture is split into
+    48 kHz channels (one per frequency) using a channelizer, and each channel is fed to its own dft_detect process,
+    or all channels are processed together by the in-process correlator.
+    This is only suitable for 400 MHz sondes (IQ detection mode).
+
+    Args:
+        frequencies (list): Frequencies to perform detection on, in Hz.
+        rs_path (str): Path to the RS binaries (i.e dft_detect). Defaults to ./
+        dwell_time (int): Time to attempt detection for, in seconds.
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (int): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+        bias (bool): If True, enable the bias tee on the SDR.
+        sample_rate (int): Wideband capture sample rate, in Hz. Must be a multiple of 48 kHz.
+        iq_source: IQ source object to use instead of rtl_sdr (i.e. a FileIQSource for testing).
+        detect_backend (str): 'dft_detect' or 'correlator'. Refer detect_sonde.
+
+    Returns:
+        list: A list of [frequency (Hz), sonde type, frequency offset (Hz)] entries, for each detected sonde.
+    """
+    _channel_rate = 48000
+    _if_bw = 20
+
+    if iq_source is None:
+        iq_source = RTLSDRIQSource(
+            device_idx=device_idx,
+            sample_rate=sample_rate,
+            ppm=ppm,
+            gain=gain,
+            bias=bias,
+        )
+
+    _usable_bw = wideband_usable_bandwidth(sample_rate, _channel_rate)
+
+    if iq_source.centre_freq is not None:
+        # Fixed-frequency source - only check frequencies within its bandwidth.
+        _in_range = [
+            _f
+            for _f in frequencies
+            if abs(_f - iq_source.centre_freq) <= (_usable_bw / 2.0)
+        ]
+        _tunings = [(iq_source.centre_freq, _in_range)] if len(_in_range) > 0 else []
+    else:
+        _tunings = group_frequencies(frequencies, _usable_bw, dc_guard=25000)
+
+    _results = []
+
+    for (_centre, _channels) in _tunings:
+        logging.debug(
+            "Scanner #%s - Attempting wideband sonde detection on %d frequencies around %.3f MHz"
+            % (str(device_idx), len(_channels), _centre / 1e6)
+        )
+
+        _channelizer = Channelizer(sample_rate, _channel_rate, _centre, _channels)
+
+        if detect_backend == "correlator":
+            _start = time.time()
+            _correlator = SondeCorrelator(
+                sample_rate=_channel_rate, channels=len(_channels), if_bw=_if_bw * 1000
+            )
+
+            for _chunk in iq_source.capture(_centre, int(dwell_time * sample_rate)):
+                _outputs = _channelizer.process(_chunk)
+                if len(_outputs[0]) == 0:
+                    continue
+
+                for (_i, _type, _score, _offset) in _correlator.process(_outputs):
+                    (_type, _offset) = parse_dft_detect_output(
+                        format_correlator_detection(_type, _score, _offset), device_idx
+                    )
+                    if _type is not None:
+                        # Correct for the rounding of the channel frequency within the channelizer.
+                        _offset = _offset - _channelizer.channel_offsets[_i]
+                        _results.append([_channels[_i], _type, _offset])
+
+                if _correlator.finished():
+                    break
+
+            logging.debug(
+                "Scanner #%s - Wideband detection on %d frequencies completed in %.1f seconds."
+                % (str(device_idx), len(_channels), time.time() - _start)
+            )
+            continue
+
+        _detect_command = os.path.join(
+            rs_path, "dft_detect"
+        ) + " -t %d --iq --bw %d --dc - %d 16 2>/dev/null" % (
+            dwell_time,
+            _if_bw,
+            _channel_rate,
+        )
+
+        _detectors = []
+        for _freq in _channels:
+            _detectors.append(
+                subprocess.Popen(
+                    _detect_command,
+                    shell=True,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            )
+        _active = [True] * len(_detectors)
+
+        _start = time.time()
+        try:
+            for _chunk in iq_source.capture(_centre, int(dwell_time * sample_rate)):
+                for _i, _samples in enumerate(_channelizer.process(_chunk)):
+                    if (not _active[_i]) or (len(_samples) == 0):
+                        continue
+
+                    try:
+                        _detectors[_i].stdin.write(to_cs16(_samples))
+                        _detectors[_i].stdin.flush()
+                    except IOError:
+                        # dft_detect has exited, either because it has detected a sonde, or it has reached its time limit.
+                        _active[_i] = False
+
+                if not any(_active):
+                    break
+        finally:
+            # Close off all the detectors, and collect their outputs.
+            for _i, _detector in enumerate(_detectors):
+                try:
+                    _detector.stdin.close()
+                except IOError:
+                    pass
+
+                _output = _detector.stdout.read().decode("utf8")
+                _detector.wait()
+
+                (_type, _offset) = parse_dft_detect_output(_output, device_idx)
+                if _type is not None:
+                    # Correct for the rounding of the channel frequency within the channelizer.
+                    _offset = _offset - _channelizer.channel_offsets[_i]
+                    _results.append([_channels[_i], _type, _offset])
+
+        logging.debug(
+            "Scanner #%s - Wideband detection on %d frequencies completed in %.1f seconds."
+            % (str(device_idx), len(_channels), time.time() - _start)
+        )
+
+    return _results
+
+
+class SpectrumMonitor(object):
+    """ Persistent Spectrum Monitor
+
+    Keeps a single rtl_power process (running with interval output, rather than single-shot), or the
+    native FFT backend, running in a background thread, and publishes each completed sweep via a queue.
+    This avoids paying the SDR startup, tuner initialisation and AGC settling costs on every scan.
+
+    The monitor must be paused while the SDR is needed for something else (i.e. detection), and is
+    automatically resumed when the next sweep is requested.
+    """
+
+    def __init__(
+        self,
+        start,
+        stop,
+        step,
+        dwell=20,
+        sdr_power="rtl_power",
+        device_idx=0,
+        ppm=0,
+        gain=-1,
+        bias=False,
+        backend="rtl_power",
+        iq_source=None,
+        fft_sample_rate=2048000,
+    ):
+        """
+        Args:
+            start (int): Start of search window, in Hz.
+            stop (int): End of search window, in Hz.
+            step (int): Search step, in Hz.
+            dwell (int): How long to average each sweep over, in seconds.
+            sdr_power (str): Path to the rtl_power utility.
+            device_idx (int or str): Device index or serial number of the RTLSDR.
+            ppm (int): SDR Frequency accuracy correction, in ppm.
+            gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+            bias (bool): If True, enable the bias tee on the SDR.
+            backend (str): Spectrum backend to use - 'rtl_power' or 'fft'.
+            iq_source: IQ source object to use with the 'fft' backend.
+            fft_sample_rate (int): Sample rate to use with the 'fft' backend, in Hz.
+        """
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.dwell = dwell
+        self.sdr_power = sdr_power
+        self.device_idx = device_idx
+        self.ppm = ppm
+        self.gain = gain
+        self.bias = bias
+        self.backend = backend
+        self.iq_source = iq_source
+        self.fft_sample_rate = fft_sample_rate
+
+        # Only the latest sweep is kept.
+        self.sweeps = Queue(1)
+
+        # The monitor starts off paused, and is started by the first call to get_sweep.
+        self.paused = True
+        self.idle = Event()
+        self.idle.set()
+        self.resumed = Event()
+        self.state_lock = Lock()
+        self.rtl_power_stream = None
+
+        self.monitor_running = True
+        self.monitor_thread = Thread(target=self.run_monitor)
+        self.monitor_thread.start()
+
+    def run_monitor(self):
+        """ Monitor thread - run the spectrum backend while not paused. """
+        while self.monitor_running:
+            with self.state_lock:
+                if self.paused:
+                    self.idle.set()
+                    _paused = True
+                else:
+                    self.idle.clear()
+                    _paused = False
+                    if self.backend != "fft":
+                        self.rtl_power_stream = start_rtl_power_stream(
+                            self.start,
+                            self.stop,
+                            self.step,
+                            dwell=self.dwell,
+                            sdr_power=self.sdr_power,
+                            device_idx=self.device_idx,
+                            ppm=self.ppm,
+                            gain=self.gain,
+                            bias=self.bias,
+                            single_shot=False,
+                        )
+
+            if _paused:
+                self.resumed.wait(1)
+                continue
+
+            _ok = False
+            try:
+                if self.backend == "fft":
+                    _ok = self.run_fft()
+                else:
+                    _ok = self.run_rtl_power()
+            except Exception as e:
+                traceback.print_exc()
+                logging.error(
+                    "Scanner #%s - Spectrum monitor error - %s"
+                    % (str(self.device_idx), str(e))
+                )
+
+            with self.state_lock:
+                if not (_ok or self.paused):
+                    # The backend failed - pause, and let the scanner know.
+                    self.paused = True
+                    self.resumed.clear()
+                    self.publish(None)
+                self.idle.set()
 
-        rx_test_command += os.path.join(
-            rs_path, "dft_detect"
-        ) + " -t %d --iq --bw %d --dc - %d 16 2>/dev/null" % (
-            dwell_time,
-            _if_bw,
-            _iq_bw,
-        )
+    def run_rtl_power(self):
+        """ Read sweeps from rtl_power until it exits or is killed.
 
-    elif _mode == "FM":
-        # FM decoding
+        Returns:
+            bool: True if rtl_power was stopped by the monitor, False if it failed.
+        """
+        (_process, _stderr) = self.rtl_power_stream
+        _freq = []
+        _power = []
 
-        # Sample Source (rtl_fm)
-        rx_test_command = (
-            "timeout %ds %s %s-p %d -d %s %s-M fm -F9 -s %d -f %d 2>/dev/null |"
-            % (
-                dwell_time * 2,
-                sdr_fm,
-                bias_option,
-                int(ppm),
-                str(device_idx),
-                gain_param,
-                _rx_bw,
-                frequency,
-            )
-        )
-        # Sample filtering
-        rx_test_command += (
-            "sox -t raw -r %d -e s -b 16 -c 1 - -r 48000 -t wav - highpass 20 2>/dev/null | "
-            % _rx_bw
-        )
+        for (_hop_freq, _hop_power, _step) in read_rtl_power_stream(_process):
+            if len(_hop_freq) == 0:
+                continue
 
-        # Saving of Debug audio, if enabled,
-        if save_detection_audio:
-            rx_test_command += "tee detect_%s.wav | " % str(device_idx)
+            if (len(_freq) > 0) and (_hop_freq[0] < _freq[-1][0]):
+                # Start of a new sweep, without the last one being completed.
+                _freq = []
+                _power = []
+
+            _freq.append(_hop_freq)
+            _power.append(_hop_power)
+
+            # rtl_power produces hops in order of increasing frequency, so once we have a hop
+            # covering the top of the search range, the sweep is complete.
+            if _hop_freq[-1] >= (self.stop - _step):
+                # Sanitize power values, to remove the nan's that rtl_power puts in there occasionally.
+                self.publish(
+                    (
+                        np.concatenate(_freq),
+                        np.nan_to_num(np.concatenate(_power)),
+                        _step,
+                    )
+                )
+                _freq = []
+                _power = []
 
-        # Sample decoding / detection
-        # Note that we detect for dwell_time seconds, and timeout after dwell_time*2, to catch if no samples are being passed through.
-        rx_test_command += (
-            os.path.join(rs_path, "dft_detect") + " -t %d 2>/dev/null" % dwell_time
+        with self.state_lock:
+            self.rtl_power_stream = None
+            _stopped = self.paused or (not self.monitor_running)
+
+        _ok = close_rtl_power_stream(
+            _process, _stderr, device_idx=self.device_idx, bias=self.bias, timeout=5
         )
+        return _stopped or _ok
 
-    logging.debug(
-        "Scanner #%s - Using detection command: %s" % (str(device_idx), rx_test_command)
-    )
-    logging.debug(
-        "Scanner #%s - Attempting sonde detection on %.3f MHz"
-        % (str(device_idx), frequency / 1e6)
-    )
+    def run_fft(self):
+        """ Run FFT spectrum scans until paused.
 
-    try:
-        FNULL = open(os.devnull, "w")
-        _start = time.time()
-        ret_output = subprocess.check_output(rx_test_command, shell=True, stderr=FNULL)
-        FNULL.close()
-        ret_output = ret_output.decode("utf8")
-    except subprocess.CalledProcessError as e:
-        # dft_detect returns a code of 1 if no sonde is detected.
-        # logging.debug("Scanner - dfm_detect return code: %s" % e.returncode)
-        if e.returncode == 124:
-            logging.error("Scanner #%s - dft_detect timed out." % str(device_idx))
-            raise IOError("Possible RTLSDR lockup.")
+        Returns:
+            bool: True if the monitor was paused, False if the IQ source failed.
+        """
+        while not (self.paused or (not self.monitor_running)):
+            try:
+                _sweep = fft_power_scan(
+                    self.start,
+                    self.stop,
+                    self.step,
+                    self,
+                    dwell=self.dwell,
+                    sample_rate=self.fft_sample_rate,
+                )
+            except IOError:
+                # The IQ source has stopped, possibly because we have been paused.
+                break
 
-        elif e.returncode >= 2:
-            ret_output = e.output.decode("utf8")
-        else:
-            _runtime = time.time() - _start
-            logging.debug(
-                "Scanner #%s - dft_detect exited in %.1f seconds with return code %d."
-                % (str(device_idx), _runtime, e.returncode)
-            )
-            return (None, 0.0)
-    except Exception as e:
-        # Something broke when running the detection function.
-        logging.error(
-            "Scanner #%s - Error when running dft_detect - %s"
-            % (str(device_idx), str(e))
-        )
-        return (None, 0.0)
+            if not self.paused:
+                self.publish(_sweep)
 
-    _runtime = time.time() - _start
-    logging.debug(
-        "Scanner - dft_detect exited in %.1f seconds with return code 1." % _runtime
-    )
+        return self.paused or (not self.monitor_running)
 
-    # Check for no output from dft_detect.
-    if ret_output is None or ret_output == "":
-        # logging.error("Scanner - dft_detect returned no output?")
-        return (None, 0.0)
+    @property
+    def centre_freq(self):
+        """ Centre frequency of the underlying IQ source, for use by fft_power_scan. """
+        return self.iq_source.centre_freq
 
-    # Split the line into sonde type and correlation score.
-    _fields = ret_output.split(":")
+    def capture(self, frequency, num_samples):
+        """ Capture samples from the underlying IQ source, stopping early if the monitor is paused. """
+        for _samples in self.iq_source.capture(frequency, num_samples):
+            if self.paused or (not self.monitor_running):
+                break
+            yield _samples
 
-    if len(_fields) < 2:
-        logging.error(
-            "Scanner - malformed output from dft_detect: %s" % ret_output.strip()
-        )
-        return (None, 0.0)
+    def publish(self, sweep):
+        """ Add a sweep to the queue, replacing any sweep which has not been collected yet. """
+        try:
+            self.sweeps.get_nowait()
+        except Empty:
+            pass
+        self.sweeps.put(sweep)
 
-    _type = _fields[0]
-    _score = _fields[1]
+    def get_sweep(self, timeout=60):
+        """ Wait for the next completed sweep, resuming the monitor if it is paused.
 
-    # Detect any frequency correction information:
-    try:
-        if "," in _score:
-            _offset_est = float(_score.split(",")[1].split("Hz")[0].strip())
-            _score = float(_score.split(",")[0].strip())
-        else:
-            _score = float(_score.strip())
-            _offset_est = 0.0
-    except Exception as e:
-        logging.error(
-            "Scanner - Error parsing dft_detect output: %s" % ret_output.strip()
-        )
-        return (None, 0.0)
+        Args:
+            timeout (float): Time to wait for a sweep, in seconds.
 
-    _sonde_type = None
+        Returns:
+            tuple: A tuple consisting of:
+                freq (np.array): List of centre frequencies in Hz
+                power (np.array): List of measured signal powers, in dB.
+                freq_step (float): Frequency step between points, in Hz
+        """
+        self.resume()
 
-    if "RS41" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a RS41! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "RS41"
-    elif "RS92" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a RS92! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "RS92"
-    elif "DFM" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a DFM Sonde! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "DFM"
-    elif "M10" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a M10 Sonde! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "M10"
-    elif "M20" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a M20 Sonde! (Not yet supported...) (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "M20"
-    elif "IMET4" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a iMet-4 Sonde! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "IMET"
-    elif "IMET1" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a iMet Sonde! (Type %s - Unsupported) (Score: %.2f)"
-            % (str(device_idx), _type, _score)
-        )
-        _sonde_type = "IMET1"
-    elif "IMETafsk" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a iMet Sonde! (Type %s - Unsupported) (Score: %.2f)"
-            % (str(device_idx), _type, _score)
-        )
-        _sonde_type = "IMET1"
-    elif "IMET5" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a iMet-54 Sonde! (Score: %.2f)"
-            % (str(device_idx), _score)
-        )
-        _sonde_type = "IMET5"
-    elif "LMS6" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a LMS6 Sonde! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        _sonde_type = "LMS6"
-    elif "C34" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a Meteolabor C34/C50 Sonde! (Not yet supported...) (Score: %.2f)"
-            % (str(device_idx), _score)
-        )
-        _sonde_type = "C34C50"
-    elif "MRZ" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a Meteo-Radiy MRZ Sonde! (Score: %.2f)"
-            % (str(device_idx), _score)
-        )
-        if _score < 0:
-            _sonde_type = "-MRZ"
-        else:
-            _sonde_type = "MRZ"
+        try:
+            _sweep = self.sweeps.get(timeout=timeout)
+        except Empty:
+            # Make sure the SDR is released before it is reset.
+            self.pause()
+            raise IOError("No sweeps received from spectrum monitor.")
+
+        if _sweep is None:
+            if not self.monitor_running:
+                # The monitor has been closed.
+                return (np.array([]), np.array([]), 0)
+            raise IOError("Spectrum monitor failed.")
+
+        return _sweep
+
+    def resume(self):
+        """ Resume the monitor, if paused. Any sweeps captured before the monitor was paused are discarded. """
+        with self.state_lock:
+            if not self.paused:
+                return
 
-    elif "MK2LMS" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a 1680 MHz LMS6 Sonde (MK2A Telemetry)! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        if _score < 0:
-            _sonde_type = "-MK2LMS"
-        else:
-            _sonde_type = "MK2LMS"
+            try:
+                self.sweeps.get_nowait()
+            except Empty:
+                pass
 
-    elif "MEISEI" in _type:
-        logging.debug(
-            "Scanner #%s - Detected a Meisei Sonde! (Score: %.2f, Offset: %.1f Hz)"
-            % (str(device_idx), _score, _offset_est)
-        )
-        # Not currently sure if we expect to see inverted Meisei sondes.
-        if _score < 0:
-            _sonde_type = "-MEISEI"
-        else:
-            _sonde_type = "MEISEI"
-    else:
-        _sonde_type = None
+            self.paused = False
+            self.resumed.set()
 
-    return (_sonde_type, _offset_est)
+    def pause(self, timeout=30):
+        """ Pause the monitor, and wait until it has released the SDR. """
+        with self.state_lock:
+            self.paused = True
+            self.resumed.clear()
+
+            if self.rtl_power_stream is not None:
+                try:
+                    os.killpg(os.getpgid(self.rtl_power_stream[0].pid), signal.SIGTERM)
+                except Exception as e:
+                    logging.debug(
+                        "Scanner #%s - Error stopping rtl_power - %s"
+                        % (str(self.device_idx), str(e))
+                    )
+
+        if not self.idle.wait(timeout):
+            logging.error(
+                "Scanner #%s - Spectrum monitor did not release the SDR."
+                % str(self.device_idx)
+            )
+
+    def close(self):
+        """ Stop the monitor thread. """
+        self.monitor_running = False
+        self.pause()
+        self.resumed.set()
+        self.monitor_thread.join()
+        # Wake up anything waiting on a sweep.
+        self.publish(None)
 
 
 #
@@ -584,6 +2123,31 @@ class SondeScanner(object):
         temporary_block_list={},
         temporary_block_time=60,
         ngp_tweak=False,
+        rtl_power_streaming=False,
+        spectrum_backend="rtl_power",
+        spectrum_iq_source="rtl_sdr",
+        fft_sample_rate=2048000,
+        max_detection_sdrs=1,
+        sdr_allocator=None,
+        sdr_release=None,
+        wideband_detection=False,
+        wideband_sample_rate=2400000,
+        whitelist_wideband_detection=False,
+        detection_cache_time=0,
+        detection_cache_power_delta=3.0,
+        noise_floor_window=0,
+        noise_floor_percentile=50.0,
+        frequency_stats=None,
+        detect_early_exit=False,
+        detect_giveup_time=3.0,
+        detect_giveup_score=0.9,
+        iq_source=None,
+        spectrum_baseline=None,
+        spectrum_monitor=False,
+        peak_clustering=False,
+        peak_cluster_threshold=5.0,
+        peak_cluster_max_width=PEAK_CLUSTER_MAX_WIDTH,
+        detect_backend="dft_detect",
     ):
         """ Initialise a Sonde Scanner Object.
 
@@ -619,6 +2183,46 @@ class SondeScanner(object):
             temporary_block_list (dict): A dictionary where each attribute represents a frequency that should be blacklisted for a set time.
             temporary_block_time (int): How long (minutes) frequencies in the temporary block list should remain blocked for.
             ngp_tweak (bool): Narrow the detection filter when searching for 1680 MHz sondes, to enhance detection of RS92-NGPs.
+            rtl_power_streaming (bool): Read rtl_power's output through a pipe as each hop is produced, instead of via a log file.
+            spectrum_backend (str): Spectrum scanning backend to use - 'rtl_power', or 'fft' to compute spectra from IQ samples directly.
+            spectrum_iq_source (str/object): IQ source for the 'fft' backend - 'rtl_sdr', 'rtl_tcp:<host>:<port>', or an
+                IQ source object (i.e. a FileIQSource for offline testing).
+            fft_sample_rate (int): Sample rate to use with the 'fft' backend, in Hz.
+            max_detection_sdrs (int): Maximum number of SDRs (including this scanner's SDR) to run detection on concurrently.
+            sdr_allocator (function): Function to call to borrow an idle SDR for detection. Must return a dict with
+                'device_idx', 'ppm', 'gain' and 'bias' fields, or None if no SDRs are free.
+            sdr_release (function): Function to call (with the device_idx) to return a borrowed SDR.
+            wideband_detection (bool): Check all peaks at once, using a wideband capture split into channels, instead of
+                running a detection on each peak in turn. Only used for 400 MHz sondes.
+            wideband_sample_rate (int): Sample rate to use for wideband detection, in Hz. Must be a multiple of 48 kHz.
+            whitelist_wideband_detection (bool): When using a whitelist, check all whitelisted frequencies at once using
+                wideband detection, with the lowest sample rate (up to wideband_sample_rate) that covers them.
+                Only used if all whitelisted frequencies are below 1000 MHz.
+            detection_cache_time (int): Remember the outcome of detection attempts for this many seconds. Peaks where no sonde
+                was found are skipped while cached, unless their power changes. Set to 0 to disable.
+            detection_cache_power_delta (float): Re-check a cached peak if its power has changed by more than this (dB).
+            noise_floor_window (float): Estimate the noise floor using a rolling percentile over this bandwidth (Hz), and
+                threshold peaks against it. If set to 0, the mean power across the entire spectrum is used instead.
+            noise_floor_percentile (float): Percentile of the power within each window to use as the noise floor.
+            frequency_stats (FrequencyStatistics): If provided, record sonde detections in this statistics store, and
+                check peaks on frequencies which have previously had sondes at this time of day first.
+            detect_early_exit (bool): Stop detection early if the dft_detect correlation scores stay well below the detection threshold.
+            detect_giveup_time (float): Minimum time (seconds) to attempt detection for, when detect_early_exit is enabled.
+            detect_giveup_score (float): Continue detection past detect_giveup_time if any correlation score exceeds this
+                fraction of the detection threshold.
+            iq_source (object): An IQ source shared with other tasks (i.e. a WidebandCapture). If provided, this is used for
+                both FFT spectrum scans and wideband detection, and the SDR is left alone (not tested, reset or closed) by the scanner.
+            spectrum_baseline (SpectrumBaseline): If provided, compare each spectrum against this rolling baseline, and
+                check peaks which have newly appeared first, and peaks which have been present for a long time last.
+            spectrum_monitor (bool): Keep the spectrum backend (rtl_power or fft) running between scans, instead of
+                starting it for each scan. The monitor is paused while detection is running.
+            peak_clustering (bool): Merge peaks which are part of the same signal, and estimate the centre frequency
+                of each signal, so each transmitter is only checked once.
+            peak_cluster_threshold (float): SNR (dB) above which a bin is considered part of a signal.
+            peak_cluster_max_width (float): Maximum width of a signal (Hz). Peaks within wider blocks of
+                occupied spectrum are not merged. Limited to PEAK_CLUSTER_MAX_WIDTH.
+            detect_backend (str): Detection backend - 'dft_detect' (rtl_fm | dft_detect pipeline), or 'correlator'
+                (in-process, using autorx.correlator). Refer detect_sonde.
         """
 
         # Thread flag. This is set to True when a scan is running.
@@ -632,6 +2236,8 @@ class SondeScanner(object):
         self.whitelist = whitelist
         self.greylist = greylist
         self.blacklist = blacklist
+        # Sorted blacklist frequencies (Hz), for fast peak filtering.
+        self.blacklist_hz = np.sort(np.array(blacklist, dtype=float) * 1e6)
         self.snr_threshold = snr_threshold
         self.min_distance = min_distance
         self.quantization = quantization
@@ -648,6 +2254,69 @@ class SondeScanner(object):
         self.bias = bias
         self.callback = callback
         self.save_detection_audio = save_detection_audio
+        self.rtl_power_streaming = rtl_power_streaming
+
+        # Streaming rtl_power process and stderr reader, when rtl_power_streaming is in use.
+        self.rtl_power_stream = None
+
+        self.spectrum_backend = spectrum_backend
+        self.fft_sample_rate = fft_sample_rate
+        self.max_detection_sdrs = max_detection_sdrs
+        self.sdr_allocator = sdr_allocator
+        self.sdr_release = sdr_release
+        self.wideband_detection = wideband_detection
+        self.wideband_sample_rate = wideband_sample_rate
+
+        # Check whitelisted frequencies using a wideband capture, if they are all 400 MHz sonde frequencies.
+        self.whitelist_wideband = (
+            whitelist_wideband_detection
+            and (len(whitelist) > 0)
+            and (max(whitelist) < 1000.0)
+        )
+        if self.whitelist_wideband:
+            self.whitelist_sample_rate = wideband_sample_rate_for(
+                np.array(whitelist) * 1e6, wideband_sample_rate
+            )
+
+        # Detection result cache, keyed by (quantized) frequency.
+        self.detection_cache_time = detection_cache_time
+        self.detection_cache_power_delta = detection_cache_power_delta
+        self.detection_cache = {}
+        self.detection_cache_lock = Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Power levels of the peaks found in the current scan.
+        self.peak_level_lookup = {}
+        # Timing record for the current scan cycle.
+        self.scan_cycle = new_scan_cycle(self.device_idx)
+
+        self.noise_floor_window = noise_floor_window
+        self.noise_floor_percentile = noise_floor_percentile
+
+        self.peak_clustering = peak_clustering
+        self.peak_cluster_threshold = peak_cluster_threshold
+        self.peak_cluster_max_width = min(
+            peak_cluster_max_width, PEAK_CLUSTER_MAX_WIDTH
+        )
+
+        # Historical detection statistics.
+        self.frequency_stats = frequency_stats
+        # Rolling baseline spectrum.
+        self.spectrum_baseline = spectrum_baseline
+
+        self.detect_early_exit = detect_early_exit
+        self.detect_giveup_time = detect_giveup_time
+        self.detect_giveup_score = detect_giveup_score
+        self.detect_backend = detect_backend
+
+        # A shared IQ source is managed by whatever created it.
+        self.shared_iq_source = iq_source is not None
+        self.iq_source = iq_source
+        if (self.spectrum_backend == "fft") and (self.iq_source is None):
+            self.iq_source = self.create_iq_source(spectrum_iq_source)
+
+        # Persistent spectrum monitor, started once the SDR has been checked.
+        self.spectrum_monitor = None
 
         # Temporary block list.
         self.temporary_block_list = temporary_block_list.copy()
@@ -673,7 +2342,11 @@ class SondeScanner(object):
         self.sonde_scan_thread = None
 
         # Test if the supplied RTLSDR is working.
-        _rtlsdr_ok = rtlsdr_test(device_idx)
+        if self.shared_iq_source:
+            # The SDR is already in use by the shared IQ source.
+            _rtlsdr_ok = True
+        else:
+            _rtlsdr_ok = rtlsdr_test(device_idx)
 
         # TODO: How should this error be handled?
         if not _rtlsdr_ok:
@@ -682,6 +2355,23 @@ class SondeScanner(object):
             self.exit_state = "FAILED SDR"
             return
 
+        # Persistent spectrum monitor. This isn't needed if we are only checking whitelist frequencies.
+        if spectrum_monitor and (len(self.whitelist) == 0):
+            self.spectrum_monitor = SpectrumMonitor(
+                self.min_freq * 1e6,
+                self.max_freq * 1e6,
+                self.search_step,
+                dwell=self.scan_dwell_time,
+                sdr_power=self.sdr_power,
+                device_idx=self.device_idx,
+                ppm=self.ppm,
+                gain=self.gain,
+                bias=self.bias,
+                backend=self.spectrum_backend,
+                iq_source=self.iq_source,
+                fft_sample_rate=self.fft_sample_rate,
+            )
+
         self.exit_state = "OK"
 
         if auto_start:
@@ -726,7 +2416,12 @@ class SondeScanner(object):
 
             # If we are using a whitelist, we don't have an easy way of checking the RTLSDR
             # is producing useful data, so, test it.
-            if len(self.whitelist) > 0:
+            # (A wideband capture will fail if the RTLSDR is not producing data, so there's no need to test it.)
+            if (
+                (len(self.whitelist) > 0)
+                and (not self.shared_iq_source)
+                and (not self.whitelist_wideband)
+            ):
                 self.scan_counter += 1
                 if (self.scan_counter % self.scan_check_interval) == 0:
                     self.log_debug("Performing periodic check of RTLSDR.")
@@ -745,8 +2440,12 @@ class SondeScanner(object):
                 # traceback.print_exc()
                 self.log_warning("RTLSDR produced no output... resetting and retrying.")
                 self.error_retries += 1
-                # Attempt to reset the RTLSDR.
-                if self.device_idx == "0":
+                self.scan_cycle["reset"] = True
+                scan_stats.add_cycle(self.scan_cycle)
+                # Attempt to reset the RTLSDR, unless it is in use by other tasks.
+                if self.shared_iq_source:
+                    pass
+                elif self.device_idx == "0":
                     # If the device ID is 0, we assume we only have a single RTLSDR on this system.
                     reset_all_rtlsdrs()
                 else:
@@ -763,6 +2462,8 @@ class SondeScanner(object):
                 # Scan completed successfuly! Reset the error counter.
                 self.error_retries = 0
 
+            scan_stats.add_cycle(self.scan_cycle)
+
             # Sleep before starting the next scan.
             time.sleep(self.scan_delay)
 
@@ -788,176 +2489,129 @@ class SondeScanner(object):
             list: An empty list [] if no sondes are detected otherwise, a list of list, containing entries of [frequency (Hz), Sonde Type],
                 i.e. [[402500000,'RS41'],[402040000,'RS92']]
         """
-        global scan_result
-
         _search_results = []
 
+        self.scan_cycle = new_scan_cycle(self.device_idx)
+
         if len(self.whitelist) == 0:
             # No whitelist frequencies provided - perform a scan.
-            run_rtl_power(
-                self.min_freq * 1e6,
-                self.max_freq * 1e6,
-                self.search_step,
-                filename="log_power_%s.csv" % self.device_idx,
-                dwell=self.scan_dwell_time,
-                sdr_power=self.sdr_power,
-                device_idx=self.device_idx,
-                ppm=self.ppm,
-                gain=self.gain,
-                bias=self.bias,
-            )
-
-            # Exit opportunity.
-            if self.sonde_scanner_running == False:
-                return []
-
-            # Read in result.
-            # This step will throw an IOError if the file does not exist.
-            (freq, power, step) = read_rtl_power("log_power_%s.csv" % self.device_idx)
-            # Sanity check results.
-            if step == 0 or len(freq) == 0 or len(power) == 0:
-                # Otherwise, if a file has been written but contains no data, it can indicate
-                # an issue with the RTLSDR. Sometimes these issues can be resolved by issuing a usb reset to the RTLSDR.
-                raise ValueError("Invalid Log File")
-
-            # Update the global scan result
-            (_freq_decimate, _power_decimate) = peak_decimation(freq / 1e6, power, 10)
-            scan_result["freq"] = list(_freq_decimate)
-            scan_result["power"] = list(_power_decimate)
-            scan_result["timestamp"] = datetime.datetime.utcnow().isoformat()
-            scan_result["peak_freq"] = []
-            scan_result["peak_lvl"] = []
-
-            # Rough approximation of the noise floor of the received power spectrum.
-            power_nf = np.mean(power)
-            # Pass the threshold data to the web client for plotting
-            scan_result["threshold"] = power_nf
-
-            # Detect peaks.
-            peak_indices = detect_peaks(
-                power,
-                mph=(power_nf + self.snr_threshold),
-                mpd=(self.min_distance / step),
-                show=False,
-            )
-
-            # If we have found no peaks, and no greylist has been provided, re-scan.
-            if (len(peak_indices) == 0) and (len(self.greylist) == 0):
-                self.log_debug("No peaks found.")
-                # Emit a notification to the client that a scan is complete.
-                flask_emit_event("scan_event")
-                return []
-
-            # Sort peaks by power.
-            peak_powers = power[peak_indices]
-            peak_freqs = freq[peak_indices]
-            peak_frequencies = peak_freqs[np.argsort(peak_powers)][::-1]
+            try:
+                _start = time.time()
+                # Set once the spectrum has been captured, if it is read in separately.
+                _parse_start = None
+                if self.spectrum_monitor is not None:
+                    # Collect the next sweep from the persistent spectrum monitor.
+                    self.log_debug("Waiting for frequency scan (spectrum monitor).")
+                    (freq, power, step) = self.spectrum_monitor.get_sweep(
+                        timeout=self.scan_dwell_time + 30
+                    )
+                elif self.spectrum_backend == "fft":
+                    # Compute the spectrum ourselves from IQ samples.
+                    self.log_info("Running frequency scan (FFT).")
+                    (freq, power, step) = fft_power_scan(
+                        self.min_freq * 1e6,
+                        self.max_freq * 1e6,
+                        self.search_step,
+                        self.iq_source,
+                        dwell=self.scan_dwell_time,
+                        sample_rate=self.fft_sample_rate,
+                    )
+                elif self.rtl_power_streaming:
+                    # Read the spectrum straight from rtl_power's output as each hop is produced.
+                    (freq, power, step) = self.scan_spectrum_stream()
+                else:
+                    run_rtl_power(
+                        self.min_freq * 1e6,
+                        self.max_freq * 1e6,
+                        self.search_step,
+                        filename="log_power_%s.csv" % self.device_idx,
+                        dwell=self.scan_dwell_time,
+                        sdr_power=self.sdr_power,
+                        device_idx=self.device_idx,
+                        ppm=self.ppm,
+                        gain=self.gain,
+                        bias=self.bias,
+                    )
 
-            # Quantize to nearest x Hz
-            peak_frequencies = (
-                np.round(peak_frequencies / self.quantization) * self.quantization
-            )
+                    _parse_start = time.time()
 
-            # Remove any duplicate entries after quantization, but preserve order.
-            _, peak_idx = np.unique(peak_frequencies, return_index=True)
-            peak_frequencies = peak_frequencies[np.sort(peak_idx)]
+                    # Exit opportunity.
+                    if self.sonde_scanner_running == False:
+                        return []
 
-            # Blacklist & Temporary block list behaviour change as of v1.2.3
-            # Was: peak_frequencies==_frequency   (This only matched an exact frequency in the blacklist)
-            # Now (1.2.3): Block if the peak frequency is within +/-quantization/2.0 of a blacklist or blocklist frequency.
+                    # Read in result.
+                    # This step will throw an IOError if the file does not exist.
+                    (freq, power, step) = read_rtl_power(
+                        "log_power_%s.csv" % self.device_idx
+                    )
 
-            # Remove any frequencies in the blacklist.
-            for _frequency in np.array(self.blacklist) * 1e6:
-                _index = np.argwhere(
-                    np.abs(peak_frequencies - _frequency) < (self.quantization / 2.0)
-                )
-                peak_frequencies = np.delete(peak_frequencies, _index)
+                if _parse_start is None:
+                    # The spectrum was read in as it was captured.
+                    _parse_start = time.time()
+                self.scan_cycle["spectrum_time"] = _parse_start - _start
 
-            # Limit to the user-defined number of peaks to search over.
-            if len(peak_frequencies) > self.max_peaks:
-                peak_frequencies = peak_frequencies[: self.max_peaks]
+                # Exit opportunity.
+                if self.sonde_scanner_running == False:
+                    return []
 
-            # Append on any frequencies in the supplied greylist
-            peak_frequencies = np.append(
-                np.array(self.greylist) * 1e6, peak_frequencies
-            )
+                # Sanity check results.
+                if step == 0 or len(freq) == 0 or len(power) == 0:
+                    # Otherwise, if a file has been written but contains no data, it can indicate
+                    # an issue with the RTLSDR. Sometimes these issues can be resolved by issuing a usb reset to the RTLSDR.
+                    raise ValueError("Invalid Log File")
 
-            # Remove any frequencies in the temporary block list
-            self.temporary_block_list_lock.acquire()
-            for _frequency in self.temporary_block_list.copy().keys():
-                # Check the time the block was added.
-                if self.temporary_block_list[_frequency] > (
-                    time.time() - self.temporary_block_time * 60
-                ):
-                    # We should still be blocking this frequency, so remove any peaks with this frequency.
-                    _index = np.argwhere(
-                        np.abs(peak_frequencies - _frequency)
-                        < (self.quantization / 2.0)
-                    )
-                    peak_frequencies = np.delete(peak_frequencies, _index)
-                    if len(_index) > 0:
-                        self.log_debug(
-                            "Peak on %.3f MHz was removed due to temporary block."
-                            % (_frequency / 1e6)
-                        )
+                peak_frequencies = self.process_spectrum(freq, power, step)
+                self.scan_cycle["parse_time"] = time.time() - _parse_start
 
-                else:
-                    # This frequency doesn't need to be blocked any more, remove it from the block list.
-                    self.temporary_block_list.pop(_frequency)
-                    self.log_info(
-                        "Removed %.3f MHz from temporary block list."
-                        % (_frequency / 1e6)
-                    )
+            finally:
+                # If rtl_power is streaming, we need to make sure it has released the SDR before continuing on to detection.
+                self.close_spectrum_stream()
 
-            self.temporary_block_list_lock.release()
+            if peak_frequencies is None:
+                return []
 
-            # Get the level of our peak search results, to send to the web client.
-            # This is actually a bit of a pain to do...
-            _peak_freq = []
-            _peak_lvl = []
-            for _peak in peak_frequencies:
-                try:
-                    # Find the index of the peak within our decimated frequency array.
-                    _peak_power_idx = np.argmin(
-                        np.abs(scan_result["freq"] - _peak / 1e6)
-                    )
-                    # Because we've decimated the freq & power data, the peak location may
-                    # not be exactly at this frequency, so we take the maximum of an area
-                    # around this location.
-                    _peak_search_min = max(0, _peak_power_idx - 5)
-                    _peak_search_max = min(
-                        len(scan_result["freq"]) - 1, _peak_power_idx + 5
-                    )
-                    # Grab the maximum value, and append it and the frequency to the output arrays
-                    _peak_lvl.append(
-                        max(scan_result["power"][_peak_search_min:_peak_search_max])
-                    )
-                    _peak_freq.append(_peak / 1e6)
-                except:
-                    pass
-            # Add the peak results to our global scan result dictionary.
-            scan_result["peak_freq"] = _peak_freq
-            scan_result["peak_lvl"] = _peak_lvl
-            # Tell the web client we have new data.
-            flask_emit_event("scan_event")
+            self.scan_cycle["peaks_checked"] = len(peak_frequencies)
 
-            if len(peak_frequencies) == 0:
-                self.log_debug("No peaks found after blacklist frequencies removed.")
-                return []
-            else:
-                self.log_info(
-                    "Detected peaks on %d frequencies (MHz): %s"
-                    % (len(peak_frequencies), str(peak_frequencies / 1e6))
-                )
+            # Detection needs the SDR, so pause the spectrum monitor. It is resumed when the next sweep is requested.
+            if (self.spectrum_monitor is not None) and (not self.shared_iq_source):
+                self.spectrum_monitor.pause()
 
         else:
             # We have been provided a whitelist - scan through the supplied frequencies.
             peak_frequencies = np.array(self.whitelist) * 1e6
+            self.scan_cycle["peaks_checked"] = len(peak_frequencies)
             self.log_info(
                 "Scanning on whitelist frequencies (MHz): %s"
                 % str(peak_frequencies / 1e6)
             )
 
+        # Check all the whitelisted frequencies at once, using a wideband capture.
+        if (
+            (len(self.whitelist) > 0)
+            and self.whitelist_wideband
+            and (not self.shared_iq_source)
+        ):
+            return self.wideband_detect(
+                peak_frequencies,
+                first_only=first_only,
+                sample_rate=self.whitelist_sample_rate,
+            )
+
+        # Check all the peaks at once using a wideband capture, if enabled.
+        # With a shared IQ source, this is the only way detection can be performed.
+        if self.shared_iq_source or (
+            self.wideband_detection and (np.max(peak_frequencies) < 1000e6)
+        ):
+            return self.wideband_detect(peak_frequencies, first_only=first_only)
+
+        # If we can borrow other SDRs, spread the detection attempts across them.
+        if (
+            (self.max_detection_sdrs > 1)
+            and (self.sdr_allocator is not None)
+            and (len(peak_frequencies) > 1)
+        ):
+            return self.parallel_detect(peak_frequencies, first_only=first_only)
+
         # Run rs_detect on each peak frequency, to determine if there is a sonde there.
         for freq in peak_frequencies:
 
@@ -967,6 +2621,7 @@ class SondeScanner(object):
             if self.sonde_scanner_running == False:
                 return []
 
+            _start = time.time()
             (detected, offset_est) = detect_sonde(
                 _freq,
                 sdr_fm=self.sdr_fm,
@@ -976,8 +2631,14 @@ class SondeScanner(object):
                 bias=self.bias,
                 dwell_time=self.detect_dwell_time,
                 save_detection_audio=self.save_detection_audio,
+                early_exit=self.detect_early_exit,
+                giveup_time=self.detect_giveup_time,
+                giveup_score=self.detect_giveup_score,
+                detect_backend=self.detect_backend,
             )
 
+            self.record_detection(_freq, detected, time.time() - _start)
+
             if detected != None:
                 # Quantize the detected frequency (with offset) to 1 kHz
                 _freq = round((_freq + offset_est) / 1000.0) * 1000.0
@@ -1000,6 +2661,590 @@ class SondeScanner(object):
 
         return _search_results
 
+    def apply_detection_cache(self, peak_frequencies, peak_levels):
+        """ Filter a list of peaks using the detection cache.
+
+        Peaks which were recently found to not contain a sonde, and whose power has not changed significantly
+        since then, are skipped. Peaks which recently contained a sonde are moved to the end of the list.
+
+        Args:
+            peak_frequencies (np.array): Peak frequencies (Hz), in order of priority.
+            peak_levels (np.array): Power of each peak, in dB.
+
+        Returns:
+            np.array: Filtered peak frequencies.
+        """
+        global scan_result
+
+        # Record the current peak levels, so we can add them to the cache after detection.
+        self.peak_level_lookup = {}
+        for _freq, _level in zip(peak_frequencies, peak_levels):
+            self.peak_level_lookup[int(round(_freq))] = _level
+
+        if self.detection_cache_time <= 0:
+            return peak_frequencies
+
+        _now = time.time()
+
+        with self.detection_cache_lock:
+            # Remove old entries.
+            for _freq in list(self.detection_cache.keys()):
+                if (
+                    _now - self.detection_cache[_freq]["time"]
+                ) > self.detection_cache_time:
+                    self.detection_cache.pop(_freq)
+
+            _check = []
+            _deprioritised = []
+            for _freq, _level in zip(peak_frequencies, peak_levels):
+                _entry = self.detection_cache.get(int(round(_freq)), None)
+
+                if (_entry is None) or (
+                    abs(_level - _entry["power"]) > self.detection_cache_power_delta
+                ):
+                    # Not checked recently, or something has changed on this frequency.
+                    self.cache_misses += 1
+                    _check.append(_freq)
+                    continue
+
+                self.cache_hits += 1
+                if _entry["result"] is None:
+                    self.log_debug(
+                        "Skipping peak on %.3f MHz - no sonde detected %d seconds ago."
+                        % (_freq / 1e6, _now - _entry["time"])
+                    )
+                else:
+                    _deprioritised.append(_freq)
+
+        scan_result["cache_hits"] = self.cache_hits
+        scan_result["cache_misses"] = self.cache_misses
+
+        return np.array(_check + _deprioritised)
+
+    def record_detection(self, frequency, result, runtime=0.0):
+        """ Add the outcome of a detection attempt to the detection cache, frequency and scan statistics.
+
+        Args:
+            frequency (float): Peak frequency that detection was attempted on, in Hz.
+            result (str): Detected sonde type, or None if no sonde was detected.
+            runtime (float): Time taken by the detection attempt, in seconds.
+        """
+        # (list.append is thread-safe, so this can be called from the parallel detection workers.)
+        self.scan_cycle["detections"].append(
+            {"freq": float(frequency), "time": runtime, "result": result}
+        )
+
+        if (self.frequency_stats is not None) and (result is not None):
+            self.frequency_stats.add_detection(frequency)
+
+        if self.detection_cache_time <= 0:
+            return
+
+        _freq = int(round(frequency))
+        if _freq not in self.peak_level_lookup:
+            # Not a peak from the spectrum (i.e. a greylist or whitelist frequency).
+            return
+
+        with self.detection_cache_lock:
+            self.detection_cache[_freq] = {
+                "result": result,
+                "power": self.peak_level_lookup[_freq],
+                "time": time.time(),
+            }
+
+    def wideband_detect(self, peak_frequencies, first_only=False, sample_rate=None):
+        """ Run detection on a set of peaks concurrently, using a single wideband capture.
+
+        Args:
+            peak_frequencies (np.array): Frequencies to attempt detection on (Hz).
+            first_only (bool): If True, only return the first detected sonde.
+            sample_rate (int): Wideband capture sample rate (Hz). Defaults to wideband_sample_rate.
+
+        Returns:
+            list: A list of detected sondes, as returned by sonde_search.
+        """
+        _search_results = []
+
+        if sample_rate is None:
+            sample_rate = self.wideband_sample_rate
+
+        _start = time.time()
+        _detections = detect_sonde_wideband(
+            list(peak_frequencies),
+            rs_path=self.rs_path,
+            dwell_time=self.detect_dwell_time,
+            device_idx=self.device_idx,
+            ppm=self.ppm,
+            gain=self.gain,
+            bias=self.bias,
+            sample_rate=sample_rate,
+            iq_source=self.iq_source if self.shared_iq_source else None,
+            detect_backend=self.detect_backend,
+        )
+
+        if not self.sonde_scanner_running:
+            return []
+
+        # All peaks are checked at the same time, so spread the runtime across them.
+        _runtime = (time.time() - _start) / max(len(peak_frequencies), 1)
+
+        _detected_freqs = [_d[0] for _d in _detections]
+        for _freq in peak_frequencies:
+            if _freq not in _detected_freqs:
+                self.record_detection(_freq, None, _runtime)
+
+        for (_freq, detected, offset_est) in _detections:
+            self.record_detection(_freq, detected, _runtime)
+            # Quantize the detected frequency (with offset) to 1 kHz
+            _freq = round((_freq + offset_est) / 1000.0) * 1000.0
+            _search_results.append([_freq, detected])
+
+            # Immediately send this result to the callback.
+            self.send_to_callback([[_freq, detected]])
+
+            if first_only:
+                break
+
+        if len(_search_results) == 0:
+            self.log_debug("No sondes detected.")
+        else:
+            self.log_debug("Scan Detected Sondes: %s" % str(_search_results))
+
+        return _search_results
+
+    def parallel_detect(self, peak_frequencies, first_only=False):
+        """ Run detection on a set of peaks concurrently, using this scanner's SDR, and any idle SDRs
+        that can be borrowed from the task manager (via the sdr_allocator callback).
+
+        Borrowed SDRs are only held for the duration of a single detection attempt, and are not borrowed
+        again once a sonde has been found, so the task manager can use them to start decoders.
+
+        Args:
+            peak_frequencies (np.array): Frequencies to attempt detection on (Hz), in order of priority.
+            first_only (bool): If True, return after detecting the first sonde.
+
+        Returns:
+            list: A list of detected sondes, as returned by sonde_search.
+        """
+        _peak_queue = Queue()
+        for _freq in peak_frequencies:
+            _peak_queue.put(float(_freq))
+
+        _search_results = []
+        _results_lock = Lock()
+        # Set when a sonde has been found.
+        _found = Event()
+
+        def _handle_result(freq, detected, offset_est):
+            # Quantize the detected frequency (with offset) to 1 kHz
+            _freq = round((freq + offset_est) / 1000.0) * 1000.0
+            with _results_lock:
+                _search_results.append([_freq, detected])
+            _found.set()
+            # Immediately send this result to the callback.
+            self.send_to_callback([[_freq, detected]])
+
+        def _stop_requested():
+            return (not self.sonde_scanner_running) or (first_only and _found.is_set())
+
+        def _borrowed_sdr_worker():
+            """ Run detections using borrowed SDRs, until there are no peaks, or no free SDRs left. """
+            while not _stop_requested() and not _found.is_set():
+                if _peak_queue.empty():
+                    return
+
+                _sdr = self.sdr_allocator()
+                if _sdr is None:
+                    # No more free SDRs.
+                    return
+
+                try:
+                    _freq = _peak_queue.get_nowait()
+                except Empty:
+                    self.sdr_release(_sdr["device_idx"])
+                    return
+
+                _start = time.time()
+                try:
+                    (detected, offset_est) = detect_sonde(
+                        _freq,
+                        sdr_fm=self.sdr_fm,
+                        device_idx=_sdr["device_idx"],
+                        ppm=_sdr["ppm"],
+                        gain=_sdr["gain"],
+                        bias=_sdr["bias"],
+                        dwell_time=self.detect_dwell_time,
+                        save_detection_audio=self.save_detection_audio,
+                        early_exit=self.detect_early_exit,
+                        giveup_time=self.detect_giveup_time,
+                        giveup_score=self.detect_giveup_score,
+                        detect_backend=self.detect_backend,
+                    )
+                except IOError as e:
+                    self.log_error(
+                        "Detection on borrowed SDR #%s failed - %s"
+                        % (str(_sdr["device_idx"]), str(e))
+                    )
+                    # Don't try and use any more SDRs in this scan.
+                    self.sdr_release(_sdr["device_idx"])
+                    return
+
+                # Release the SDR before passing on results, so it is available to start a decoder.
+                self.sdr_release(_sdr["device_idx"])
+
+                self.record_detection(_freq, detected, time.time() - _start)
+
+                if detected != None:
+                    _handle_result(_freq, detected, offset_est)
+
+        _workers = []
+        for _i in range(self.max_detection_sdrs - 1):
+            _worker = Thread(target=_borrowed_sdr_worker)
+            _worker.start()
+            _workers.append(_worker)
+
+        # Run detection on our own SDR in this thread.
+        # Any IOErrors (indicating a RTLSDR lockup) are passed up to the scan loop after the workers have finished.
+        _error = None
+        while not _stop_requested():
+            try:
+                _freq = _peak_queue.get_nowait()
+            except Empty:
+                break
+
+            _start = time.time()
+            try:
+                (detected, offset_est) = detect_sonde(
+                    _freq,
+                    sdr_fm=self.sdr_fm,
+                    device_idx=self.device_idx,
+                    ppm=self.ppm,
+                    gain=self.gain,
+                    bias=self.bias,
+                    dwell_time=self.detect_dwell_time,
+                    save_detection_audio=self.save_detection_audio,
+                    early_exit=self.detect_early_exit,
+                    giveup_time=self.detect_giveup_time,
+                    giveup_score=self.detect_giveup_score,
+                    detect_backend=self.detect_backend,
+                )
+            except IOError as e:
+                _error = e
+                break
+
+            self.record_detection(_freq, detected, time.time() - _start)
+
+            if detected != None:
+                _handle_result(_freq, detected, offset_est)
+
+        for _worker in _workers:
+            _worker.join()
+
+        if _error is not None:
+            raise _error
+
+        if not self.sonde_scanner_running:
+            return []
+
+        if len(_search_results) == 0:
+            self.log_debug("No sondes detected.")
+        else:
+            self.log_debug("Scan Detected Sondes: %s" % str(_search_results))
+
+        return _search_results
+
+    def process_spectrum(self, freq, power, step):
+        """ Detect and filter peaks within a captured spectrum, and update the global scan result.
+
+        Args:
+            freq (np.array): Frequency of each spectrum bin, in Hz.
+            power (np.array): Power of each spectrum bin, in dB.
+            step (float): Frequency step between bins, in Hz.
+
+        Returns:
+            np.array/None: Array of peak frequencies (Hz) to run detection on, in order, or None if
+                there are no peaks to check.
+        """
+        global scan_result
+
+        # Update the global scan result
+        (
+            _freq_decimate,
+            _power_decimate,
+            _freq_min_decimate,
+            _power_min_decimate,
+        ) = peak_decimation(freq / 1e6, power, 10, envelope=True)
+        scan_result["freq"] = _freq_decimate.tolist()
+        scan_result["power"] = _power_decimate.tolist()
+        scan_result["freq_min"] = _freq_min_decimate.tolist()
+        scan_result["power_min"] = _power_min_decimate.tolist()
+        scan_result["timestamp"] = datetime.datetime.utcnow().isoformat()
+        scan_result["peak_freq"] = []
+        scan_result["peak_lvl"] = []
+
+        # Compare against the baseline spectrum, to find signals which have newly appeared.
+        if self.spectrum_baseline is not None:
+            self.spectrum_baseline.update(freq, power)
+
+        if self.noise_floor_window > 0:
+            # Estimate the local noise floor across the spectrum, so strong signals and
+            # SDR passband ripple only affect the threshold near them.
+            power_nf = rolling_noise_floor(
+                power,
+                self.noise_floor_window / step,
+                percentile=self.noise_floor_percentile,
+            )
+            # Pass the threshold curve (at the decimated frequencies) to the web client for plotting
+            scan_result["threshold"] = np.interp(
+                _freq_decimate, freq / 1e6, power_nf
+            ).tolist()
+        else:
+            # Rough approximation of the noise floor of the received power spectrum.
+            power_nf = np.mean(power)
+            # Pass the threshold data to the web client for plotting
+            scan_result["threshold"] = power_nf
+
+        # Detect peaks, based on the SNR of each bin.
+        peak_indices = detect_peaks(
+            power - power_nf,
+            mph=self.snr_threshold,
+            mpd=(self.min_distance / step),
+            show=False,
+        )
+
+        self.scan_cycle["peaks_found"] = len(peak_indices)
+
+        # If we have found no peaks, and no greylist has been provided, re-scan.
+        if (len(peak_indices) == 0) and (len(self.greylist) == 0):
+            self.log_debug("No peaks found.")
+            # Emit a notification to the client that a scan is complete.
+            flask_emit_event("scan_event")
+            return None
+
+        if self.peak_clustering:
+            # Merge peaks which are part of the same signal (i.e. the lobes of a wide sonde), so each
+            # transmitter is only checked once, and estimate its centre frequency to better than a bin.
+            (peak_freqs, _strongest) = cluster_peaks(
+                freq,
+                power - power_nf,
+                peak_indices,
+                threshold=self.peak_cluster_threshold,
+                max_width=int(self.peak_cluster_max_width / step),
+                max_gap=int(self.min_distance / step),
+                min_dip=PEAK_CLUSTER_MIN_DIP,
+            )
+            peak_powers = power[peak_indices[_strongest]]
+            if len(peak_freqs) < len(peak_indices):
+                self.log_debug(
+                    "Merged %d peaks into %d signals."
+                    % (len(peak_indices), len(peak_freqs))
+                )
+        else:
+            peak_powers = power[peak_indices]
+            peak_freqs = freq[peak_indices]
+
+        # Sort peaks by power.
+        _power_order = np.argsort(peak_powers)[::-1]
+        peak_frequencies = peak_freqs[_power_order]
+        # Keep track of the power of each peak, for use with the detection cache.
+        peak_levels = peak_powers[_power_order]
+
+        # Quantize to nearest x Hz
+        peak_frequencies = (
+            np.round(peak_frequencies / self.quantization) * self.quantization
+        )
+
+        # Remove any duplicate entries after quantization, but preserve order.
+        _, peak_idx = np.unique(peak_frequencies, return_index=True)
+        peak_frequencies = peak_frequencies[np.sort(peak_idx)]
+        peak_levels = peak_levels[np.sort(peak_idx)]
+
+        # Blacklist & Temporary block list behaviour change as of v1.2.3
+        # Was: peak_frequencies==_frequency   (This only matched an exact frequency in the blacklist)
+        # Now (1.2.3): Block if the peak frequency is within +/-quantization/2.0 of a blacklist or blocklist frequency.
+
+        # Remove any frequencies in the blacklist.
+        _blocked = interval_mask(
+            peak_frequencies,
+            self.blacklist_hz - self.quantization / 2.0,
+            self.blacklist_hz + self.quantization / 2.0,
+        )
+        peak_frequencies = peak_frequencies[~_blocked]
+        peak_levels = peak_levels[~_blocked]
+
+        # Check frequencies which have previously had sondes at this time of day first.
+        if self.frequency_stats is not None and len(peak_frequencies) > 0:
+            _order = self.frequency_stats.priority_order(peak_frequencies)
+            peak_frequencies = peak_frequencies[_order]
+            peak_levels = peak_levels[_order]
+
+        # Check peaks which have newly appeared first, and long-standing carriers last.
+        if self.spectrum_baseline is not None and len(peak_frequencies) > 0:
+            _order = self.spectrum_baseline.priority_order(peak_frequencies)
+            peak_frequencies = peak_frequencies[_order]
+            peak_levels = peak_levels[_order]
+
+        # Skip or de-prioritise peaks we have recently checked.
+        peak_frequencies = self.apply_detection_cache(peak_frequencies, peak_levels)
+
+        # Limit to the user-defined number of peaks to search over.
+        if len(peak_frequencies) > self.max_peaks:
+            peak_frequencies = peak_frequencies[: self.max_peaks]
+
+        # Append on any frequencies in the supplied greylist
+        peak_frequencies = np.append(np.array(self.greylist) * 1e6, peak_frequencies)
+
+        # Remove any frequencies in the temporary block list
+        self.temporary_block_list_lock.acquire()
+        _block_freqs = list(self.temporary_block_list.keys())
+        _block_active = np.array(
+            list(self.temporary_block_list.values()), dtype=float
+        ) > (time.time() - self.temporary_block_time * 60)
+
+        # Remove any frequencies which don't need to be blocked any more from the block list.
+        for _frequency, _active in zip(_block_freqs, _block_active):
+            if not _active:
+                self.temporary_block_list.pop(_frequency)
+                self.log_info(
+                    "Removed %.3f MHz from temporary block list." % (_frequency / 1e6)
+                )
+
+        self.temporary_block_list_lock.release()
+
+        # We should still be blocking the remaining frequencies, so remove any peaks near them.
+        _block_freqs = np.array(_block_freqs, dtype=float)[_block_active]
+        _blocked = interval_mask(
+            peak_frequencies,
+            _block_freqs - self.quantization / 2.0,
+            _block_freqs + self.quantization / 2.0,
+        )
+        for _frequency in peak_frequencies[_blocked]:
+            self.log_debug(
+                "Peak on %.3f MHz was removed due to temporary block."
+                % (_frequency / 1e6)
+            )
+        peak_frequencies = peak_frequencies[~_blocked]
+
+        # Get the level of our peak search results, to send to the web client.
+        # Because we've decimated the freq & power data, the peak location may
+        # not be exactly at a decimated frequency, so this takes the maximum of an area
+        # around the nearest bin.
+        _peak_freq = peak_frequencies / 1e6
+        _peak_lvl = lookup_peak_levels(_freq_decimate, _power_decimate, _peak_freq)
+        # Add the peak results to our global scan result dictionary.
+        scan_result["peak_freq"] = _peak_freq.tolist()
+        scan_result["peak_lvl"] = _peak_lvl.tolist()
+        # Tell the web client we have new data.
+        flask_emit_event("scan_event")
+
+        if len(peak_frequencies) == 0:
+            self.log_debug("No peaks found after blacklist frequencies removed.")
+            return None
+        else:
+            self.log_info(
+                "Detected peaks on %d frequencies (MHz): %s"
+                % (len(peak_frequencies), str(peak_frequencies / 1e6))
+            )
+
+        return peak_frequencies
+
+    def scan_spectrum_stream(self):
+        """ Run a frequency scan with rtl_power's output streamed through a pipe, parsing each hop as it arrives.
+
+        The rtl_power process is left to exit in the background, and must be cleaned up
+        with close_spectrum_stream before the SDR is used again.
+
+        Returns:
+            tuple: A tuple consisting of:
+                freq (np.array): List of centre frequencies in Hz
+                power (np.array): List of measured signal powers, in dB.
+                freq_step (float): Frequency step between points, in Hz
+        """
+        self.rtl_power_stream = start_rtl_power_stream(
+            self.min_freq * 1e6,
+            self.max_freq * 1e6,
+            self.search_step,
+            dwell=self.scan_dwell_time,
+            sdr_power=self.sdr_power,
+            device_idx=self.device_idx,
+            ppm=self.ppm,
+            gain=self.gain,
+            bias=self.bias,
+        )
+
+        _freq = []
+        _power = []
+        step = 0
+
+        for (_hop_freq, _hop_power, step) in read_rtl_power_stream(
+            self.rtl_power_stream[0], stop=self.max_freq * 1e6
+        ):
+            _freq.append(_hop_freq)
+            _power.append(_hop_power)
+
+            # Exit opportunity.
+            if self.sonde_scanner_running == False:
+                break
+
+        if len(_freq) == 0:
+            return (np.array([]), np.array([]), 0)
+
+        freq = np.concatenate(_freq)
+        # Sanitize power values, to remove the nan's that rtl_power puts in there occasionally.
+        power = np.nan_to_num(np.concatenate(_power))
+
+        return (freq, power, step)
+
+    def create_iq_source(self, source):
+        """ Create an IQ source for the FFT spectrum backend.
+
+        Args:
+            source (str/object): 'rtl_sdr', 'rtl_tcp:<host>:<port>', or an existing IQ source object.
+
+        Returns:
+            object: An IQ source object.
+        """
+        if not isinstance(source, str):
+            return source
+
+        if source.startswith("rtl_tcp"):
+            _fields = source.split(":")
+            _host = _fields[1] if len(_fields) > 1 else "localhost"
+            _port = int(_fields[2]) if len(_fields) > 2 else 1234
+            self.log_info(
+                "Using rtl_tcp server at %s:%d for spectrum scans." % (_host, _port)
+            )
+            return RTLTCPIQSource(
+                host=_host,
+                port=_port,
+                sample_rate=self.fft_sample_rate,
+                ppm=self.ppm,
+                gain=self.gain,
+                bias=self.bias,
+            )
+        else:
+            return RTLSDRIQSource(
+                device_idx=self.device_idx,
+                sample_rate=self.fft_sample_rate,
+                ppm=self.ppm,
+                gain=self.gain,
+                bias=self.bias,
+            )
+
+    def close_spectrum_stream(self):
+        """ Clean up a streaming rtl_power process, if one is running. """
+        if self.rtl_power_stream is not None:
+            (_process, _stderr) = self.rtl_power_stream
+            self.rtl_power_stream = None
+            # If we are shutting down, don't wait around for rtl_power to finish its sweep.
+            close_rtl_power_stream(
+                _process,
+                _stderr,
+                device_idx=self.device_idx,
+                bias=self.bias,
+                timeout=30 if self.sonde_scanner_running else 0,
+            )
+
     def oneshot(self, first_only=False):
         """ Perform a once-off scan attempt 
 
@@ -1027,10 +3272,17 @@ class SondeScanner(object):
         self.log_info("Waiting for current scan to finish...")
         self.sonde_scanner_running = False
 
+        # Stop the spectrum monitor, which will also wake up the scanner thread if it is waiting on a sweep.
+        if self.spectrum_monitor is not None:
+            self.spectrum_monitor.close()
+
         # Wait for the sonde scanner thread to close, if there is one.
         if self.sonde_scan_thread != None:
             self.sonde_scan_thread.join()
 
+        if (self.iq_source is not None) and (not self.shared_iq_source):
+            self.iq_source.close()
+
     def running(self):
         """ Check if the scanner is running """
         return self.sonde_scanner_running
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Scan Cycle Statistics
+#
+#   Released under GNU GPL v3 or later
+#
+#   Records where the time goes in each scan cycle (spectrum capture, peak detection, detection attempts),
+#   so the scan and detection dwell times, and the maximum number of peaks, can be tuned from real data.
+#   The most recent cycles are kept in a ring buffer, and summarised for the web interface.
+#
+import time
+import numpy as np
+from collections import deque
+from threading import Lock
+
+
+# Number of scan cycles to keep.
+SCAN_STATS_LENGTH = 200
+# Percentiles to report for each timing.
+SCAN_STATS_PERCENTILES = [50, 90, 99]
+# Number of bins in the cycle time histogram.
+SCAN_STATS_HISTOGRAM_BINS = 10
+
+
+def new_scan_cycle(device_idx="0"):
+    """ Create an empty scan cycle record.
+
+    Fields:
+        timestamp: Start time of the cycle (epoch seconds).
+        device_idx: Scanner SDR.
+        spectrum_time: Time taken to capture the spectrum (i.e. rtl_power's runtime), in seconds.
+        parse_time: Time taken to read in the spectrum, and find and filter peaks, in seconds.
+        peaks_found: Number of peaks detected in the spectrum, before filtering.
+        peaks_checked: Number of frequencies detection was attempted on.
+        detections: List of detection attempts, each a dict of freq (Hz), time (s) and result (sonde type or None).
+        detect_time: Total time spent on detection, in seconds.
+        cycle_time: Total time taken by the cycle, in seconds.
+        reset: True if the cycle failed, and the SDR was reset.
+    """
+    return {
+        "timestamp": time.time(),
+        "device_idx": str(device_idx),
+        "spectrum_time": 0.0,
+        "parse_time": 0.0,
+        "peaks_found": 0,
+        "peaks_checked": 0,
+        "detections": [],
+        "detect_time": 0.0,
+        "cycle_time": 0.0,
+        "reset": False,
+    }
+
+
+def timing_summary(values):
+    """ Summarise a list of values, returning a dict of the count, mean, max and percentiles. """
+    _summary = {"count": len(values)}
+    if len(values) == 0:
+        return _summary
+
+    _values = np.array(values, dtype=float)
+    _summary["mean"] = float(np.mean(_values))
+    _summary["max"] = float(np.max(_values))
+    for _p, _value in zip(
+        SCAN_STATS_PERCENTILES, np.percentile(_values, SCAN_STATS_PERCENTILES)
+    ):
+        _summary["p%d" % _p] = float(_value)
+
+    return _summary
+
+
+class ScanStatistics(object):
+    """ Ring buffer of scan cycle records """
+
+    def __init__(self, length=SCAN_STATS_LENGTH):
+        """ Initialise the statistics store.
+
+        Args:
+            length (int): Number of scan cycles to keep.
+        """
+        self.cycles = deque(maxlen=length)
+        self.total_cycles = 0
+        self.total_resets = 0
+        self.stats_lock = Lock()
+
+    def add_cycle(self, cycle):
+        """ Add a completed scan cycle record (as produced by new_scan_cycle) to the buffer. """
+        cycle["cycle_time"] = time.time() - cycle["timestamp"]
+        cycle["detect_time"] = sum([_d["time"] for _d in cycle["detections"]])
+
+        with self.stats_lock:
+            self.cycles.append(cycle)
+            self.total_cycles += 1
+            if cycle["reset"]:
+                self.total_resets += 1
+
+    def summary(self):
+        """ Summarise the buffered scan cycles.
+
+        Returns:
+            dict: Timing summaries (count, mean, max and percentiles, in seconds) for the cycle, spectrum capture,
+                parsing and detection times, peak counts, a histogram of the cycle times, and the latest cycle.
+        """
+        with self.stats_lock:
+            _cycles = list(self.cycles)
+            _summary = {
+                "total_cycles": self.total_cycles,
+                "total_resets": self.total_resets,
+            }
+
+        # Cycles which failed don't tell us much about the timing.
+        _complete = [_c for _c in _cycles if not _c["reset"]]
+        _detections = [_d for _c in _complete for _d in _c["detections"]]
+        _cycle_times = [_c["cycle_time"] for _c in _complete]
+
+        _summary["cycles"] = len(_cycles)
+        _summary["resets"] = len(_cycles) - len(_complete)
+        _summary["cycle_time"] = timing_summary(_cycle_times)
+        _summary["spectrum_time"] = timing_summary(
+            [_c["spectrum_time"] for _c in _complete]
+        )
+        _summary["parse_time"] = timing_summary([_c["parse_time"] for _c in _complete])
+        _summary["peaks_found"] = timing_summary(
+            [_c["peaks_found"] for _c in _complete]
+        )
+        _summary["peaks_checked"] = timing_summary(
+            [_c["peaks_checked"] for _c in _complete]
+        )
+        # Attempts which found a sonde may exit early, so keep them separate.
+        _summary["detect_time"] = {
+            "detected": timing_summary(
+                [_d["time"] for _d in _detections if _d["result"] is not None]
+            ),
+            "none": timing_summary(
+                [_d["time"] for _d in _detections if _d["result"] is None]
+            ),
+        }
+
+        if len(_cycle_times) > 0:
+            (_counts, _edges) = np.histogram(
+                _cycle_times, bins=SCAN_STATS_HISTOGRAM_BINS
+            )
+            _summary["cycle_time_histogram"] = {
+                "counts": _counts.tolist(),
+                "edges": _edges.tolist(),
+            }
+        else:
+            _summary["cycle_time_histogram"] = {"counts": [], "edges": []}
+
+        _summary["last_cycle"] = _cycles[-1] if len(_cycles) > 0 else None
+
+        return _summary
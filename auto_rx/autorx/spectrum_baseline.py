@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Rolling Baseline Spectrum
+#
+#   Released under GNU GPL v3 or later
+#
+#   Keeps an exponentially weighted average of the power in each bin of the scanner's spectrum, so
+#   peaks which have newly appeared (i.e. a sonde which has just been launched) can be checked before
+#   long-standing carriers. The baseline is saved in the log directory, so it persists across restarts.
+#
+import logging
+import os
+import time
+import numpy as np
+from threading import Lock
+from .utils import lookup_peak_levels
+
+
+class SpectrumBaseline(object):
+    """ Rolling Baseline Spectrum
+
+    For each spectrum bin, the following is kept:
+        baseline: Exponentially weighted average of the bin power (dB).
+        rise: Power of the bin in the latest spectrum, relative to the baseline before it was updated (dB).
+        stable_since: Time (epoch seconds) since which the bin power has stayed within rise_threshold of the baseline.
+
+    """
+
+    BASELINE_FILENAME = "spectrum_baseline.npz"
+
+    def __init__(
+        self,
+        log_directory="./log",
+        time_constant=3600,
+        rise_threshold=6.0,
+        stable_time=4 * 3600,
+        quantization=10000,
+        save_interval=600,
+    ):
+        """ Initialise the baseline spectrum.
+
+        Args:
+            log_directory (str): Directory to save the baseline in.
+            time_constant (float): Time constant of the baseline average, in seconds.
+            rise_threshold (float): Peaks whose power has risen above the baseline by this much (dB) are checked first.
+            stable_time (float): Peaks whose power has stayed within rise_threshold of the baseline for this long (seconds)
+                are checked last.
+            quantization (float): Peak frequency quantization (Hz) used by the scanner. Bins within half of this
+                either side of a peak are considered to be part of the peak.
+            save_interval (float): Save the baseline to disk at most this often (seconds).
+        """
+        self.log_directory = str(log_directory)
+        self.time_constant = time_constant
+        self.rise_threshold = rise_threshold
+        self.stable_time = stable_time
+        self.quantization = quantization
+        self.save_interval = save_interval
+        self.filename = os.path.join(self.log_directory, self.BASELINE_FILENAME)
+
+        self.freq = None
+        self.baseline = None
+        self.rise = None
+        self.stable_since = None
+        self.last_update = 0
+        self.last_save = time.time()
+        self.baseline_lock = Lock()
+
+        if os.path.exists(self.filename):
+            self.load()
+
+    def load(self):
+        """ Read in the saved baseline. """
+        try:
+            with np.load(self.filename) as _data:
+                _freq = _data["freq"]
+                _baseline = _data["baseline"]
+                _stable_since = _data["stable_since"]
+                _last_update = float(_data["last_update"])
+
+            with self.baseline_lock:
+                self.freq = _freq
+                self.baseline = _baseline
+                self.stable_since = _stable_since
+                self.last_update = _last_update
+                # Nothing has risen until we have a new spectrum to compare against.
+                self.rise = np.zeros(len(_freq))
+
+            self.log_info(
+                "Loaded baseline spectrum (%.3f - %.3f MHz) from %s"
+                % (_freq[0] / 1e6, _freq[-1] / 1e6, self.filename)
+            )
+        except Exception as e:
+            self.log_error("Could not read %s - %s" % (self.filename, str(e)))
+
+    def save(self):
+        """ Write the baseline out to the baseline file. """
+        try:
+            with self.baseline_lock:
+                if self.freq is None:
+                    return
+
+                # Write to a temporary file and then rename it, so we don't leave a corrupt file behind if interrupted.
+                # (np.savez adds the .npz extension)
+                _temp_filename = self.filename[:-4] + ".tmp.npz"
+                np.savez(
+                    _temp_filename,
+                    freq=self.freq,
+                    baseline=self.baseline,
+                    stable_since=self.stable_since,
+                    last_update=self.last_update,
+                )
+            os.rename(_temp_filename, self.filename)
+            self.last_save = time.time()
+        except Exception as e:
+            self.log_error("Could not write %s - %s" % (self.filename, str(e)))
+
+    def update(self, freq, power, timestamp=None):
+        """ Compare a new spectrum against the baseline, and then add it into the baseline.
+
+        Args:
+            freq (np.array): Frequency of each spectrum bin, in Hz.
+            power (np.array): Power of each spectrum bin, in dB.
+            timestamp (float): Time of the spectrum (epoch seconds). Defaults to the current time.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.baseline_lock:
+            if (self.freq is None) or (not self.same_range(freq)):
+                # Start a new baseline from this spectrum.
+                if self.freq is not None:
+                    self.log_info(
+                        "Frequency range changed, resetting baseline spectrum."
+                    )
+
+                self.freq = np.array(freq, dtype=float)
+                self.baseline = np.array(power, dtype=float)
+                self.rise = np.zeros(len(freq))
+                self.stable_since = np.full(len(freq), float(timestamp))
+                self.last_update = timestamp
+
+            else:
+                self.add_spectrum(freq, power, timestamp)
+
+        if time.time() - self.last_save > self.save_interval:
+            self.save()
+
+    def add_spectrum(self, freq, power, timestamp):
+        """ Compare a spectrum against the baseline, and add it into the baseline. Must be called with the baseline lock held. """
+        # Sweeps don't always land on exactly the same bins, so resample onto the baseline bins.
+        _power = np.interp(self.freq, freq, power)
+
+        self.rise = _power - self.baseline
+        self.stable_since[np.abs(self.rise) > self.rise_threshold] = timestamp
+
+        # Weight the new spectrum by the time since the last update.
+        _alpha = 1.0 - np.exp(
+            -max(timestamp - self.last_update, 0) / float(self.time_constant)
+        )
+        self.baseline += _alpha * self.rise
+        self.last_update = timestamp
+
+    def same_range(self, freq):
+        """ Check if a spectrum covers the same frequency range, with the same bin width, as the baseline. """
+        if len(freq) < 2:
+            return False
+
+        _step = (self.freq[-1] - self.freq[0]) / (len(self.freq) - 1)
+        _new_step = (freq[-1] - freq[0]) / (len(freq) - 1)
+
+        return (
+            (abs(freq[0] - self.freq[0]) < 2 * _step)
+            and (abs(freq[-1] - self.freq[-1]) < 2 * _step)
+            and (abs(_new_step - _step) < 0.1 * _step)
+        )
+
+    def peak_info(self, frequencies, timestamp=None):
+        """ Get the rise in power, and stable time, of a set of peaks.
+
+        Args:
+            frequencies (np.array): Peak frequencies, in Hz.
+            timestamp (float): Current time (epoch seconds). Defaults to the current time.
+
+        Returns:
+            tuple: (rise, stable) arrays, containing the largest rise in power (dB) and the shortest time the power has
+                been stable (seconds) across the bins making up each peak.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.baseline_lock:
+            if self.freq is None:
+                return (np.zeros(len(frequencies)), np.zeros(len(frequencies)))
+
+            _step = (self.freq[-1] - self.freq[0]) / (len(self.freq) - 1)
+            _width = max(int(np.ceil(self.quantization / 2.0 / _step)), 1)
+
+            _rise = lookup_peak_levels(self.freq, self.rise, frequencies, width=_width)
+            _stable_since = lookup_peak_levels(
+                self.freq, self.stable_since, frequencies, width=_width
+            )
+
+        return (_rise, timestamp - _stable_since)
+
+    def priority_order(self, frequencies, timestamp=None):
+        """ Determine the order in which a set of peaks should be checked.
+
+        Peaks which have risen above the baseline are checked first, and peaks which have been stable for
+        longer than stable_time are checked last. Otherwise, the existing order is kept.
+
+        Args:
+            frequencies (np.array): Peak frequencies, in Hz.
+            timestamp (float): Current time (epoch seconds). Defaults to the current time.
+
+        Returns:
+            np.array: Indices into frequencies, in the order they should be checked.
+        """
+        (_rise, _stable) = self.peak_info(frequencies, timestamp)
+
+        _class = np.ones(len(frequencies), dtype=int)
+        _class[_stable >= self.stable_time] = 2
+        _class[_rise >= self.rise_threshold] = 0
+
+        for _freq in np.asarray(frequencies)[_class == 0]:
+            self.log_debug(
+                "Peak on %.3f MHz has risen above the baseline." % (_freq / 1e6)
+            )
+
+        # A stable sort keeps the existing order within each class.
+        return np.argsort(_class, kind="mergesort")
+
+    def log_debug(self, line):
+        """ Helper function to log a debug message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.debug("Spectrum Baseline - %s" % line)
+
+    def log_info(self, line):
+        """ Helper function to log an informational message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.info("Spectrum Baseline - %s" % line)
+
+    def log_error(self, line):
+        """ Helper function to log an error message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.error("Spectrum Baseline - %s" % line)
@@ -8,11 +8,14 @@ var scan_chart_obj;
 function setup_scan_chart(){
 	scan_chart_spectra = {
 	    xs: {
-	        'Spectra': 'x_spectra'
+	        'Spectra': 'x_spectra',
+	        'Spectra (Min)': 'x_spectra_min'
 	    },
 	    columns: [
 	        ['x_spectra',autorx_config.min_freq, autorx_config.max_freq],
-	        ['Spectra',0,0]
+	        ['Spectra',0,0],
+	        ['Spectra (Min)',0,0],
+	        ['x_spectra_min',autorx_config.min_freq, autorx_config.max_freq]
 	    ],
 	    type:'line'
 	};
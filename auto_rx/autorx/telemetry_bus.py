@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Telemetry Bus
+#
+#   Released under GNU GPL v3 or later
+#
+#   Decoders publish each telemetry frame to the bus once, and a dispatcher thread fans it out to the exporters
+#   (subscribers). Each subscriber has its own bounded queue and delivery thread, so a slow exporter (i.e. one
+#   re-formatting every frame) cannot hold up the decoders, or the other exporters.
+#   Delivery latency, queue depth and dropped frames are recorded for each subscriber.
+#
+import logging
+import time
+from collections import deque
+from threading import Thread, Condition
+from .scan_stats import timing_summary
+
+try:
+    # Python 2
+    from Queue import Queue, Empty, Full
+except ImportError:
+    # Python 3
+    from queue import Queue, Empty, Full
+
+
+# Maximum number of frames waiting to be dispatched.
+TELEMETRY_BUS_QUEUE_LENGTH = 512
+# Default maximum number of frames waiting to be delivered to each subscriber.
+TELEMETRY_SUBSCRIBER_QUEUE_LENGTH = 256
+# Number of recent delivery latencies to keep for each subscriber.
+TELEMETRY_LATENCY_SAMPLES = 500
+
+# What to do when a subscriber's queue is full:
+# 'oldest' - Discard the oldest queued frame, so the subscriber always gets the most recent data.
+# 'newest' - Discard the new frame, so the subscriber gets an unbroken (but delayed) sequence of frames.
+DROP_POLICIES = ["oldest", "newest"]
+
+
+class TelemetrySubscriber(object):
+    """ A subscriber to the telemetry bus, with its own bounded queue and delivery thread. """
+
+    def __init__(
+        self,
+        callback,
+        name,
+        queue_length=TELEMETRY_SUBSCRIBER_QUEUE_LENGTH,
+        drop_policy="oldest",
+    ):
+        """
+        Args:
+            callback (function): Function to call with each telemetry frame (dict).
+            name (str): Name of the subscriber, used in log messages and statistics.
+            queue_length (int): Maximum number of frames waiting to be delivered.
+            drop_policy (str): Which frame to discard when the queue is full - 'oldest' or 'newest'.
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("Unknown drop policy: %s" % drop_policy)
+
+        self.callback = callback
+        self.name = name
+        self.queue_length = queue_length
+        self.drop_policy = drop_policy
+
+        self.queue = deque()
+        self.condition = Condition()
+
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        # Time from publication to the callback returning, and time spent in the callback, in seconds.
+        self.latency = deque(maxlen=TELEMETRY_LATENCY_SAMPLES)
+        self.callback_time = deque(maxlen=TELEMETRY_LATENCY_SAMPLES)
+
+        self.running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def offer(self, published, frame):
+        """ Queue a frame for delivery, applying the drop policy if the queue is full. Called by the dispatcher.
+
+        Args:
+            published (float): Time the frame was published (epoch seconds).
+            frame (dict): Telemetry frame.
+        """
+        with self.condition:
+            if len(self.queue) >= self.queue_length:
+                self.dropped += 1
+                if self.drop_policy == "newest":
+                    return
+                self.queue.popleft()
+
+            self.queue.append((published, frame))
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.condition.notify()
+
+    def run(self):
+        """ Delivery thread - pass queued frames to the callback. Any frames still queued when the subscriber
+        is closed are delivered before exiting. """
+        while True:
+            with self.condition:
+                while self.running and (len(self.queue) == 0):
+                    self.condition.wait(1)
+
+                if len(self.queue) == 0:
+                    break
+
+                (_published, _frame) = self.queue.popleft()
+
+            _start = time.time()
+            try:
+                self.callback(_frame)
+            except Exception as e:
+                self.errors += 1
+                logging.error(
+                    "Telemetry Bus - Error delivering frame to %s - %s"
+                    % (self.name, str(e))
+                )
+
+            _end = time.time()
+            self.delivered += 1
+            self.latency.append(_end - _published)
+            self.callback_time.append(_end - _start)
+
+    def close(self):
+        """ Deliver any queued frames, and stop the delivery thread. """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        self.thread.join()
+
+    def status(self):
+        """ Get the delivery statistics for this subscriber.
+
+        Returns:
+            dict: Queue settings and depth, frame counts, and timing summaries (count, mean, max and
+                percentiles, in seconds) of the delivery latency and callback time.
+        """
+        with self.condition:
+            _depth = len(self.queue)
+
+        return {
+            "name": self.name,
+            "queue_length": self.queue_length,
+            "drop_policy": self.drop_policy,
+            "depth": _depth,
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "latency": timing_summary(list(self.latency)),
+            "callback_time": timing_summary(list(self.callback_time)),
+        }
+
+
+class TelemetryBus(object):
+    """ Telemetry Bus
+
+    Distributes telemetry frames published by the decoders to a set of subscribers. Subscribers are added with
+    subscribe(), before the bus is started with start().
+
+    Frames are shared between all subscribers, and so must not be modified by the publisher or the subscribers
+    once published. Subscribers which need to modify a frame should make a copy.
+    """
+
+    def __init__(self, queue_length=TELEMETRY_BUS_QUEUE_LENGTH):
+        """
+        Args:
+            queue_length (int): Maximum number of frames waiting to be dispatched.
+        """
+        self.input_queue = Queue(queue_length)
+        self.subscribers = []
+
+        self.published = 0
+        self.dropped = 0
+
+        self.dispatch_running = False
+        self.dispatch_thread = None
+
+    def subscribe(
+        self,
+        callback,
+        name=None,
+        queue_length=TELEMETRY_SUBSCRIBER_QUEUE_LENGTH,
+        drop_policy="oldest",
+    ):
+        """ Add a subscriber to the bus.
+
+        Args:
+            callback (function): Function to call with each telemetry frame (i.e. an exporter's add function).
+            name (str): Name of the subscriber. Defaults to the class name of the callback's object.
+            queue_length (int): Maximum number of frames waiting to be delivered to this subscriber.
+            drop_policy (str): Which frame to discard when the queue is full - 'oldest' or 'newest'.
+
+        Returns:
+            TelemetrySubscriber: The new subscriber.
+        """
+        if name is None:
+            name = type(getattr(callback, "__self__", callback)).__name__
+
+        _subscriber = TelemetrySubscriber(
+            callback, name, queue_length=queue_length, drop_policy=drop_policy
+        )
+        self.subscribers.append(_subscriber)
+
+        logging.debug(
+            "Telemetry Bus - Added subscriber %s (queue length %d, drop %s)."
+            % (name, queue_length, drop_policy)
+        )
+        return _subscriber
+
+    def start(self):
+        """ Start dispatching frames to the subscribers. """
+        if self.dispatch_running:
+            return
+
+        self.dispatch_running = True
+        self.dispatch_thread = Thread(target=self.dispatch, daemon=True)
+        self.dispatch_thread.start()
+
+    def publish(self, frame):
+        """ Publish a telemetry frame. This does not block, so it can be called directly from the decoders.
+
+        Args:
+            frame (dict): Telemetry frame. This must not be modified after being published.
+        """
+        try:
+            self.input_queue.put_nowait((time.time(), frame))
+            self.published += 1
+        except Full:
+            self.dropped += 1
+            logging.error("Telemetry Bus - Dispatch queue full, discarding frame.")
+
+    def dispatch(self):
+        """ Dispatcher thread - fan each published frame out to the subscribers. """
+        while self.dispatch_running or (self.input_queue.qsize() > 0):
+            try:
+                (_published, _frame) = self.input_queue.get(timeout=1)
+            except Empty:
+                continue
+
+            for _subscriber in self.subscribers:
+                _subscriber.offer(_published, _frame)
+
+    def close(self):
+        """ Deliver any outstanding frames, and stop the bus. """
+        self.dispatch_running = False
+        if self.dispatch_thread is not None:
+            self.dispatch_thread.join()
+            self.dispatch_thread = None
+
+        for _subscriber in self.subscribers:
+            _subscriber.close()
+
+    def status(self):
+        """ Get the statistics of the bus and its subscribers.
+
+        Returns:
+            dict: Frame counts and dispatch queue depth, and a list of subscriber statistics (see TelemetrySubscriber.status).
+        """
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "depth": self.input_queue.qsize(),
+            "subscribers": [_s.status() for _s in self.subscribers],
+        }
+
+
+# The bus used by auto_rx. Subscribers are added, and the bus started, on startup.
+telemetry_bus = TelemetryBus()
@@ -8,6 +8,7 @@
 
 from __future__ import division, print_function
 import fcntl
+import json
 import logging
 import os
 import platform
@@ -18,6 +19,7 @@ import threading
 import time
 import numpy as np
 from dateutil.parser import parse
+from dateutil.tz import tzutc
 from datetime import datetime, timedelta
 from math import radians, degrees, sin, cos, atan2, sqrt, pi
 from . import __version__ as auto_rx_version
@@ -29,6 +31,12 @@ except ImportError:
     # Python 3
     from queue import Queue
 
+try:
+    # orjson is considerably faster than the built-in json module, but is optional.
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # List of binaries we check for on startup
 REQUIRED_RS_UTILS = [
@@ -703,6 +711,76 @@ def rtlsdr_test(device_idx="0", rtl_sdr_path="rtl_sdr", retries=5):
     return False
 
 
+#
+#   Telemetry Parsing Utilities, used by the sonde decoders.
+#
+
+# Shared UTC tzinfo, the same as returned by dateutil for 'Z' timestamps.
+UTC = tzutc()
+
+
+def parse_telemetry_json(line):
+    """ Parse a line of JSON telemetry, using orjson if it is available.
+
+    Args:
+        line (str): Line of JSON output from a decoder.
+
+    Returns:
+        The parsed JSON object. A ValueError is raised if the line is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(line)
+    else:
+        return json.loads(line)
+
+
+def parse_telemetry_datetime(timestamp):
+    """ Parse a telemetry timestamp.
+
+    The decoders produce timestamps in a fixed ISO-8601 format (YYYY-MM-DDTHH:MM:SS[.fff]Z), which is parsed directly.
+    Any other format (i.e. the HH:MM:SSZ timestamps from iMet and LMS6 decoders) is parsed using dateutil.
+
+    Args:
+        timestamp (str): Timestamp string.
+
+    Returns:
+        datetime: The parsed timestamp. A ValueError is raised if it can't be parsed.
+    """
+    if (
+        (len(timestamp) >= 20)
+        and (timestamp[-1] == "Z")
+        and (timestamp[4] == "-")
+        and (timestamp[7] == "-")
+        and (timestamp[10] == "T")
+        and (timestamp[13] == ":")
+        and (timestamp[16] == ":")
+        and (timestamp[:4] + timestamp[5:7] + timestamp[8:10]).isdigit()
+        and (timestamp[11:13] + timestamp[14:16] + timestamp[17:19]).isdigit()
+    ):
+        _fraction = timestamp[19:-1]
+        if _fraction == "":
+            _microsecond = 0
+        elif (_fraction[0] == ".") and _fraction[1:].isdigit():
+            # Truncate to microseconds, as dateutil does.
+            _microsecond = int((_fraction[1:] + "00000")[:6])
+        else:
+            _microsecond = None
+
+        if _microsecond is not None:
+            return datetime(
+                int(timestamp[0:4]),
+                int(timestamp[5:7]),
+                int(timestamp[8:10]),
+                int(timestamp[11:13]),
+                int(timestamp[14:16]),
+                int(timestamp[17:19]),
+                _microsecond,
+                tzinfo=UTC,
+            )
+
+    return parse(timestamp)
+
+
 # Earthmaths code by Daniel Richman (thanks!)
 # Copyright 2012 (C) Daniel Richman; GNU GPL 3
 def position_info(listener, balloon):
@@ -787,34 +865,310 @@ def position_info(listener, balloon):
     }
 
 
-def peak_decimation(freq, power, factor):
+def peak_decimation(freq, power, factor, envelope=False):
     """ Peak-preserving Decimation.
 
+    The data is split into blocks of 'factor' bins, and the peak of each block is kept.
+    If the data length is not a multiple of the decimation factor, the remaining bins form a final (shorter) block.
+
     Args:
-        freq (list): Frequency Data.
-        power (list): Power data.
+        freq (np.array): Frequency Data.
+        power (np.array): Power data.
         factor (int): Decimation factor.
+        envelope (bool): If True, also return the minimum power within each block, and its frequency.
 
     Returns:
-        tuple: (freq, power)
+        tuple: (freq, power), or (freq, power, freq_min, power_min) if envelope is True. The returned frequency of each
+            block is the frequency of the peak (or for freq_min, the minimum) within that block.
     """
+    freq = np.asarray(freq)
+    power = np.asarray(power)
+    factor = max(1, int(factor))
+
+    _full = len(power) // factor
+    _tail = len(power) - _full * factor
+    _out_len = _full + (1 if _tail > 0 else 0)
+
+    _freq_out = np.empty(_out_len, dtype=freq.dtype)
+    _power_out = np.empty(_out_len, dtype=power.dtype)
+    _freq_min = np.empty(_out_len, dtype=freq.dtype) if envelope else None
+    _power_min = np.empty(_out_len, dtype=power.dtype) if envelope else None
+
+    if _full > 0:
+        # Reshape the full blocks to (blocks, factor), and find the peak of each row.
+        _freq_blocks = freq[: _full * factor].reshape(_full, factor)
+        _power_blocks = power[: _full * factor].reshape(_full, factor)
+
+        _idx = np.argmax(_power_blocks, axis=1)
+        _rows = np.arange(_full)
+        _freq_out[:_full] = _freq_blocks[_rows, _idx]
+        _power_out[:_full] = _power_blocks[_rows, _idx]
+        if envelope:
+            _idx = np.argmin(_power_blocks, axis=1)
+            _freq_min[:_full] = _freq_blocks[_rows, _idx]
+            _power_min[:_full] = _power_blocks[_rows, _idx]
+
+    if _tail > 0:
+        _idx = np.argmax(power[-_tail:])
+        _freq_out[-1] = freq[-_tail:][_idx]
+        _power_out[-1] = power[-_tail:][_idx]
+        if envelope:
+            _idx = np.argmin(power[-_tail:])
+            _freq_min[-1] = freq[-_tail:][_idx]
+            _power_min[-1] = power[-_tail:][_idx]
+
+    if envelope:
+        return (_freq_out, _power_out, _freq_min, _power_min)
+    else:
+        return (_freq_out, _power_out)
 
-    _out_len = len(freq) // factor
 
-    _freq_out = []
-    _power_out = []
+def rolling_noise_floor(power, window, percentile=50.0, step=None):
+    """ Estimate the local noise floor of a power spectrum, using a rolling percentile.
 
-    try:
-        for i in range(_out_len):
-            _f_slice = freq[i * factor : i * factor + factor]
-            _p_slice = power[i * factor : i * factor + factor]
+    To keep this fast on large spectra, the percentile is evaluated on windows spaced 'step' bins apart
+    (using a strided view of the data, so no copies are made), and then linearly interpolated back to every bin.
+
+    Args:
+        power (np.array): Power spectrum, in dB.
+        window (int): Length of the rolling window, in bins.
+        percentile (float): Percentile (0-100) of the power within each window to use as the noise floor.
+        step (int): Spacing between evaluated windows, in bins. Defaults to a quarter of the window length.
+
+    Returns:
+        np.array: Noise floor estimate for each bin, in dB.
+    """
+    power = np.asarray(power, dtype=float)
+    _n = len(power)
+
+    if _n == 0:
+        return np.array([])
+
+    window = int(max(1, min(window, _n)))
+    if step is None:
+        step = max(1, window // 4)
+
+    # Pad the ends of the spectrum, so each window is centred on its bin.
+    _padded = np.pad(power, (window // 2, window - window // 2), mode="edge")
+
+    _centres = np.arange(0, _n, step)
+    _windows = np.lib.stride_tricks.as_strided(
+        _padded,
+        shape=(len(_centres), window),
+        strides=(_padded.strides[0] * step, _padded.strides[0]),
+        writeable=False,
+    )
+
+    _floor = np.percentile(_windows, percentile, axis=1)
+
+    return np.interp(np.arange(_n), _centres, _floor)
+
+
+def interval_mask(values, lower, upper):
+    """ Find which values fall within any of a set of (open) intervals.
+
+    The intervals are sorted once, and each value is located using a binary search, so this
+    scales to large numbers of values and intervals.
+
+    Args:
+        values (np.array): Values to check.
+        lower (np.array): Lower bound of each interval.
+        upper (np.array): Upper bound of each interval.
+
+    Returns:
+        np.array: Boolean array, True where lower < value < upper for at least one interval.
+    """
+    values = np.asarray(values, dtype=float)
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+
+    if len(values) == 0 or len(lower) == 0:
+        return np.zeros(len(values), dtype=bool)
+
+    _order = np.argsort(lower)
+    _lower = lower[_order]
+    # Highest upper bound of all intervals starting at or below each interval.
+    _upper = np.maximum.accumulate(upper[_order])
+
+    # Index of the last interval with a lower bound strictly below each value.
+    _idx = np.searchsorted(_lower, values, side="left") - 1
+
+    _mask = np.zeros(len(values), dtype=bool)
+    _valid = _idx >= 0
+    _mask[_valid] = values[_valid] < _upper[_idx[_valid]]
+
+    return _mask
+
+
+def lookup_peak_levels(freq, power, peak_freqs, width=5):
+    """ Look up the power level of a set of peaks within a (decimated) spectrum.
+
+    As the spectrum may have been decimated, the peak may not be located exactly at the
+    nearest frequency bin, so the maximum power within +/- width bins is used.
+
+    Args:
+        freq (np.array): Spectrum frequencies, sorted in ascending order.
+        power (np.array): Spectrum power levels.
+        peak_freqs (np.array): Peak frequencies, in the same units as freq.
+        width (int): Number of bins either side of the nearest bin to search.
+
+    Returns:
+        np.array: Power level of each peak.
+    """
+    freq = np.asarray(freq, dtype=float)
+    power = np.asarray(power, dtype=float)
+    peak_freqs = np.asarray(peak_freqs, dtype=float)
+
+    if len(freq) == 0 or len(peak_freqs) == 0:
+        return np.array([])
+
+    # Find the nearest bin to each peak.
+    if len(freq) == 1:
+        _idx = np.zeros(len(peak_freqs), dtype=int)
+    else:
+        _idx = np.clip(np.searchsorted(freq, peak_freqs), 1, len(freq) - 1)
+        _left_closer = np.abs(peak_freqs - freq[_idx - 1]) <= np.abs(
+            freq[_idx] - peak_freqs
+        )
+        _idx = _idx - _left_closer
+
+    # Take the maximum over a sliding window around each bin.
+    _padded = np.pad(power, width, mode="constant", constant_values=-np.inf)
+    _windows = np.lib.stride_tricks.as_strided(
+        _padded,
+        shape=(len(power), 2 * width + 1),
+        strides=(_padded.strides[0], _padded.strides[0]),
+        writeable=False,
+    )
+
+    return np.max(_windows[_idx], axis=1)
 
-            _freq_out.append(_f_slice[np.argmax(_p_slice)])
-            _power_out.append(_p_slice.max())
-    except:
-        pass
 
-    return (_freq_out, _power_out)
+def parabolic_peak_offset(power, peak_indices):
+    """ Estimate the position of a set of peaks to a fraction of a bin, by fitting a parabola
+    through each peak bin and its two neighbours.
+
+    Args:
+        power (np.array): Power spectrum, in dB.
+        peak_indices (np.array): Index of the peak bins.
+
+    Returns:
+        np.array: Offset of each peak from its peak bin, in bins (between -0.5 and 0.5).
+    """
+    power = np.asarray(power, dtype=float)
+    peak_indices = np.asarray(peak_indices, dtype=int)
+
+    if len(power) < 3 or len(peak_indices) == 0:
+        return np.zeros(len(peak_indices))
+
+    _idx = np.clip(peak_indices, 1, len(power) - 2)
+    _left = power[_idx - 1]
+    _centre = power[_idx]
+    _right = power[_idx + 1]
+
+    _denom = _left - 2 * _centre + _right
+    _offset = np.zeros(len(_idx))
+    _valid = _denom < 0
+    _offset[_valid] = 0.5 * (_left[_valid] - _right[_valid]) / _denom[_valid]
+
+    return np.clip(_offset, -0.5, 0.5)
+
+
+def cluster_peaks(
+    freq, snr, peak_indices, threshold, max_width, max_gap=0, min_dip=6.0
+):
+    """ Merge peaks which belong to the same signal, and estimate the centre frequency of each signal.
+
+    Bins with an SNR above threshold are considered occupied, and each run of occupied bins (allowing
+    for dips of up to max_gap bins) is treated as a single signal. All peaks within a signal no wider than
+    max_width are merged, and the signal's centre frequency is taken as the power-weighted centroid of its
+    occupied bins.
+
+    A run containing peaks which are well separated (the spectrum dips at least min_dip dB below the weaker
+    of two neighbouring peaks) is likely to be several signals close together, such as two sondes a few channels
+    apart, and is not merged. Peaks which are not merged (including those within a wide block of interference)
+    are kept as-is, with their frequency refined using parabolic interpolation.
+
+    Args:
+        freq (np.array): Frequency of each spectrum bin, in Hz. Bins must be evenly spaced.
+        snr (np.array): SNR of each spectrum bin, in dB.
+        peak_indices (np.array): Index of each detected peak, i.e. from detect_peaks.
+        threshold (float): SNR (dB) above which a bin is considered occupied.
+        max_width (int): Maximum width of a signal, in bins.
+        max_gap (int): Maximum number of unoccupied bins allowed within a signal.
+        min_dip (float): Minimum dip (dB) between two peaks for them to be considered separate signals.
+
+    Returns:
+        tuple: (frequencies, strongest) - The centre frequency (Hz) of each signal, and the index
+            (into peak_indices) of the strongest peak within each signal.
+    """
+    freq = np.asarray(freq, dtype=float)
+    snr = np.asarray(snr, dtype=float)
+    peak_indices = np.asarray(peak_indices, dtype=int)
+
+    if len(peak_indices) == 0 or len(freq) < 2:
+        return (freq[peak_indices], np.arange(len(peak_indices)))
+
+    _step = (freq[-1] - freq[0]) / (len(freq) - 1)
+
+    # Find the runs of occupied bins.
+    _occupied = np.concatenate(([False], snr >= threshold, [False]))
+    _edges = np.diff(_occupied.astype(int))
+    _starts = np.where(_edges == 1)[0]
+    _stops = np.where(_edges == -1)[0]
+
+    # Join runs separated by small gaps.
+    if len(_starts) > 1:
+        _join = (_starts[1:] - _stops[:-1]) <= max_gap
+        _starts = _starts[np.concatenate(([True], ~_join))]
+        _stops = _stops[np.concatenate((~_join, [True]))]
+
+    # Find the run containing each peak, and whether it is narrow enough to be a single signal.
+    _run = np.searchsorted(_starts, peak_indices, side="right") - 1
+    _in_run = _run >= 0
+    _in_run[_in_run] = peak_indices[_in_run] < _stops[_run[_in_run]]
+    _in_run[_in_run] = (_stops - _starts)[_run[_in_run]] <= max_width
+
+    # Don't merge runs containing well-separated peaks. Check each pair of neighbouring peaks (in frequency
+    # order) within the same run, using the lowest SNR between them.
+    _sorted = np.argsort(peak_indices)
+    _sorted_idx = peak_indices[_sorted]
+    if len(_sorted_idx) > 1:
+        _dip = np.minimum.reduceat(snr, _sorted_idx)[:-1]
+        _weaker = np.minimum(snr[_sorted_idx[:-1]], snr[_sorted_idx[1:]])
+        _same_run = _in_run[_sorted[:-1]] & (_run[_sorted[:-1]] == _run[_sorted[1:]])
+        _split_runs = _run[_sorted[:-1]][_same_run & ((_weaker - _dip) >= min_dip)]
+        _in_run[np.isin(_run, _split_runs)] = False
+
+    # Label each peak with its signal. Peaks which can't be merged get a signal of their own.
+    _keys = np.where(_in_run, _run, len(_starts) + np.arange(len(peak_indices)))
+    _signals, _labels = np.unique(_keys, return_inverse=True)
+
+    # Strongest peak within each signal.
+    _order = np.lexsort((-snr[peak_indices], _labels))
+    _first = np.concatenate(([True], np.diff(_labels[_order]) != 0))
+    _strongest = _order[_first]
+
+    # Refine the centre frequency of each signal.
+    _freqs = freq[peak_indices[_strongest]] + _step * parabolic_peak_offset(
+        snr, peak_indices[_strongest]
+    )
+
+    _merged = _signals < len(_starts)
+    if np.any(_merged):
+        # Power-weighted centroid of each run, using cumulative sums so each run is a simple difference.
+        _weight = np.where(snr >= threshold, 10 ** (snr / 10.0), 0.0)
+        _cum_weight = np.concatenate(([0.0], np.cumsum(_weight)))
+        _cum_freq = np.concatenate(([0.0], np.cumsum(_weight * (freq - freq[0]))))
+
+        _run_start = _starts[_signals[_merged]]
+        _run_stop = _stops[_signals[_merged]]
+        _total = _cum_weight[_run_stop] - _cum_weight[_run_start]
+        _freqs[_merged] = (
+            freq[0] + (_cum_freq[_run_stop] - _cum_freq[_run_start]) / _total
+        )
+
+    return (_freqs, _strongest)
 
 
 if __name__ == "__main__":
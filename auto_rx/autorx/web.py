@@ -17,6 +17,7 @@ import sys
 import autorx
 import autorx.config
 import autorx.scan
+import autorx.telemetry_bus
 from autorx.geometry import GenericTrack
 from threading import Thread
 import flask
@@ -251,6 +252,18 @@ def flask_get_scan_data():
     return json.dumps(autorx.scan.scan_result)
 
 
+@app.route("/get_scan_stats")
+def flask_get_scan_stats():
+    """ Return a summary of the recent scan cycle timings """
+    return json.dumps(autorx.scan.scan_stats.summary())
+
+
+@app.route("/get_telemetry_bus_stats")
+def flask_get_telemetry_bus_stats():
+    """ Return the telemetry bus delivery statistics for each exporter """
+    return json.dumps(autorx.telemetry_bus.telemetry_bus.status())
+
+
 @app.route("/get_telemetry_archive")
 def flask_get_telemetry_archive():
     """ Return a copy of the telemetry archive """
@@ -334,9 +347,11 @@ def flask_disable_scanner():
             _scan_sdr = autorx.task_list["SCAN"]["device_idx"]
             # Stop the scanner.
             autorx.task_list["SCAN"]["task"].stop()
-            # Relase the SDR.
-            autorx.sdr_list[_scan_sdr]["in_use"] = False
-            autorx.sdr_list[_scan_sdr]["task"] = None
+            # Relase the SDR, unless it is running the shared wideband capture.
+            # (The task manager will stop the capture once nothing else is using it.)
+            if not autorx.task_list["SCAN"].get("shared", False):
+                autorx.sdr_list[_scan_sdr]["in_use"] = False
+                autorx.sdr_list[_scan_sdr]["task"] = None
             # Remove the scanner task from the task list
             autorx.task_list.pop("SCAN")
             return "OK"
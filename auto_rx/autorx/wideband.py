@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Shared Wideband SDR Capture
+#
+#   Released under GNU GPL v3 or later
+#
+#   Runs a single continuous wideband capture on a SDR, and shares it between a number of users:
+#   - Decoders, which each receive a narrowband channel (i.e. 48 kHz) centred on their sonde, and
+#   - The scanner, which takes blocks of the wideband samples for spectrum estimation and wideband detection.
+#   This allows a single SDR to decode sondes while scanning continues in the background.
+#   Captures can also be run for decoders only, acting as 'virtual SDRs' for all sondes within their bandwidth.
+#
+import logging
+import os
+import signal
+import subprocess
+import time
+import traceback
+import numpy as np
+from threading import Thread, Lock
+from .channelizer import Channelizer, to_cs16
+from .fm_demod import Resampler
+from .scan import convert_iq, IQ_SAMPLE_SIZE
+
+try:
+    # Python 2
+    from Queue import Queue, Empty, Full
+except ImportError:
+    # Python 3
+    from queue import Queue, Empty, Full
+
+
+# Channel sample rates used by the decoders. The capture's channelizer is set up so that channels at these rates
+# can be produced directly. Channels at other rates are resampled from the next rate up.
+WIDEBAND_CHANNEL_RATES = [48000, 50000, 96000]
+
+
+def channelizer_rate(capture_rate, sample_rate):
+    """ Find the rate to channelize at, to produce a channel at a given sample rate.
+
+    The channelizer can only produce channels at rates which divide evenly into the capture rate, so use the
+    lowest such rate which is at least the channel rate. Channels are then resampled to their actual rate.
+
+    Args:
+        capture_rate (int): Capture sample rate, in Hz.
+        sample_rate (int): Channel sample rate, in Hz.
+
+    Returns:
+        int: Channelizer output rate, in Hz.
+    """
+    _decimation = max(int(capture_rate) // int(sample_rate), 1)
+    while int(capture_rate) % _decimation != 0:
+        _decimation -= 1
+
+    return int(capture_rate) // _decimation
+
+
+def capture_centre_freq(frequency, sample_rate, min_freq, max_freq, dc_offset=100000):
+    """ Choose a centre frequency for a wideband capture which must contain a sonde, covering as much of a
+    frequency range (i.e. the scan range) as possible.
+
+    Args:
+        frequency (float): Sonde frequency, in Hz.
+        sample_rate (int): Capture sample rate, in Hz.
+        min_freq (float): Lower end of the frequency range, in Hz.
+        max_freq (float): Upper end of the frequency range, in Hz.
+        dc_offset (float): Minimum distance between the sonde and the centre frequency, in Hz, to keep the
+            sonde clear of the SDR's DC spike.
+
+    Returns:
+        int: Capture centre frequency, in Hz.
+    """
+    # Furthest the sonde can be from the centre, and still fit a 96 kHz channel within the usable bandwidth.
+    _reach = (0.8 * sample_rate - 96000) / 2.0
+
+    _centre = min(
+        max((min_freq + max_freq) / 2.0, frequency - _reach), frequency + _reach
+    )
+
+    if abs(_centre - frequency) < dc_offset:
+        # Move away from the sonde, towards the middle of the frequency range.
+        if _centre >= frequency:
+            _centre = frequency + dc_offset
+        else:
+            _centre = frequency - dc_offset
+
+    return int(_centre)
+
+
+class WidebandChannel(object):
+    """ A narrowband channel of a WidebandCapture.
+
+    Samples are channelized by the capture's shared channelizer (and if required, resampled) in the capture thread,
+    and buffered (as 16-bit IQ, the same format as produced by rtl_fm -M raw) until read out by the consumer.
+    If the consumer falls behind, blocks of samples are dropped rather than holding up the capture.
+    """
+
+    def __init__(self, capture, frequency, sample_rate, queue_length=200):
+        """
+        Args:
+            capture (WidebandCapture): The capture this channel is part of.
+            frequency (float): Channel centre frequency, in Hz.
+            sample_rate (int): Channel sample rate, in Hz.
+            queue_length (int): Maximum number of blocks of samples to buffer.
+        """
+        self.capture = capture
+        self.frequency = frequency
+        self.sample_rate = sample_rate
+
+        # Rate the channel is produced at by the capture's channelizer.
+        _channel_rate = capture.channelizer.output_rate_for(sample_rate)
+        self.channel_rate = _channel_rate
+        self.channel_bw = 0.8 * min(_channel_rate, sample_rate)
+        # Channelizer output for this channel, set when the channel is added to the capture.
+        self.output = None
+
+        if _channel_rate != sample_rate:
+            # i.e. the 48080 Hz used by the M10 decoder.
+            self.resampler = Resampler(_channel_rate, sample_rate, dtype=np.complex64)
+        else:
+            self.resampler = None
+
+        self.queue = Queue(queue_length)
+        self.dropped = 0
+        self.active = True
+
+    def push(self, samples):
+        """ Add a block of channelized samples to the channel's buffer. Called from the capture thread. """
+        if len(samples) == 0:
+            return
+
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+
+        try:
+            self.queue.put_nowait(to_cs16(samples))
+        except Full:
+            self.dropped += 1
+
+    def pump(self, output):
+        """ Write channel samples into a file object (i.e. the stdin of a demodulator) until the channel is closed,
+        or the file object can no longer be written to.
+
+        Args:
+            output (file): File object to write to.
+        """
+        while self.active:
+            try:
+                _data = self.queue.get(timeout=1)
+            except Empty:
+                continue
+
+            try:
+                output.write(_data)
+                output.flush()
+            except (IOError, ValueError):
+                # The consumer has exited.
+                break
+
+        if self.dropped > 0:
+            logging.warning(
+                "Wideband Capture - Channel %.3f MHz dropped %d blocks of samples."
+                % (self.frequency / 1e6, self.dropped)
+            )
+
+        try:
+            output.close()
+        except (IOError, ValueError):
+            pass
+
+    def close(self):
+        """ Remove this channel from the capture. """
+        self.active = False
+        self.capture.remove_channel(self)
+
+
+class WidebandCapture(object):
+    """ Shared Wideband SDR Capture
+
+    Runs a continuous rtl_sdr capture at a fixed centre frequency, and distributes the samples to a set of
+    WidebandChannels, and to any running sample 'taps'. A single channelizer is shared by all of the channels, so
+    each block of samples only needs one forward FFT however many channels are running.
+
+    This class also presents the same interface as the scanner's IQ sources (i.e. RTLSDRIQSource), with a fixed
+    centre frequency, so it can be used directly by the scanner's FFT spectrum backend and wideband detection.
+    """
+
+    iq_format = "cu8"
+
+    def __init__(
+        self,
+        device_idx=0,
+        centre_freq=403000000,
+        sample_rate=2400000,
+        ppm=0,
+        gain=-1,
+        bias=False,
+        rtl_sdr_path="rtl_sdr",
+        iq_source=None,
+        realtime=False,
+        chunk_size=65536,
+        tap_queue_length=64,
+    ):
+        """
+        Args:
+            device_idx (int or str): Device index or serial number of the RTLSDR.
+            centre_freq (float): Capture centre frequency, in Hz.
+            sample_rate (int): Capture sample rate, in Hz.
+            ppm (int): SDR Frequency accuracy correction, in ppm.
+            gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+            bias (bool): If True, enable the bias tee on the SDR.
+            rtl_sdr_path (str): Path to rtl_sdr.
+            iq_source: IQ source object to use instead of rtl_sdr (i.e. a FileIQSource for testing).
+            realtime (bool): Pace the samples read from iq_source to the sample rate. rtl_sdr is always real-time.
+            chunk_size (int): Number of samples to process at a time.
+            tap_queue_length (int): Maximum number of chunks to buffer for each tap.
+        """
+        self.device_idx = device_idx
+        self.centre_freq = centre_freq
+        self.sample_rate = sample_rate
+        self.ppm = ppm
+        self.gain = gain
+        self.bias = bias
+        self.rtl_sdr_path = rtl_sdr_path
+        self.iq_source = iq_source
+        self.realtime = realtime
+        self.chunk_size = chunk_size
+        self.tap_queue_length = tap_queue_length
+
+        self.channels = []
+        self.taps = []
+        self.lock = Lock()
+
+        # Only use the central 80% of the capture bandwidth, leaving space for the channel filters at the edges.
+        self.usable_bw = 0.8 * self.sample_rate
+
+        # Channelizer shared by all channels. Its FFT size and overlap must be multiples of the decimation factor
+        # of every channel rate, so set it up with the lowest common multiple of the decimations needed for the
+        # decoders' channel rates. Each channel then sets its own rate when added.
+        _decimations = [
+            self.sample_rate // channelizer_rate(self.sample_rate, _rate)
+            for _rate in WIDEBAND_CHANNEL_RATES
+        ]
+        _common_decimation = int(np.lcm.reduce(_decimations))
+        self.channelizer = Channelizer(
+            self.sample_rate,
+            self.sample_rate // _common_decimation,
+            self.centre_freq,
+            [],
+            fft_size=max(_decimations) * 1024,
+        )
+
+        self.capture_process = None
+        self.capture_running = True
+        self.capture_thread = Thread(target=self.run_capture)
+        self.capture_thread.start()
+
+        self.log_info(
+            "Started %.1f MHz wide capture centred on %.3f MHz."
+            % (self.sample_rate / 1e6, self.centre_freq / 1e6)
+        )
+
+    def sample_stream(self):
+        """ Generator yielding chunks of complex samples from rtl_sdr, or the supplied IQ source. """
+        if self.iq_source is not None:
+            _start = time.time()
+            _count = 0
+            for _samples in self.iq_source.capture(self.centre_freq, 2 ** 62):
+                yield _samples
+
+                if self.realtime:
+                    _count += len(_samples)
+                    _wait = _start + _count / float(self.sample_rate) - time.time()
+                    if _wait > 0:
+                        time.sleep(_wait)
+            return
+
+        # Add a -T option if bias is enabled
+        bias_option = "-T " if self.bias else ""
+
+        # Add a gain parameter if we have been provided one.
+        if self.gain != -1:
+            gain_param = "-g %.1f " % self.gain
+        else:
+            gain_param = ""
+
+        # No -n option - the capture runs until we stop it.
+        _cmd = "%s %s-p %d -d %s %s-s %d -f %d - 2>/dev/null" % (
+            self.rtl_sdr_path,
+            bias_option,
+            int(self.ppm),
+            str(self.device_idx),
+            gain_param,
+            self.sample_rate,
+            self.centre_freq,
+        )
+        self.log_debug("Running command: %s" % _cmd)
+
+        self.capture_process = subprocess.Popen(
+            _cmd, shell=True, stdout=subprocess.PIPE, preexec_fn=os.setsid
+        )
+        _chunk_bytes = self.chunk_size * IQ_SAMPLE_SIZE[self.iq_format]
+
+        while True:
+            _data = self.capture_process.stdout.read(_chunk_bytes)
+            if not _data:
+                break
+            yield convert_iq(_data, self.iq_format)
+
+    def run_capture(self):
+        """ Capture thread - distribute samples to all channels and taps. """
+        try:
+            for _samples in self.sample_stream():
+                if not self.capture_running:
+                    break
+
+                # Channels are only added and removed with the lock held, so the channelizer
+                # outputs stay in the same order as the channel list.
+                with self.lock:
+                    _outputs = self.channelizer.process(_samples)
+                    _channels = list(self.channels)
+                    _taps = list(self.taps)
+
+                for _channel, _output in zip(_channels, _outputs):
+                    _channel.push(_output)
+
+                for _tap in _taps:
+                    try:
+                        _tap.put_nowait(_samples)
+                    except Full:
+                        pass
+
+        except Exception as e:
+            traceback.print_exc()
+            self.log_error("Capture error - %s" % str(e))
+
+        if self.capture_running:
+            self.log_error("Capture stopped unexpectedly.")
+
+        self.stop_capture_process()
+        self.capture_running = False
+
+    def stop_capture_process(self):
+        """ Kill the rtl_sdr process, if one is running. """
+        # This may be called from both the capture thread and close().
+        _process = self.capture_process
+        self.capture_process = None
+        if _process is None:
+            return
+
+        try:
+            if _process.poll() is None:
+                os.killpg(os.getpgid(_process.pid), signal.SIGTERM)
+            _process.wait()
+        except Exception as e:
+            self.log_debug("Error stopping rtl_sdr - %s" % str(e))
+
+    def covers(self, frequency, sample_rate=48000):
+        """ Check if a channel at a frequency fits within the usable bandwidth of the capture.
+
+        Args:
+            frequency (float): Channel centre frequency, in Hz.
+            sample_rate (int): Channel sample rate, in Hz.
+
+        Returns:
+            bool: True if the channel fits within the capture.
+        """
+        return abs(frequency - self.centre_freq) <= (self.usable_bw - sample_rate) / 2.0
+
+    def add_channel(self, frequency, sample_rate):
+        """ Add a narrowband channel to the capture.
+
+        Args:
+            frequency (float): Channel centre frequency, in Hz.
+            sample_rate (int): Channel sample rate, in Hz.
+
+        Returns:
+            WidebandChannel: The new channel.
+        """
+        if not self.capture_running:
+            raise ValueError("Capture is not running.")
+
+        if not self.covers(frequency, sample_rate):
+            raise ValueError(
+                "%.3f MHz is outside the capture bandwidth." % (frequency / 1e6)
+            )
+
+        _channel = WidebandChannel(self, frequency, sample_rate)
+        with self.lock:
+            _channel.output = self.channelizer.add_channel(
+                frequency, _channel.channel_rate, channel_bw=_channel.channel_bw
+            )
+            self.channels.append(_channel)
+
+        self.log_debug(
+            "Added %d Hz channel at %.3f MHz." % (sample_rate, frequency / 1e6)
+        )
+        return _channel
+
+    def remove_channel(self, channel):
+        """ Remove a narrowband channel from the capture. """
+        with self.lock:
+            if channel in self.channels:
+                self.channelizer.remove_channel(channel.output)
+                self.channels.remove(channel)
+                self.log_debug(
+                    "Removed channel at %.3f MHz." % (channel.frequency / 1e6)
+                )
+
+    def capture(self, frequency, num_samples):
+        """ Take a block of samples from the capture. The requested frequency is ignored, as the capture
+        runs at a fixed centre frequency.
+
+        Args:
+            frequency (float): Centre frequency, in Hz (unused).
+            num_samples (int): Number of samples to take.
+
+        Yields:
+            np.array: Chunks of complex samples.
+        """
+        _tap = Queue(self.tap_queue_length)
+        with self.lock:
+            self.taps.append(_tap)
+
+        try:
+            _remaining = num_samples
+            while (_remaining > 0) and self.capture_running:
+                try:
+                    _samples = _tap.get(timeout=1)
+                except Empty:
+                    continue
+
+                _samples = _samples[:_remaining]
+                _remaining -= len(_samples)
+                yield _samples
+        finally:
+            with self.lock:
+                self.taps.remove(_tap)
+
+    def running(self):
+        """ Check if the capture is running. """
+        return self.capture_running
+
+    def close(self):
+        """ Stop the capture. """
+        self.capture_running = False
+        # Kill rtl_sdr so the capture thread is not left waiting on a read.
+        self.stop_capture_process()
+        self.capture_thread.join()
+
+        with self.lock:
+            for _channel in self.channels:
+                _channel.active = False
+            self.channels = []
+
+        self.log_info("Capture stopped.")
+
+    def log_debug(self, line):
+        """ Helper function to log a debug message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.debug("Wideband Capture #%s - %s" % (str(self.device_idx), line))
+
+    def log_info(self, line):
+        """ Helper function to log an informational message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.info("Wideband Capture #%s - %s" % (str(self.device_idx), line))
+
+    def log_error(self, line):
+        """ Helper function to log an error message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.error("Wideband Capture #%s - %s" % (str(self.device_idx), line))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#
+#   Correlator Detection Test
+#
+#   Runs the in-process sonde detector (autorx.correlator) over a set of IQ recordings, and reports the
+#   detected sonde type, correlation score, frequency offset and time to detection for each.
+#   Optionally, dft_detect is also run over each recording, for comparison.
+#
+#   Released under GNU GPL v3 or later
+#
+#   Run from the auto_rx directory:
+#   $ python test/correlator_detect.py --dft_detect "test/generated/*.bin"
+#
+#   IQ recordings are expected to be 96 kHz complex float (as used in test/samples/) unless otherwise specified.
+#
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+# Allow running from either the auto_rx or auto_rx/test directories.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from autorx.correlator import SondeCorrelator
+from autorx.scan import IQ_SAMPLE_SIZE, convert_iq
+
+
+def run_correlator(filename, sample_rate, iq_format, if_bw, dwell_time):
+    """ Run the correlator over an IQ recording.
+
+    Returns:
+        tuple: (result, detection time, runtime) - result is a (type, score, offset) tuple, or None.
+            The detection time is in seconds of samples.
+    """
+    _correlator = SondeCorrelator(sample_rate=sample_rate, if_bw=if_bw * 1000)
+    _chunk_bytes = int(sample_rate * 0.1) * IQ_SAMPLE_SIZE[iq_format]
+
+    _start = time.time()
+    with open(filename, "rb") as _f:
+        while _correlator.samples < dwell_time * sample_rate:
+            _data = _f.read(_chunk_bytes)
+            if not _data:
+                break
+
+            _detections = _correlator.process(convert_iq(_data, iq_format))
+            if len(_detections) > 0:
+                return (
+                    _detections[0][1:],
+                    _correlator.samples / float(sample_rate),
+                    time.time() - _start,
+                )
+
+    return (None, _correlator.samples / float(sample_rate), time.time() - _start)
+
+
+def run_dft_detect(filename, sample_rate, iq_format, if_bw, dwell_time, rs_path):
+    """ Run dft_detect over an IQ recording, returning its output and runtime. """
+    _bits = {"cu8": 8, "cs16": 16, "cf32": 32}[iq_format]
+    _command = [
+        os.path.join(rs_path, "dft_detect"),
+        "-t",
+        str(dwell_time),
+        "--iq",
+        "--bw",
+        str(if_bw),
+        "--dc",
+        "-",
+        str(sample_rate),
+        str(_bits),
+        filename,
+    ]
+
+    _start = time.time()
+    _output = subprocess.run(
+        _command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    ).stdout.decode("utf8", errors="ignore")
+    return (_output.strip(), time.time() - _start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+", help="IQ recordings (glob patterns).")
+    parser.add_argument(
+        "--rate", type=int, default=96000, help="Sample rate of the recordings."
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="cf32",
+        choices=["cu8", "cs16", "cf32"],
+        help="Sample format of the recordings.",
+    )
+    parser.add_argument("--bw", type=int, default=20, help="IF bandwidth, in kHz.")
+    parser.add_argument(
+        "-t", "--time", type=int, default=5, help="Detection dwell time, in seconds."
+    )
+    parser.add_argument(
+        "--dft_detect", action="store_true", help="Also run dft_detect, for comparison."
+    )
+    parser.add_argument(
+        "--rs_path", type=str, default="../", help="Path to the dft_detect binary."
+    )
+    args = parser.parse_args()
+
+    _files = []
+    for _pattern in args.files:
+        _files.extend(sorted(glob.glob(_pattern)))
+
+    for _file in _files:
+        (_result, _detect_time, _runtime) = run_correlator(
+            _file, args.rate, args.format, args.bw, args.time
+        )
+        if _result is None:
+            _line = "%40s  correlator: -  (%.3fs)" % (os.path.basename(_file), _runtime)
+        else:
+            _line = "%40s  correlator: %s: %.4f , %+.1fHz  (at %.1fs, %.3fs)" % (
+                os.path.basename(_file),
+                _result[0],
+                _result[1],
+                _result[2],
+                _detect_time,
+                _runtime,
+            )
+
+        if args.dft_detect:
+            (_output, _dft_runtime) = run_dft_detect(
+                _file, args.rate, args.format, args.bw, args.time, args.rs_path
+            )
+            _line += "  dft_detect: %s  (%.3fs)" % (
+                _output if _output else "-",
+                _dft_runtime,
+            )
+
+        print(_line)
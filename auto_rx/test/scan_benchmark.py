@@ -0,0 +1,532 @@
+#!/usr/bin/env python
+#
+#   Scanner post-processing benchmarks.
+#
+#   Compares the current scanner post-processing functions against
+#   the previous (reference) implementations, using synthetic rtl_power sweeps.
+#
+#   Released under GNU GPL v3 or later
+#
+#   Run from the auto_rx directory:
+#   $ python test/scan_benchmark.py
+#
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Allow running from either the auto_rx or auto_rx/test directories.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from io import StringIO
+from autorx.scan import read_rtl_power
+from autorx.utils import (
+    detect_peaks,
+    interval_mask,
+    lookup_peak_levels,
+    peak_decimation,
+    rolling_noise_floor,
+)
+
+
+#
+# Reference implementations
+#
+
+
+def read_rtl_power_reference(filename):
+    """ Previous line-by-line rtl_power log reader, used as a reference. """
+
+    freq = np.array([])
+    power = np.array([])
+    freq_step = 0
+
+    f = open(filename, "r")
+    for line in f:
+        fields = line.split(",")
+        if len(fields) < 6:
+            raise Exception("Invalid number of samples in input file - corrupt?")
+
+        start_freq = float(fields[2])
+        stop_freq = float(fields[3])
+        freq_step = float(fields[4])
+
+        samples = np.loadtxt(StringIO(",".join(fields[6:])), delimiter=",")
+        freq_range = np.linspace(start_freq, stop_freq, len(samples))
+
+        freq = np.append(freq, freq_range)
+        power = np.append(power, samples)
+
+    f.close()
+
+    power = np.nan_to_num(power)
+
+    return (freq, power, freq_step)
+
+
+def peak_decimation_reference(freq, power, factor):
+    """ Previous loop-based peak decimation, used as a reference. """
+
+    _out_len = len(freq) // factor
+
+    _freq_out = []
+    _power_out = []
+
+    try:
+        for i in range(_out_len):
+            _f_slice = freq[i * factor : i * factor + factor]
+            _p_slice = power[i * factor : i * factor + factor]
+
+            _freq_out.append(_f_slice[np.argmax(_p_slice)])
+            _power_out.append(_p_slice.max())
+    except:
+        pass
+
+    return (_freq_out, _power_out)
+
+
+def block_filter_reference(peak_frequencies, block_frequencies, quantization):
+    """ Previous per-entry blacklist filtering, used as a reference. """
+    for _frequency in block_frequencies:
+        _index = np.argwhere(
+            np.abs(peak_frequencies - _frequency) < (quantization / 2.0)
+        )
+        peak_frequencies = np.delete(peak_frequencies, _index)
+
+    return peak_frequencies
+
+
+def peak_levels_reference(freq, power, peak_freqs):
+    """ Previous per-peak level lookup, used as a reference.
+
+    Note that this searched bins -5 to +4 around the nearest bin (and never the last bin of the spectrum),
+    whereas lookup_peak_levels searches +/- 5 bins, so the levels may differ slightly.
+    """
+    _peak_lvl = []
+    for _peak in peak_freqs:
+        try:
+            _peak_power_idx = np.argmin(np.abs(freq - _peak))
+            _peak_search_min = max(0, _peak_power_idx - 5)
+            _peak_search_max = min(len(freq) - 1, _peak_power_idx + 5)
+            _peak_lvl.append(max(power[_peak_search_min:_peak_search_max]))
+        except:
+            pass
+
+    return np.array(_peak_lvl)
+
+
+#
+# Synthetic data generation
+#
+
+
+def generate_rtl_power_sweep(
+    filename,
+    min_freq=400.0e6,
+    max_freq=406.0e6,
+    step=800.0,
+    hop_bw=1.6e6,
+    noise_floor=-60.0,
+    signals=[],
+    nan_fraction=0.0001,
+    seed=0,
+    slope=0.0,
+):
+    """ Write out a synthetic rtl_power single-shot log file.
+
+    Args:
+        filename (str): File to write to.
+        min_freq (float): Start frequency, in Hz.
+        max_freq (float): Stop frequency, in Hz.
+        step (float): Bin width, in Hz.
+        hop_bw (float): Width of each rtl_power hop, in Hz.
+        noise_floor (float): Mean noise level, in dB.
+        signals (list): List of (frequency (Hz), level (dB above the noise floor), bandwidth (Hz)) tuples.
+        nan_fraction (float): Fraction of samples to replace with nan (as rtl_power occasionally does).
+        seed (int): Random seed.
+        slope (float): Change in noise floor (dB) across the entire sweep.
+
+    Returns:
+        int: Number of bins written.
+    """
+    _rng = np.random.RandomState(seed)
+
+    _bins_per_hop = int(hop_bw / step)
+    _hop_starts = np.arange(min_freq, max_freq, hop_bw)
+    _total = 0
+
+    with open(filename, "w") as f:
+        for _start in _hop_starts:
+            _stop = _start + _bins_per_hop * step
+            _freqs = np.linspace(_start, _stop, _bins_per_hop)
+            # Slight slope across each hop, to emulate the SDR passband response.
+            _power = (
+                noise_floor
+                + _rng.normal(0, 1.0, _bins_per_hop)
+                + np.linspace(-1.5, 1.5, _bins_per_hop)
+                + slope * (_freqs - min_freq) / (max_freq - min_freq)
+            )
+
+            for (_sig_freq, _sig_level, _sig_bw) in signals:
+                _power += _sig_level * np.exp(
+                    -0.5 * ((_freqs - _sig_freq) / (_sig_bw / 2.0)) ** 2
+                )
+
+            _samples = ["%.2f" % _p for _p in _power]
+            for _i in np.where(_rng.random_sample(_bins_per_hop) < nan_fraction)[0]:
+                _samples[_i] = "-nan"
+
+            f.write(
+                "2020-01-01, 00:00:00, %d, %d, %.2f, %d, %s\n"
+                % (_start, _stop, step, 1, ", ".join(_samples))
+            )
+            _total += _bins_per_hop
+
+    return _total
+
+
+def time_function(func, args, runs=5):
+    """ Run a function several times, and return the best runtime (seconds) and the result. """
+    _best = None
+    _result = None
+    for _i in range(runs):
+        _start = time.time()
+        _result = func(*args)
+        _runtime = time.time() - _start
+        if (_best is None) or (_runtime < _best):
+            _best = _runtime
+
+    return (_best, _result)
+
+
+#
+# Benchmarks
+#
+
+
+def benchmark_read_rtl_power(steps, hop_bw, runs):
+    """ Compare the reference and current rtl_power log readers. """
+    print("read_rtl_power - 400-406 MHz sweep, %.1f kHz hops" % (hop_bw / 1e3))
+    print(
+        "%10s %10s %15s %15s %10s"
+        % ("step (Hz)", "bins", "reference (s)", "current (s)", "speedup")
+    )
+
+    _tempdir = tempfile.mkdtemp()
+
+    for _step in steps:
+        _filename = os.path.join(_tempdir, "log_power_%d.csv" % _step)
+        _bins = generate_rtl_power_sweep(
+            _filename,
+            step=_step,
+            hop_bw=hop_bw,
+            signals=[(402.5e6, 20, 8e3), (401.1e6, 30, 10e3)],
+        )
+
+        (_ref_time, _ref) = time_function(read_rtl_power_reference, (_filename,), runs)
+        (_new_time, _new) = time_function(read_rtl_power, (_filename,), runs)
+
+        # Check the outputs match.
+        assert np.allclose(_ref[0], _new[0], rtol=0, atol=1e-3), "Frequency mismatch!"
+        assert np.array_equal(_ref[1], _new[1]), "Power mismatch!"
+        assert _ref[2] == _new[2], "Step mismatch!"
+
+        print(
+            "%10d %10d %15.4f %15.4f %9.1fx"
+            % (_step, _bins, _ref_time, _new_time, _ref_time / _new_time)
+        )
+
+        os.remove(_filename)
+
+    os.rmdir(_tempdir)
+
+
+def benchmark_peak_decimation(steps, factor, runs):
+    """ Compare the reference and current peak decimation functions. """
+    print(
+        "\npeak_decimation - 400-406 MHz sweep, decimation factor %d (with envelope)"
+        % factor
+    )
+    print(
+        "%10s %10s %15s %15s %10s %15s"
+        % (
+            "step (Hz)",
+            "bins",
+            "reference (s)",
+            "current (s)",
+            "speedup",
+            "envelope (s)",
+        )
+    )
+
+    _rng = np.random.RandomState(0)
+
+    for _step in steps:
+        # Add a few bins, so the sweep doesn't divide evenly by the decimation factor.
+        _freq = np.arange(400.0e6, 406.0e6, _step)[:-3] / 1e6
+        _power = -60.0 + _rng.normal(0, 1.0, len(_freq))
+
+        (_ref_time, _ref) = time_function(
+            peak_decimation_reference, (_freq, _power, factor), runs
+        )
+        (_new_time, _new) = time_function(
+            peak_decimation, (_freq, _power, factor), runs
+        )
+        (_env_time, _env) = time_function(
+            lambda f, p, d: peak_decimation(f, p, d, envelope=True),
+            (_freq, _power, factor),
+            runs,
+        )
+
+        # The reference implementation dropped the ragged tail, otherwise the outputs should match.
+        _n = len(_ref[0])
+        assert np.array_equal(_ref[0], _new[0][:_n]), "Frequency mismatch!"
+        assert np.array_equal(_ref[1], _new[1][:_n]), "Power mismatch!"
+        assert len(_new[0]) == int(np.ceil(len(_freq) / float(factor)))
+        assert np.array_equal(_env[0], _new[0]), "Envelope frequency mismatch!"
+        assert np.all(_env[3] <= _env[1]), "Envelope mismatch!"
+        assert np.all(np.isin(_env[2], _freq)), "Envelope minimum frequency mismatch!"
+
+        print(
+            "%10d %10d %15.4f %15.4f %9.1fx %15.4f"
+            % (
+                _step,
+                len(_freq),
+                _ref_time,
+                _new_time,
+                _ref_time / _new_time,
+                _env_time,
+            )
+        )
+
+
+def block_filter(peak_frequencies, block_frequencies, quantization):
+    """ Blacklist filtering, as performed by SondeScanner.process_spectrum. """
+    _blocks = np.sort(block_frequencies)
+    _blocked = interval_mask(
+        peak_frequencies, _blocks - quantization / 2.0, _blocks + quantization / 2.0
+    )
+    return peak_frequencies[~_blocked]
+
+
+def benchmark_block_filter(block_counts, num_peaks, runs):
+    """ Compare the reference and current blacklist filtering and peak level lookups. """
+    print(
+        "\nBlacklist filtering - %d peaks, 10 kHz quantization, 400-406 MHz" % num_peaks
+    )
+    print(
+        "%10s %15s %15s %10s" % ("entries", "reference (s)", "current (s)", "speedup")
+    )
+
+    _rng = np.random.RandomState(0)
+    _quantization = 10000.0
+
+    # Quantized peaks, as produced by the scanner.
+    _peaks = (
+        np.round(_rng.uniform(400.0e6, 406.0e6, num_peaks) / _quantization)
+        * _quantization
+    )
+
+    for _count in block_counts:
+        # Blacklist entries are entered in MHz, so don't always line up with the quantized peaks.
+        _blocks = np.round(_rng.uniform(400.0e6, 406.0e6, _count), -3)
+
+        (_ref_time, _ref) = time_function(
+            block_filter_reference, (_peaks, _blocks, _quantization), runs
+        )
+        (_new_time, _new) = time_function(
+            block_filter, (_peaks, _blocks, _quantization), runs
+        )
+        assert np.array_equal(_ref, _new), "Filter mismatch!"
+
+        print(
+            "%10d %15.4f %15.4f %9.1fx"
+            % (_count, _ref_time, _new_time, _ref_time / _new_time)
+        )
+
+    # Peak level lookup, against a decimated 400-406 MHz spectrum.
+    _freq = np.arange(400.0e6, 406.0e6, 8000) / 1e6
+    _power = -60.0 + _rng.normal(0, 1.0, len(_freq))
+    (_ref_time, _ref) = time_function(
+        peak_levels_reference, (_freq, _power, _peaks / 1e6), runs
+    )
+    (_new_time, _new) = time_function(
+        lookup_peak_levels, (_freq, _power, _peaks / 1e6), runs
+    )
+    # The current lookup searches one more bin above each peak, so levels can only be the same or higher.
+    assert len(_ref) == len(_new), "Peak count mismatch!"
+    assert np.all(_new >= _ref), "Peak level mismatch!"
+    print(
+        "\nPeak level lookup - %d peaks: reference %.4f s, current %.4f s, %.1fx (%d levels differ, by up to %.2f dB)"
+        % (
+            num_peaks,
+            _ref_time,
+            _new_time,
+            _ref_time / _new_time,
+            np.sum(_new != _ref),
+            np.max(_new - _ref),
+        )
+    )
+
+
+def find_peaks(freq, power, step, snr_threshold, noise_floor_window):
+    """ Detect peaks the same way as SondeScanner.process_spectrum, returning the peak frequencies (Hz). """
+    if noise_floor_window > 0:
+        _nf = rolling_noise_floor(power, noise_floor_window / step)
+    else:
+        _nf = np.mean(power)
+
+    _idx = detect_peaks(power - _nf, mph=snr_threshold, mpd=(1000.0 / step))
+    return freq[_idx]
+
+
+def count_peaks(peaks, signals):
+    """ Split a list of detected peaks into (real, false) counts.
+
+    Args:
+        peaks (np.array): Detected peak frequencies, in Hz.
+        signals (list): List of (frequency (Hz), tolerance (Hz)) tuples for the known signals.
+
+    Returns:
+        tuple: (number of signals detected, number of peaks not matching any signal)
+    """
+    _real = 0
+    _matched = np.zeros(len(peaks), dtype=bool)
+    for (_sig_freq, _tolerance) in signals:
+        _near = np.abs(peaks - _sig_freq) < _tolerance
+        if np.any(_near):
+            _real += 1
+        _matched |= _near
+
+    return (_real, int(np.sum(~_matched)))
+
+
+def benchmark_noise_floor(sweep, snr_threshold, noise_floor_window, runs):
+    """ Compare peak detection using a global mean noise floor against a rolling noise floor estimate. """
+    print(
+        "\nNoise floor estimation - SNR threshold %.1f dB, %.1f kHz window"
+        % (snr_threshold, noise_floor_window / 1e3)
+    )
+
+    _tempdir = tempfile.mkdtemp()
+
+    # Weak sondes, 12 dB above the local noise floor.
+    _sondes = [400.5e6, 401.7e6, 403.3e6, 404.9e6, 405.6e6]
+    _weak = [(_f, 12, 8e3) for _f in _sondes]
+    # A broad hump in the passband response.
+    _hump = [(402.3e6, 8, 600e3)]
+    # A strong wideband transmitter, which raises the mean power across the whole sweep.
+    _strong = [(404.2e6, 25, 300e3)]
+
+    _scenarios = [
+        ("flat", {}, _weak, []),
+        ("6 dB slope", {"slope": 6.0}, _weak, []),
+        ("slope + hump", {"slope": 6.0}, _weak + _hump, []),
+        ("strong signal", {}, _weak + _strong, _strong),
+    ]
+
+    _cases = []
+    for (_name, _kwargs, _signals, _wide) in _scenarios:
+        _filename = os.path.join(_tempdir, "log_power_%s.csv" % _name.replace(" ", ""))
+        generate_rtl_power_sweep(
+            _filename, step=800, signals=_signals, nan_fraction=0, **_kwargs
+        )
+        # Peaks anywhere within a wideband signal are counted as that signal.
+        _known = [(_f, 10e3) for _f in _sondes] + [(_s[0], _s[2]) for _s in _wide]
+        _cases.append((_name, _filename, _known))
+
+    if sweep:
+        # A recorded sweep - there are no known signal frequencies, so only the peak counts are reported.
+        _cases.append(("recorded", sweep, None))
+
+    print(
+        "%15s %22s %22s %13s %13s"
+        % (
+            "sweep",
+            "mean (real/false)",
+            "rolling (real/false)",
+            "mean (s)",
+            "rolling (s)",
+        )
+    )
+
+    for (_name, _filename, _known) in _cases:
+        (_freq, _power, _step) = read_rtl_power(_filename)
+
+        _results = []
+        _times = []
+        for _window in [0, noise_floor_window]:
+            (_time, _peaks) = time_function(
+                find_peaks, (_freq, _power, _step, snr_threshold, _window), runs
+            )
+            _times.append(_time)
+            if _known:
+                _results.append("%d/%d" % count_peaks(_peaks, _known))
+            else:
+                _results.append("%d peaks" % len(_peaks))
+
+        print(
+            "%15s %22s %22s %13.4f %13.4f"
+            % (_name, _results[0], _results[1], _times[0], _times[1])
+        )
+
+        if _filename != sweep:
+            os.remove(_filename)
+
+    os.rmdir(_tempdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Number of runs of each benchmark."
+    )
+    parser.add_argument(
+        "--steps",
+        type=str,
+        default="2000,800,200,50",
+        help="Comma-separated list of rtl_power bin widths (Hz) to test.",
+    )
+    parser.add_argument(
+        "--hop_bw",
+        type=float,
+        default=1.6e6,
+        help="Width of each simulated rtl_power hop (Hz). Smaller values give more hops per sweep.",
+    )
+    parser.add_argument(
+        "--snr_threshold",
+        type=float,
+        default=10.0,
+        help="Peak detection SNR threshold (dB) for the noise floor benchmark.",
+    )
+    parser.add_argument(
+        "--noise_floor_window",
+        type=float,
+        default=250e3,
+        help="Rolling noise floor window (Hz) for the noise floor benchmark.",
+    )
+    parser.add_argument(
+        "--sweep",
+        type=str,
+        default=None,
+        help="Optional recorded rtl_power sweep (i.e. a log_power.csv) to include in the noise floor benchmark.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s:%(message)s", level=logging.ERROR
+    )
+
+    _steps = [float(_s) for _s in args.steps.split(",")]
+
+    benchmark_read_rtl_power(_steps, args.hop_bw, args.runs)
+    # Small search steps across 400-406 MHz give sweeps of 100k+ bins.
+    benchmark_peak_decimation([2000, 800, 200, 50, 10], 10, args.runs)
+    benchmark_block_filter([10, 100, 500, 2000], 200, args.runs)
+    benchmark_noise_floor(
+        args.sweep, args.snr_threshold, args.noise_floor_window, args.runs
+    )
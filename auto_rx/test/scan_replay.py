@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+#
+#   Scanner Replay Benchmark
+#
+#   Runs SondeScanner.sonde_search end-to-end against recorded rtl_power sweeps and IQ recordings,
+#   in place of a SDR, and reports the time spent in each stage of the scan, along with the
+#   sondes detected and the (simulated) time taken to detect them.
+#
+#   Released under GNU GPL v3 or later
+#
+#   Run from the auto_rx directory, with dft_detect built (using build.sh):
+#   $ python test/scan_replay.py --sweep log_power.csv --iq 401.5:test/generated/rs41_96k_float_15.0dB.bin
+#
+#   IQ recordings are expected to be 96 kHz complex float (as used in test/samples/) unless otherwise specified.
+#
+import argparse
+import glob
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running from either the auto_rx or auto_rx/test directories.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import autorx.scan
+from autorx.scan import (
+    SondeScanner,
+    DFT_DETECT_SCORE_INTERVAL,
+    dft_detect_supports_scores,
+    parse_dft_detect_output,
+)
+from scan_benchmark import generate_rtl_power_sweep
+
+
+class ReplayStats(object):
+    """ Accumulates the time spent in each scanner stage. """
+
+    STAGES = ["sweep parse", "peak detect", "filtering", "detection"]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.times = {}
+        for _stage in self.STAGES:
+            self.times[_stage] = 0.0
+        # Simulated RF time spent in detection, in seconds.
+        self.detect_rf_time = 0.0
+        # Simulated RF time until the first sonde was detected.
+        self.first_detection_rf_time = None
+        self.peaks_checked = 0
+        self.detections = []
+
+
+def timed(stats, stage, func):
+    """ Wrap a function, adding its runtime to a stage of a ReplayStats object. """
+
+    def _wrapper(*args, **kwargs):
+        _start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.times[stage] += time.time() - _start
+
+    return _wrapper
+
+
+class ReplayDetector(object):
+    """ Replacement for autorx.scan.detect_sonde, which runs dft_detect on IQ recordings.
+
+    Peaks which do not have a recording are treated as containing only noise.
+    """
+
+    def __init__(
+        self,
+        stats,
+        recordings,
+        rs_path="../",
+        quantization=10000,
+        early_exit=False,
+        giveup_time=3.0,
+        giveup_score=0.9,
+    ):
+        """
+        Args:
+            stats (ReplayStats): Statistics object to update.
+            recordings (list): List of (frequency (Hz), filename, sample rate, bits per sample) tuples.
+            rs_path (str): Path to the dft_detect binary.
+            quantization (float): Recordings are used for peaks within +/- quantization/2 of their frequency.
+            early_exit (bool): Emulate the scanner's detection early exit behaviour.
+            giveup_time (float): Early exit give-up time (seconds).
+            giveup_score (float): Early exit give-up score.
+        """
+        self.stats = stats
+        self.recordings = recordings
+        self.rs_path = rs_path
+        self.quantization = quantization
+        self.early_exit = early_exit and dft_detect_supports_scores(rs_path)
+        self.giveup_time = giveup_time
+        self.giveup_score = giveup_score
+
+    def find_recording(self, frequency):
+        for _recording in self.recordings:
+            if abs(_recording[0] - frequency) < self.quantization / 2.0:
+                return _recording
+        return None
+
+    def run_dft_detect(self, recording, dwell_time):
+        """ Run dft_detect over a recording.
+
+        Returns:
+            tuple: (dft_detect output, simulated RF time (seconds))
+        """
+        (_freq, _filename, _rate, _bits) = recording
+
+        _cmd = [
+            os.path.join(self.rs_path, "dft_detect"),
+            "-v",
+            "-t",
+            "%d" % dwell_time,
+            "--iq",
+            "--bw",
+            "20",
+            "--dc",
+        ]
+        if self.early_exit:
+            _cmd += ["--scores", "%.1f" % DFT_DETECT_SCORE_INTERVAL]
+        _cmd += ["-", "%d" % _rate, "%d" % _bits]
+
+        with open(_filename, "rb") as _f:
+            _output = subprocess.run(
+                _cmd, stdin=_f, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            ).stdout.decode("utf8", errors="ignore")
+
+        # Work out how far into the recording dft_detect got, applying the give-up rule if required.
+        _max_score = 0.0
+        _rf_time = dwell_time
+        for _line in _output.splitlines():
+            if _line.startswith("SCORE:"):
+                _fields = _line[6:].split(",")
+                _time = float(_fields[0])
+                _max_score = max(_max_score, float(_fields[1]))
+                _rf_time = _time
+                if (_time >= self.giveup_time) and (_max_score < self.giveup_score):
+                    return ("", _time)
+            elif _line.startswith("sample:"):
+                _rf_time = int(_line.split(":")[1]) / float(_rate)
+            else:
+                return (_line, _rf_time)
+
+        return ("", min(_rf_time, dwell_time))
+
+    def detect_sonde(self, frequency, dwell_time=10, device_idx=0, **kwargs):
+        """ Drop-in replacement for autorx.scan.detect_sonde. """
+        self.stats.peaks_checked += 1
+
+        _recording = self.find_recording(frequency)
+        if _recording is None:
+            # Empty peak. The detection would have run until the give-up time, or the end of the dwell time.
+            _rf_time = (
+                min(self.giveup_time, dwell_time) if self.early_exit else dwell_time
+            )
+            _result = (None, 0.0)
+        else:
+            (_output, _rf_time) = self.run_dft_detect(_recording, dwell_time)
+            _result = parse_dft_detect_output(_output, device_idx)
+
+        self.stats.detect_rf_time += _rf_time
+
+        if _result[0] is not None:
+            self.stats.detections.append((frequency, _result[0]))
+            if self.stats.first_detection_rf_time is None:
+                self.stats.first_detection_rf_time = self.stats.detect_rf_time
+
+        return _result
+
+
+def parse_recording(spec):
+    """ Parse an IQ recording specification of the form freq_mhz:filename[:sample_rate[:bits]] """
+    _fields = spec.split(":")
+    if len(_fields) < 2:
+        raise ValueError("Invalid IQ recording specification: %s" % spec)
+
+    _freq = float(_fields[0]) * 1e6
+    _filename = _fields[1]
+    _rate = int(_fields[2]) if len(_fields) > 2 else 96000
+    _bits = int(_fields[3]) if len(_fields) > 3 else 32
+
+    return (_freq, _filename, _rate, _bits)
+
+
+def replay(sweeps, recordings, args):
+    """ Run the scanner over each sweep, and report the results. """
+
+    _stats = ReplayStats()
+    _detector = ReplayDetector(
+        _stats,
+        recordings,
+        rs_path=args.rs_path,
+        quantization=args.quantization,
+        early_exit=args.early_exit,
+        giveup_time=args.giveup_time,
+        giveup_score=args.giveup_score,
+    )
+
+    # Swap out the SDR-dependent parts of the scanner.
+    _current_sweep = [None]
+    _read_rtl_power = autorx.scan.read_rtl_power
+    autorx.scan.run_rtl_power = lambda *args, **kwargs: True
+    autorx.scan.read_rtl_power = timed(
+        _stats, "sweep parse", lambda filename: _read_rtl_power(_current_sweep[0])
+    )
+    autorx.scan.detect_peaks = timed(_stats, "peak detect", autorx.scan.detect_peaks)
+    autorx.scan.rolling_noise_floor = timed(
+        _stats, "peak detect", autorx.scan.rolling_noise_floor
+    )
+    autorx.scan.detect_sonde = timed(_stats, "detection", _detector.detect_sonde)
+
+    # Using a TCP device skips the RTLSDR checks.
+    _scanner = SondeScanner(
+        callback=None,
+        auto_start=False,
+        device_idx="TCP0",
+        snr_threshold=args.snr_threshold,
+        max_peaks=args.max_peaks,
+        quantization=args.quantization,
+        scan_dwell_time=args.scan_dwell_time,
+        detect_dwell_time=args.detect_dwell_time,
+        noise_floor_window=args.noise_floor_window,
+        detection_cache_time=args.detection_cache_time,
+        peak_clustering=args.peak_clustering,
+    )
+    # Allow sonde_search to run without starting the scan thread.
+    _scanner.sonde_scanner_running = True
+    _process_spectrum = _scanner.process_spectrum
+    _scanner.process_spectrum = timed(_stats, "filtering", _process_spectrum)
+
+    print(
+        "%30s %8s %8s %8s %8s %6s %10s %10s  %s"
+        % (
+            "sweep",
+            "parse",
+            "peaks",
+            "filter",
+            "detect",
+            "#peak",
+            "detect RF",
+            "latency",
+            "detections",
+        )
+    )
+
+    for _sweep in sweeps:
+        _current_sweep[0] = _sweep
+        _stats.reset()
+
+        _scanner.sonde_search(first_only=args.first_only)
+
+        # process_spectrum includes the peak detection time.
+        _times = _stats.times
+        _filter_time = _times["filtering"] - _times["peak detect"]
+
+        if _stats.first_detection_rf_time is not None:
+            # Time to detection, from the start of the rtl_power sweep.
+            _latency = "%9.1fs" % (
+                args.scan_dwell_time
+                + _times["sweep parse"]
+                + _times["filtering"]
+                + _stats.first_detection_rf_time
+            )
+        else:
+            _latency = "%10s" % "-"
+
+        print(
+            "%30s %8.4f %8.4f %8.4f %8.3f %6d %9.1fs %s  %s"
+            % (
+                os.path.basename(_sweep)[-30:],
+                _times["sweep parse"],
+                _times["peak detect"],
+                _filter_time,
+                _times["detection"],
+                _stats.peaks_checked,
+                _stats.detect_rf_time,
+                _latency,
+                ", ".join(
+                    ["%.3f %s" % (_f / 1e6, _t) for (_f, _t) in _stats.detections]
+                ),
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sweep",
+        type=str,
+        action="append",
+        default=[],
+        help="Recorded rtl_power sweep(s) to replay. Wildcards are accepted. If not provided, a synthetic sweep is used.",
+    )
+    parser.add_argument(
+        "--iq",
+        type=str,
+        action="append",
+        default=[],
+        help="IQ recording to use for detection on a frequency, as freq_mhz:filename[:sample_rate[:bits]]. Default: 96000 Hz, 32 (float).",
+    )
+    parser.add_argument(
+        "--rs_path", type=str, default="../", help="Path to the dft_detect binary."
+    )
+    parser.add_argument("--snr_threshold", type=float, default=10.0)
+    parser.add_argument("--max_peaks", type=int, default=10)
+    parser.add_argument("--quantization", type=float, default=10000)
+    parser.add_argument(
+        "--scan_dwell_time",
+        type=int,
+        default=20,
+        help="rtl_power dwell time the sweeps were recorded with, used to calculate latency.",
+    )
+    parser.add_argument("--detect_dwell_time", type=int, default=5)
+    parser.add_argument("--noise_floor_window", type=float, default=250000)
+    parser.add_argument("--detection_cache_time", type=float, default=0)
+    parser.add_argument(
+        "--early_exit", action="store_true", help="Enable detection early exit."
+    )
+    parser.add_argument("--giveup_time", type=float, default=3.0)
+    parser.add_argument("--giveup_score", type=float, default=0.9)
+    parser.add_argument(
+        "--peak_clustering",
+        action="store_true",
+        help="Merge peaks which are part of the same signal.",
+    )
+    parser.add_argument(
+        "--first_only",
+        action="store_true",
+        help="Stop each scan at the first detected sonde.",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show scanner log output."
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s:%(message)s",
+        level=logging.DEBUG if args.verbose else logging.ERROR,
+    )
+
+    _sweeps = []
+    for _pattern in args.sweep:
+        _sweeps += sorted(glob.glob(_pattern))
+
+    _recordings = [parse_recording(_spec) for _spec in args.iq]
+
+    _tempdir = None
+    if len(_sweeps) == 0:
+        # Synthetic sweep, with signals on each of the IQ recording frequencies, plus some empty peaks.
+        _tempdir = tempfile.mkdtemp()
+        _signals = [(_r[0], 15, 8e3) for _r in _recordings]
+        _signals += [(_f, 12, 8e3) for _f in [400.2e6, 401.1e6, 403.7e6, 405.2e6]]
+        _sweep = os.path.join(_tempdir, "log_power_synthetic.csv")
+        generate_rtl_power_sweep(_sweep, step=800, signals=_signals, nan_fraction=0)
+        _sweeps = [_sweep]
+
+    try:
+        replay(_sweeps, _recordings, args)
+    finally:
+        if _tempdir:
+            for _file in glob.glob(os.path.join(_tempdir, "*")):
+                os.remove(_file)
+            os.rmdir(_tempdir)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+#
+#   Telemetry Parsing Benchmark
+#
+#   Measures how many frames per second of decoder output can be parsed by the JSON and timestamp parsing
+#   steps of SondeDecoder.handle_decoder_line, using the original method (json + dateutil), and the
+#   fast-path parsers in autorx.utils (with and without orjson).
+#
+#   Released under GNU GPL v3 or later
+#
+#   Run from the auto_rx directory:
+#   $ python test/telemetry_parse_benchmark.py rs41_decoder_output.log
+#
+#   Decoder output can be recorded by running a decoder with the --json option, i.e.:
+#   $ ./rs41mod --ptu2 --json test/generated/rs41_96k_float_20.0dB.bin > rs41_decoder_output.log
+#   If no files are supplied, synthetic output in each of the decoders' timestamp formats is used.
+#
+import argparse
+import json
+import os
+import sys
+import time
+from dateutil.parser import parse
+
+# Allow running from either the auto_rx or auto_rx/test directories.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import autorx.utils
+from autorx.utils import parse_telemetry_datetime, parse_telemetry_json
+
+
+def synthetic_output(frames=1000):
+    """ Generate lines of decoder output, using the timestamp formats produced by the various decoders. """
+    _lines = []
+    for _i in range(frames):
+        _seconds = _i % 60
+        if _i % 10 == 8:
+            # MRZ - whole seconds.
+            _datetime = "2021-04-01T12:%02d:%02dZ" % (_i // 60 % 60, _seconds)
+        elif _i % 10 == 9:
+            # iMet / LMS6 - time only.
+            _datetime = "12:%02d:%06.3fZ" % (_i // 60 % 60, _seconds + 0.5)
+        else:
+            _datetime = "2021-04-01T12:%02d:%06.3fZ" % (_i // 60 % 60, _seconds + 0.5)
+
+        _lines.append(
+            (
+                '{ "type": "RS41", "frame": %d, "id": "S1234567", "datetime": "%s", "lat": -34.95162, "lon": 138.52065, '
+                '"alt": 10234.12345, "vel_h": 12.45312, "heading": 123.12345, "vel_v": 5.12345, "sats": 10, "bt": 65535, '
+                '"batt": 2.90, "temp": -45.3, "humidity": 12.3, "pressure": 245.12, "subtype": "RS41-SG", "version": "1.5.0" }\n'
+            )
+            % (_i, _datetime)
+        )
+
+    return [_line.encode("ascii") for _line in _lines]
+
+
+def parse_legacy(data):
+    """ The original parsing steps from handle_decoder_line. """
+    try:
+        _first_char = data.decode("ascii")[0]
+    except UnicodeDecodeError:
+        return None
+
+    if data.decode("ascii")[0] != "{":
+        return None
+
+    _telemetry = json.loads(data.decode("ascii"))
+    _telemetry["datetime_dt"] = parse(_telemetry["datetime"])
+    return _telemetry
+
+
+def parse_fast(data):
+    """ The fast-path parsing steps from handle_decoder_line. """
+    try:
+        _line = data.decode("ascii")
+    except UnicodeDecodeError:
+        return None
+
+    if (len(_line) == 0) or (_line[0] != "{"):
+        return None
+
+    _telemetry = parse_telemetry_json(_line)
+    _telemetry["datetime_dt"] = parse_telemetry_datetime(_telemetry["datetime"])
+    return _telemetry
+
+
+def run_benchmark(function, lines, passes):
+    """ Parse all lines, passes times, and return the number of frames parsed per second. """
+    _start = time.time()
+    for _pass in range(passes):
+        for _line in lines:
+            function(_line)
+
+    return len(lines) * passes / (time.time() - _start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "files", nargs="*", help="Recorded decoder output (JSON lines) to parse."
+    )
+    parser.add_argument(
+        "-p", "--passes", type=int, default=5, help="Number of passes over the data."
+    )
+    args = parser.parse_args()
+
+    if len(args.files) > 0:
+        _lines = []
+        for _filename in args.files:
+            with open(_filename, "rb") as _f:
+                _lines.extend([_l for _l in _f if _l.startswith(b"{")])
+    else:
+        _lines = synthetic_output()
+
+    # Check the fast-path parsers produce the same result.
+    for _line in _lines:
+        _legacy = parse_legacy(_line)
+        _fast = parse_fast(_line)
+        if _legacy["datetime_dt"] != _fast["datetime_dt"]:
+            print(
+                "Timestamp mismatch: %s - %s != %s"
+                % (_legacy["datetime"], _legacy["datetime_dt"], _fast["datetime_dt"])
+            )
+
+    print("Parsing %d frames, %d passes." % (len(_lines), args.passes))
+
+    _legacy_rate = run_benchmark(parse_legacy, _lines, args.passes)
+    print("%30s: %9.0f frames/sec" % ("json + dateutil (original)", _legacy_rate))
+
+    _orjson = autorx.utils.orjson
+    autorx.utils.orjson = None
+    _rate = run_benchmark(parse_fast, _lines, args.passes)
+    print(
+        "%30s: %9.0f frames/sec (%.1fx)"
+        % ("json + fast datetime", _rate, _rate / _legacy_rate)
+    )
+
+    if _orjson is not None:
+        autorx.utils.orjson = _orjson
+        _rate = run_benchmark(parse_fast, _lines, args.passes)
+        print(
+            "%30s: %9.0f frames/sec (%.1fx)"
+            % ("orjson + fast datetime", _rate, _rate / _legacy_rate)
+        )
+    else:
+        print("orjson not available, skipping.")
@@ -33,6 +33,7 @@ static int option_verbose = 0,  // ausfuehrliche Anzeige
            option_silent = 0,
            option_cont = 0,
            option_pcmraw = 0,
+           option_scores = 0,   // report max. correlation score every option_scores samples
            wavloaded = 0;
 static int wav_channel = 0;     // audio channel: left
 
@@ -1233,6 +1234,11 @@ int main(int argc, char **argv) {
     int j_max;
     float mv_max;
 
+    float tl_scores = 0.0;
+    float score_max = 0.0;
+    int score_j = 0;
+    ui32_t score_next = 0;
+
 
 #ifdef CYGWIN
     _setmode(fileno(stdin), _O_BINARY);  // _setmode(_fileno(stdin), _O_BINARY);
@@ -1250,6 +1256,7 @@ int main(int argc, char **argv) {
             fprintf(stderr, "       --iq        (IF iq-data)\n");
             fprintf(stderr, "       --IQ <fq>   (baseband IQ at fq)\n");
             fprintf(stderr, "       --bw <kHz>  (set IQ filter bw/kHz)\n");
+            fprintf(stderr, "       --scores <s> (report max. score every <s> seconds)\n");
             return 0;
         }
         else if ( (strcmp(*argv, "-v") == 0) || (strcmp(*argv, "--verbose") == 0) ) {
@@ -1294,6 +1301,10 @@ int main(int argc, char **argv) {
             if (*argv) tl = atof(*argv);
             else return -50;
         }
+        else if ( (strcmp(*argv, "--scores") == 0) ) {
+            ++argv;
+            if (*argv) tl_scores = atof(*argv); else return -1;
+        }
         else if ( (strcmp(*argv, "--ch2") == 0) ) { wav_channel = 1; }  // right channel (default: 0=left)
         else if ( (strcmp(*argv, "--ths") == 0) ) {
             ++argv;
@@ -1356,6 +1367,12 @@ int main(int argc, char **argv) {
     j_max = 0;
     mv_max = 0.0;
 
+    if (tl_scores > 0) {
+        option_scores = tl_scores * sample_rate;
+        if (option_scores < 1) option_scores = 1;
+        score_next = option_scores;
+    }
+
     k = 0;
 
     while ( f32buf_sample(fp, option_inv) != EOF ) {
@@ -1375,6 +1392,24 @@ int main(int argc, char **argv) {
                 mp[j] = getCorrDFT(K, 0, mv+j, mv_pos+j, rs_hdr+j);
             }
             k = 0;
+
+            if (option_scores) {
+                // max. correlation score, relative to the detection threshold of each type
+                for (j = 0; j <= idxIMETafsk; j++) {
+                    if (mp[j] > 0 && fabs(mv[j])/rs_hdr[j].thres > score_max) {
+                        score_max = fabs(mv[j])/rs_hdr[j].thres;
+                        score_j = j;
+                    }
+                }
+                if (sample_in >= score_next) {
+                    // no correlation in this interval: don't report the previous interval's type
+                    fprintf(stdout, "SCORE: %.2f, %.4f, %s\n", sample_in/(float)sample_rate, score_max,
+                            score_max > 0.0 ? rs_hdr[score_j].type : "-");
+                    score_max = 0.0;
+                    score_j = 0;
+                    score_next += option_scores;
+                }
+            }
         }
         else {
             //for (j = 0; j < Nrs; j++) mv[j] = 0.0;